@@ -0,0 +1,94 @@
+"""
+多会话批量抽卡基准 - 对比 N 个会话各自调用 /proto/pull/multi 与一次 /proto/pull/batch
+
+在本进程中启动一个本地 HTTP 服务 (werkzeug)，通过 http.client 调用，
+包含 TCP 连接、HTTP 解析、Cookie 会话与 Protobuf 编解码开销（与自动化测试客户端相同）。
+
+运行:
+    python benchmarks/bench_batch_pull.py [sessions] [count] [rounds] [return_limit]
+"""
+import http.client
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from werkzeug.serving import make_server
+
+from app import create_app
+from proto import gacha_pb2
+
+
+def post(port: int, path: str, body: bytes, cookie: str = None):
+    """一次 POST 请求（每次新建连接，与常见测试脚本一致），返回 (响应体, Set-Cookie)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/x-protobuf'}
+    if cookie:
+        headers['Cookie'] = cookie
+    conn.request('POST', path, body, headers)
+    response = conn.getresponse()
+    data = response.read()
+    set_cookie = response.getheader('Set-Cookie')
+    conn.close()
+    return data, set_cookie
+
+
+def separate_requests(port: int, sessions: int, count: int, rounds: int) -> float:
+    """每个会话一个 Cookie，每轮每个会话一次 /proto/pull/multi"""
+    body = gacha_pb2.PullMultiRequest(count=count).SerializeToString()
+    cookies = [post(port, '/proto/pull/multi', body)[1].split(';')[0] for _ in range(sessions)]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for cookie in cookies:
+            response = gacha_pb2.PullMultiResponse()
+            response.ParseFromString(post(port, '/proto/pull/multi', body, cookie)[0])
+            assert response.header.success
+    return time.perf_counter() - start
+
+
+def batch_request(port: int, sessions: int, count: int, rounds: int, return_limit: int) -> float:
+    """每轮一次 /proto/pull/batch，包含全部会话的任务"""
+    req = gacha_pb2.BatchPullRequest()
+    for i in range(sessions):
+        req.jobs.add(session_id=f"bench-batch-{i}", count=count, return_limit=return_limit)
+    body = req.SerializeToString()
+    post(port, '/proto/pull/batch', body)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response = gacha_pb2.BatchPullResponse()
+        response.ParseFromString(post(port, '/proto/pull/batch', body)[0])
+        assert response.header.success and len(response.results) == sessions
+    return time.perf_counter() - start
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    return_limit = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    try:
+        separate = separate_requests(port, sessions, count, rounds)
+        batch = batch_request(port, sessions, count, rounds, return_limit)
+    finally:
+        server.shutdown()
+
+    jobs = sessions * rounds
+    print(f"sessions={sessions} count={count} rounds={rounds} return_limit={return_limit}")
+    print(f"{'path':<10} {'time (ms)':>10} {'jobs/s':>10} {'HTTP req/s':>11}")
+    print(f"{'separate':<10} {separate * 1000:>10.1f} {jobs / separate:>10.0f} "
+          f"{jobs / separate:>11.0f}")
+    print(f"{'batch':<10} {batch * 1000:>10.1f} {jobs / batch:>10.0f} {rounds / batch:>11.0f}")
+    print(f"speedup (jobs/s): {separate / batch:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
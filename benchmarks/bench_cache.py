@@ -0,0 +1,59 @@
+"""
+结果缓存基准 - 对比重复请求在未命中、内存层命中与磁盘层命中（模拟进程重启）时的耗时
+
+运行:
+    python benchmarks/bench_cache.py [玩家数]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.pool_manager import PoolManager
+from services.result_cache import ResultCache, cache_key
+from services.simulation import SimulationService
+
+
+PULLS = 300
+REPEATS = 100
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    pool_mgr = PoolManager(load_local=True)
+    pool = pool_mgr.get(pool_mgr.default_pool_id)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'results.sqlite3')
+        cache = ResultCache('bench', disk_path=path)
+        key = cache_key('bench', [pool], [players, PULLS, 1])
+
+        started = time.perf_counter()
+        if cache.get(key) is None:
+            cache.put(key, SimulationService.run(pool, players, PULLS, seed=1), [pool.pool_id])
+        miss_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            cache.get(key)
+        memory_ms = (time.perf_counter() - started) * 1000 / REPEATS
+
+        # 新实例的内存层为空，相当于重启或另一个 worker 进程
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            ResultCache('bench', disk_path=path).get(key)
+        disk_ms = (time.perf_counter() - started) * 1000 / REPEATS
+        SimulationService.shutdown()
+
+    print(f"pool={pool.pool_id} players={players} pulls={PULLS}")
+    print(f"{'lookup':>8} {'time (ms)':>10}")
+    print(f"{'miss':>8} {miss_ms:>10.1f}")
+    print(f"{'memory':>8} {memory_ms:>10.4f}")
+    print(f"{'disk':>8} {disk_ms:>10.3f}")
+    print(cache.stats())
+
+
+if __name__ == '__main__':
+    main()
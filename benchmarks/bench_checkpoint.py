@@ -0,0 +1,117 @@
+"""
+会话检查点基准 - 重启后会话是否保留，启动耗时是否与会话数无关
+
+  1. 创建 N 个会话（设置种子后十连一次），对比启用 / 不启用检查点时的单次请求耗时，
+     flush 写入全部脏会话，统计写入耗时与 flush 期间单个会话锁的最长持有时间
+  2. 模拟重启：用同一个检查点文件新建 SessionManager，统计启动耗时、
+     首次访问（从检查点恢复）与再次访问的耗时，并检查恢复的统计与历史与重启前一致
+
+运行:
+    python benchmarks/bench_checkpoint.py [sessions]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.gacha import GachaService
+from services.session_manager import SessionManager
+from services.session_store import MemorySessionStore
+
+
+class TimedLock:
+    """记录每次持有时间的可重入锁（替换会话锁，测量 flush 复制快照时占用会话锁的时间）"""
+
+    def __init__(self, holds: list):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._acquired = 0.0
+        self.holds = holds
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            self._acquired = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            self.holds.append(time.perf_counter() - self._acquired)
+        self._lock.release()
+
+
+def manager(checkpoint_path: str) -> SessionManager:
+    return SessionManager(MemorySessionStore(memory_budget=0, spill_path=''), reap_interval=0,
+                          checkpoint_path=checkpoint_path)
+
+
+def populate(service: GachaService, sessions: int) -> float:
+    start = time.perf_counter()
+    for i in range(sessions):
+        service.set_seed(i, session_id=f"bench-{i}")
+        service.pull_multi(10, f"bench-{i}")
+    return (time.perf_counter() - start) / sessions
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    path = os.path.join(tempfile.mkdtemp(), 'checkpoint.sqlite3')
+
+    service = GachaService()
+    service._session_mgr = manager('')
+    plain = populate(service, sessions)
+
+    service._session_mgr = manager(path)
+    checkpointed = populate(service, sessions)
+    holds = []
+    for i in range(sessions):
+        service._get_session(f"bench-{i}").lock = TimedLock(holds)
+    start = time.perf_counter()
+    written = service._session_mgr._checkpoint.flush()
+    flush_time = time.perf_counter() - start
+    holds = sorted(holds)
+    probes = [0, sessions // 2, sessions - 1]
+    before = [(service.get_statistics(f"bench-{i}"), service.get_pull_history(session_id=f"bench-{i}"))
+              for i in probes]
+    service._session_mgr.close()
+
+    print(f"sessions={sessions} (set_seed + 10 pulls each)")
+    print(f"request time without checkpoint: {plain * 1e6:,.0f} us/session")
+    print(f"request time with checkpoint:    {checkpointed * 1e6:,.0f} us/session")
+    print(f"flush: {written} sessions in {flush_time:.2f} s "
+          f"({flush_time / max(written, 1) * 1e6:,.0f} us/session), "
+          f"session lock held p50 {holds[len(holds) // 2] * 1e6:,.0f} us, "
+          f"p99 {holds[len(holds) * 99 // 100] * 1e6:,.0f} us, max {holds[-1] * 1e6:,.0f} us")
+
+    # 模拟重启
+    start = time.perf_counter()
+    service._session_mgr = manager(path)
+    boot = time.perf_counter() - start
+    live = service.get_session_store_stats()['live_sessions']
+    start = time.perf_counter()
+    first = service._get_session('bench-1')
+    restore = time.perf_counter() - start
+    start = time.perf_counter()
+    service._get_session('bench-1')
+    cached = time.perf_counter() - start
+    after = [(service.get_statistics(f"bench-{i}"), service.get_pull_history(session_id=f"bench-{i}"))
+             for i in probes]
+    stats = service.get_session_store_stats()
+    service._session_mgr.close()
+
+    print(f"boot: {boot * 1e3:.2f} ms, live sessions after boot: {live}")
+    print(f"first access (restore): {restore * 1e6:,.0f} us, "
+          f"next access: {cached * 1e6:,.0f} us, total_pulls={first.total_pulls}")
+    print(f"restored: {stats['checkpoint']['restored']}, "
+          f"checkpoint file sessions: {stats['checkpoint']['stored_sessions']}")
+    print(f"restored sessions identical: {before == after}")
+
+
+if __name__ == '__main__':
+    main()
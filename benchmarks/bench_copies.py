@@ -0,0 +1,77 @@
+"""
+多份UP卡分布基准 - 对比逐份递推卷积与 FFT 生成函数求 k = 1..N 份的抽数分布
+
+运行:
+    python benchmarks/bench_copies.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.odds import OddsCalculator
+from services.pool_manager import PoolManager
+
+
+MAX_COPIES = 20
+
+
+def legacy_copies(pool, max_copies: int, card_id: str = None):
+    """FFT 引入前的实现：逐抽递推求间隔分布，再逐份线性卷积"""
+    share = OddsCalculator.featured_share(pool, card_id)
+    cycle_pmf = OddsCalculator.pulls_to_ssr_pmf(0, pool)
+    pulls = np.arange(1, len(cycle_pmf) + 1)
+    mean_t = float(np.dot(pulls, cycle_pmf))
+    var_t = float(np.dot(pulls ** 2, cycle_pmf)) - mean_t ** 2
+    mean_f = mean_t / share
+    var_f = var_t / share + (1.0 - share) / share ** 2 * mean_t ** 2
+    horizon = OddsCalculator._horizon(max_copies * mean_f, max_copies * var_f, len(cycle_pmf))
+
+    cycle = np.zeros(horizon + 1)
+    cycle[1:len(cycle_pmf) + 1] = cycle_pmf
+    g = np.zeros(horizon + 1)
+    width = len(cycle_pmf)
+    for t in range(1, horizon + 1):
+        m = min(t - 1, width)
+        acc = np.dot(cycle[1:m + 1], g[t - m:t][::-1]) if m else 0.0
+        g[t] = share * cycle[t] + (1.0 - share) * acc
+
+    pmf = share * cycle + (1.0 - share) * np.convolve(cycle, g)[:horizon + 1]
+    rows = [pmf]
+    for _ in range(max_copies - 1):
+        pmf = np.convolve(pmf, g)[:horizon + 1]
+        rows.append(pmf)
+    return np.array(rows)
+
+
+def main():
+    pool_mgr = PoolManager(load_local=True)
+    pool = pool_mgr.get(pool_mgr.default_pool_id)
+    card_id = pool.featured_ssr[0] if pool.featured_ssr else None
+
+    started = time.perf_counter()
+    legacy = legacy_copies(pool, MAX_COPIES, card_id)
+    legacy_ms = (time.perf_counter() - started) * 1000
+
+    OddsCalculator.clear_cache()
+    started = time.perf_counter()
+    fft = OddsCalculator.copies_matrix(pool, MAX_COPIES, card_id)
+    fft_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    OddsCalculator.copies_matrix(pool, MAX_COPIES, card_id)
+    cached_ms = (time.perf_counter() - started) * 1000
+
+    print(f"pool={pool.pool_id} target={card_id} copies=1..{MAX_COPIES} horizon={fft.shape[1] - 1}")
+    print(f"{'method':>8} {'time (ms)':>10}")
+    print(f"{'legacy':>8} {legacy_ms:>10.1f}")
+    print(f"{'fft':>8} {fft_ms:>10.2f}")
+    print(f"{'cached':>8} {cached_ms:>10.3f}")
+    print(f"max abs diff: {np.abs(legacy - fft).max():.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+抽卡历史基准 - 对比 compact 与 replay 两种历史模式的历史内存、读取耗时，并校验输出一致
+
+retained 为抽卡期间进程新增的内存（含随机数缓冲、草图等非历史部分）
+
+分叉检查：在同一会话上交替单抽与分叉 cycles 次，比较前后单抽耗时（分叉链不应拖慢原会话），
+并校验最终历史与不分叉的同种子会话一致
+
+运行:
+    python benchmarks/bench_history.py [batches] [batch_size] [cycles]
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import HISTORY_CONFIG
+from services.gacha import GachaService
+from services.pull_history import CompactSegment, ReplaySegment
+from services.session_manager import SessionManager
+from services.session_store import MemorySessionStore
+
+
+def create_service() -> GachaService:
+    """不读写检查点与溢出文件的服务（不受之前运行留下的会话影响）"""
+    service = GachaService()
+    service._session_mgr = SessionManager(MemorySessionStore(memory_budget=0, spill_path=''),
+                                          reap_interval=0, checkpoint_path='')
+    return service
+
+
+def history_bytes(obj, seen=None) -> int:
+    """历史对象自身占用的字节数（卡池与阈值表为共享对象，不计入）"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if hasattr(obj, 'nbytes'):
+        return size + (0 if obj.base is None else obj.nbytes)
+    if isinstance(obj, dict):
+        return size + sum(history_bytes(k, seen) + history_bytes(v, seen)
+                          for k, v in obj.items())
+    if isinstance(obj, (CompactSegment, ReplaySegment)):
+        return size + sum(history_bytes(getattr(obj, name), seen)
+                          for name in obj.__slots__ if name not in ('pool', 'rules'))
+    if hasattr(obj, '__dict__'):
+        return size + history_bytes(vars(obj), seen)
+    if isinstance(obj, (list, tuple)) or type(obj).__name__ == 'deque':
+        return size + sum(history_bytes(item, seen) for item in obj)
+    return size
+
+
+def measure(mode: str, batches: int, batch_size: int):
+    HISTORY_CONFIG['mode'] = mode
+    service = create_service()
+    session_id = f"bench-{mode}"
+    service.set_seed(1, 'pcg64', session_id)
+    # 预热：编译规则表 / 别名表，并让历史先达到上限
+    service.pull_multi(batch_size, session_id)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(batches):
+        service.pull_multi(batch_size, session_id)
+    for _ in range(50):
+        service.pull_single(session_id)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    history = history_bytes(service._get_session(session_id).stats['pull_history'])
+
+    start = time.perf_counter()
+    recent = service.get_pull_history(100, session_id)
+    recent_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    export = service.generate_export_data(session_id)
+    export_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{mode:<8} {history / 1024:>13.1f} {retained / 1024:>14.1f} {recent_ms:>15.2f} "
+          f"{export_ms:>12.1f}")
+    return recent, export
+
+
+def fork_cycles(mode: str, cycles: int):
+    HISTORY_CONFIG['mode'] = mode
+    service = create_service()
+    service.set_seed(2, 'pcg64', 'forked')
+    service.set_seed(2, 'pcg64', 'plain')
+    timings = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        service.pull_single('forked')
+        timings.append(time.perf_counter() - start)
+        service.fork_session('forked')
+        service.pull_single('plain')
+    window = min(100, cycles)
+    first = sum(timings[:window]) / window * 1000
+    last = sum(timings[-window:]) / window * 1000
+    identical = (service.get_pull_history(None, 'forked')
+                 == service.get_pull_history(None, 'plain'))
+    print(f"{mode:<8} {cycles:>7} {first:>14.3f} {last:>13.3f}  identical: {identical}")
+
+
+def main():
+    batches = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    cycles = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+    print(f"pulls={(batches + 1) * batch_size + 50}")
+    print(f"{'mode':<8} {'history (KB)':>13} {'retained (KB)':>14} {'history(100) ms':>15} "
+          f"{'export (ms)':>12}")
+    compact = measure('compact', batches, batch_size)
+    replay = measure('replay', batches, batch_size)
+    print(f"identical: {compact == replay}")
+
+    print(f"{'mode':<8} {'cycles':>7} {'first pull ms':>14} {'last pull ms':>13}")
+    fork_cycles('compact', cycles)
+    fork_cycles('replay', cycles)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+卡池索引微基准 - 对比逐抽扫描卡池与预编译索引的单抽耗时，
+以及带卡牌权重（别名表选牌）时的单抽耗时
+
+运行:
+    python benchmarks/bench_pool_index.py
+"""
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.card import Card
+from models.pool import Pool
+from services.pull_engine import PullEngine
+from services.session_manager import UserSession
+
+
+PULLS = 20000
+
+
+def build_pool(size: int, weighted: bool = False) -> Pool:
+    """构建指定卡牌数量的测试卡池（2% SSR / 10% SR / 其余 R）"""
+    n_ssr = max(2, size * 2 // 100)
+    n_sr = max(2, size * 10 // 100)
+    cards = []
+    for i in range(size):
+        rarity = 'SSR' if i < n_ssr else 'SR' if i < n_ssr + n_sr else 'R'
+        cards.append(Card(f"{rarity}_{i:05d}", f"卡牌{i}", rarity, is_featured=i < 2,
+                          weight=1 + i % 7 if weighted else 1.0))
+    return Pool(f"bench_{size}", f"基准卡池{size}", 'event', cards=cards,
+                featured_ssr=[cards[0].card_id, cards[1].card_id])
+
+
+def legacy_select_card(pool: Pool, rarity: str) -> Card:
+    """索引引入前的选牌实现：每抽扫描整个卡池"""
+    cards = [card for card in pool.cards if card.rarity == rarity]
+    if rarity == 'SSR' and pool.featured_ssr:
+        if random.random() < 0.5:
+            featured_cards = [c for c in cards if c.is_featured]
+            if featured_cards:
+                return random.choice(featured_cards)
+    return random.choice(cards)
+
+
+def bench(pool: Pool, select) -> float:
+    """返回单抽平均耗时（微秒）"""
+    session = UserSession('bench', pool.pool_id, pool.featured_ssr)
+
+    def run():
+        rarity = PullEngine.determine_rarity(session.pity_counter)
+        select(pool, rarity)
+        session.pity_counter = 0 if rarity == 'SSR' else session.pity_counter + 1
+
+    return min(timeit.repeat(run, number=PULLS, repeat=3)) / PULLS * 1e6
+
+
+def main():
+    print(f"{'cards':>6} {'scan (us/pull)':>16} {'index (us/pull)':>17} {'speedup':>8} "
+          f"{'weighted (us/pull)':>19}")
+    for size in (20, 5000):
+        pool = build_pool(size)
+        scan = bench(pool, legacy_select_card)
+        indexed = bench(pool, PullEngine.select_card)
+        weighted = bench(build_pool(size, weighted=True), PullEngine.select_card)
+        print(f"{size:>6} {scan:>16.2f} {indexed:>17.2f} {scan / indexed:>7.1f}x "
+              f"{weighted:>19.2f}")
+
+
+if __name__ == '__main__':
+    main()
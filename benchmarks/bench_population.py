@@ -0,0 +1,44 @@
+"""
+玩家群体模拟基准 - 按工作进程数测量每秒模拟的玩家数
+
+运行:
+    python benchmarks/bench_population.py [玩家数]
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.pool_manager import PoolManager
+from services.population import PopulationService
+from services.simulation import SimulationService
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    pool_mgr = PoolManager(load_local=True)
+    pool = pool_mgr.get(pool_mgr.default_pool_id)
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, min(2, cores), cores})
+
+    print(f"pool={pool.pool_id} players={players} cores={cores}")
+    print(f"{'workers':>8} {'time (ms)':>10} {'players/s':>12} {'pulls':>12}")
+    try:
+        for workers in worker_counts:
+            result = PopulationService.run(pool, players, seed=1, workers=workers)
+            print(f"{workers:>8} {result['elapsed_ms']:>10.0f} "
+                  f"{result['players_per_second']:>12,.0f} {result['total_pulls']:>12,}")
+    finally:
+        SimulationService.shutdown()
+
+    print()
+    for row in result['segments']:
+        print(f"{row['segment']:>8}: players={row['players']:,} "
+              f"mean_budget={row['mean_budget']:.1f} "
+              f"featured={row['featured_acquisition_rate']:.2%} "
+              f"mean_carryover={row['mean_pity_carryover']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
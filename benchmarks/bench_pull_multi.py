@@ -0,0 +1,69 @@
+"""
+多连抽基准 - 对比 count=100000 时完整记录路径与紧凑历史路径的耗时和内存
+
+运行:
+    python benchmarks/bench_pull_multi.py [count]
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.gacha import GachaService
+from services.history_manager import HistoryManager
+from services.pull_engine import PullEngine
+
+
+def scalar_path(service: GachaService, session_id: str, count: int):
+    """逐抽调用 pull_single，每条记录都生成字典并写入历史"""
+    results = []
+    for i in range(count):
+        record = service.pull_single(session_id, save_history=True)
+        if i >= count - 100:
+            results.append(record)
+    return results
+
+
+def full_records_path(service: GachaService, session_id: str, count: int):
+    """批量抽卡但为每一抽生成记录字典并写入历史"""
+    session = service._get_session(session_id)
+    pool = service._pool_mgr.get(session.current_pool_id)
+    records = PullEngine.pull_batch(session, pool, count)
+    HistoryManager.add_records(session, records)
+    return records[-100:]
+
+
+def lean_path(service: GachaService, session_id: str, count: int):
+    """当前 pull_multi：只生成返回的尾部记录，历史以紧凑段保存"""
+    return service.pull_multi(count, session_id)
+
+
+def measure(name: str, func, count: int):
+    service = GachaService()
+
+    start = time.perf_counter()
+    func(service, f"{name}-time", count)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    results = func(service, f"{name}-mem", count)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+
+    print(f"{name:<14} {elapsed * 1000:>10.1f} {peak / 2 ** 20:>10.1f} {retained / 2 ** 20:>12.1f}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"count={count}")
+    print(f"{'path':<14} {'time (ms)':>10} {'peak (MB)':>10} {'retained (MB)':>12}")
+    measure('scalar', scalar_path, count)
+    measure('full_records', full_records_path, count)
+    measure('lean', lean_path, count)
+
+
+if __name__ == '__main__':
+    main()
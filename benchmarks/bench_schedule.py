@@ -0,0 +1,58 @@
+"""
+卡池日程模拟基准 - 一年日程（26 期，每期泊松预算）按保底继承策略测量耗时与每期UP获取率
+
+运行:
+    python benchmarks/bench_schedule.py [玩家数]
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.pool_manager import PoolManager
+from services.schedule import CARRYOVER_POLICIES, ScheduleService
+from services.simulation import SimulationService
+
+
+WINDOWS = 26
+MEAN_BUDGET = 70
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    pool_mgr = PoolManager(load_local=True)
+    pool_ids = list(pool_mgr.pools)
+    windows = [
+        {'pool_id': pool_ids[i % len(pool_ids)],
+         'budget': {'distribution': 'poisson', 'mean': MEAN_BUDGET}}
+        for i in range(WINDOWS)
+    ]
+    cores = os.cpu_count() or 1
+
+    print(f"windows={WINDOWS} pools={pool_ids} players={players} cores={cores}")
+    print(f"{'carryover':>10} {'time (ms)':>10} {'players/s':>12} {'pulls':>14} {'banners won':>12}")
+    results = {}
+    try:
+        for carryover in CARRYOVER_POLICIES:
+            result = ScheduleService.run(pool_mgr.pools, windows, players, carryover,
+                                         seed=1, workers=cores)
+            results[carryover] = result
+            print(f"{carryover:>10} {result['elapsed_ms']:>10.0f} "
+                  f"{result['players_per_second']:>12,.0f} {result['total_pulls']:>14,} "
+                  f"{result['mean_banners_won']:>12.2f}")
+    finally:
+        SimulationService.shutdown()
+
+    print()
+    print(f"{'window':>6} {'pool':>10} " + " ".join(f"{c:>10}" for c in CARRYOVER_POLICIES))
+    for i in range(min(WINDOWS, 8)):
+        rates = " ".join(
+            f"{results[c]['windows'][i]['featured_acquisition_rate']:>10.2%}"
+            for c in CARRYOVER_POLICIES
+        )
+        print(f"{i:>6} {windows[i]['pool_id']:>10} {rates}")
+
+
+if __name__ == '__main__':
+    main()
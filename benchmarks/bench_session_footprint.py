@@ -0,0 +1,97 @@
+"""
+会话内存占用与单抽开销基准 - 大量在线会话时每个会话的字节数，以及单抽热路径耗时
+
+  1. 创建 N 个会话，每个会话设置种子后十连一次（浏览器首次访问后抽卡的典型状态），
+     其中前 SAMPLE 个会话以 tracemalloc 统计每个会话实际分配的字节数，以及其中在
+     session_manager.py 中分配的部分（会话对象与计数器本身，不含随机数源、草图与历史），
+     并给出全部会话的存储估算值
+  2. 在其中一个会话上反复调用 PullEngine.pull_once（只含抽卡与计数器更新），
+     以及 GachaService.pull_single（含会话查找、加锁、写历史与提交）
+
+运行:
+    python benchmarks/bench_session_footprint.py [sessions] [pulls]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.gacha import GachaService
+from services.pull_engine import PullEngine
+from services.session_manager import SessionManager
+from services.session_store import MemorySessionStore
+
+
+# 单独统计会话对象字节数的会话数
+SAMPLE = 2000
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    pulls = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    service = GachaService()
+    service._session_mgr = SessionManager(MemorySessionStore(memory_budget=0, spill_path=''),
+                                          reap_interval=0, checkpoint_path='')
+    service.pull_multi(10, 'warmup')
+
+    def populate(prefix: str, count: int):
+        for i in range(count):
+            service.set_seed(i, session_id=f"{prefix}-{i}")
+            service.pull_multi(10, f"{prefix}-{i}")
+
+    # 字节数只在 SAMPLE 个会话上用 tracemalloc 统计（追踪 10 万会话的开销会超过会话本身）
+    own = [tracemalloc.Filter(True, '*session_manager.py')]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    own_before = tracemalloc.take_snapshot().filter_traces(own)
+    populate('sample', SAMPLE)
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    own_after = tracemalloc.take_snapshot().filter_traces(own)
+    tracemalloc.stop()
+    session_object = sum(stat.size_diff for stat in own_after.compare_to(own_before, 'filename'))
+    del own_before, own_after
+
+    # 其余会话不追踪，计时在全部会话在线时进行
+    populate('bench', sessions - SAMPLE)
+    estimated = service.get_session_store_stats()['estimated_bytes']
+
+    session = service._get_session('sample-0')
+    pool = service.get_current_pool('sample-0')
+
+    def engine():
+        for _ in range(pulls):
+            PullEngine.pull_once(session, pool)
+
+    def service_pull():
+        for _ in range(pulls // 10):
+            service.pull_single('sample-1')
+
+    engine_time = best_of(engine) / pulls
+    service_time = best_of(service_pull) / (pulls // 10)
+
+    print(f"sessions={sessions} (set_seed + 10 pulls each)")
+    print(f"bytes/session allocated: {allocated / SAMPLE:,.0f}")
+    print(f"bytes/session estimated: {estimated / (sessions + 1):,.0f}")
+    print(f"bytes/session object + counters: {session_object / SAMPLE:,.0f}")
+    print(f"total estimated: {estimated / 2 ** 20:,.1f} MB")
+    print(f"PullEngine.pull_once:      {engine_time * 1e9:,.0f} ns/pull")
+    print(f"GachaService.pull_single:  {service_time * 1e9:,.0f} ns/pull")
+
+
+if __name__ == '__main__':
+    main()
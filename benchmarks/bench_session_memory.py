@@ -0,0 +1,66 @@
+"""
+会话内存预算基准 - 大量会话持续创建时，进程内会话占用是否受内存预算约束
+
+每个会话设置种子后十连一次（与浏览器首次访问后抽卡相同），对比不限制预算与限制预算
+（淘汰的会话写入临时溢出文件）时的估算字节数、实际分配字节数 (tracemalloc) 与单次请求耗时；
+最后重新访问最早的会话，检查从溢出文件恢复的统计与未淘汰时一致。
+
+运行:
+    python benchmarks/bench_session_memory.py [sessions] [budget_mb]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.gacha import GachaService
+from services.session_manager import SessionManager
+from services.session_store import MemorySessionStore
+
+
+def run(sessions: int, budget: int, spill_path: str):
+    service = GachaService()
+    service._session_mgr = SessionManager(
+        MemorySessionStore(memory_budget=budget, spill_path=spill_path), reap_interval=0.2,
+        checkpoint_path=''
+    )
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(sessions):
+        service.set_seed(i, session_id=f"bench-{i}")
+        service.pull_multi(10, f"bench-{i}")
+    elapsed = time.perf_counter() - start
+    time.sleep(0.5)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    first = service.get_statistics('bench-0')
+    stats = service.get_session_store_stats()
+    service._session_mgr.close()
+    return elapsed, allocated, stats, first
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    budget_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    spill_path = os.path.join(tempfile.mkdtemp(), 'spill.sqlite3')
+    print(f"sessions={sessions} budget={budget_mb} MB")
+    print(f"{'budget':<10} {'us/session':>10} {'live':>7} {'estimated (MB)':>15} "
+          f"{'allocated (MB)':>15} {'evictions':>10} {'spilled':>8}")
+    results = []
+    for label, budget in (('unlimited', 0), (f"{budget_mb} MB", budget_mb * 1024 * 1024)):
+        elapsed, allocated, stats, first = run(sessions, budget, spill_path)
+        results.append(first)
+        print(f"{label:<10} {elapsed / sessions * 1e6:>10.1f} {stats['live_sessions']:>7} "
+              f"{stats['estimated_bytes'] / 2 ** 20:>15.1f} {allocated / 2 ** 20:>15.1f} "
+              f"{stats['evictions']:>10} {stats['spilled_sessions']:>8}")
+    print(f"restored session identical: {results[0] == results[1]}")
+
+
+if __name__ == '__main__':
+    main()
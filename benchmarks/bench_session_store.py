@@ -0,0 +1,117 @@
+"""
+共享会话存储基准 - 多个 worker 进程共享 SQLite 会话存储时的吞吐与一致性
+
+启动 N 个独立的服务进程 (werkzeug，模拟 gunicorn worker)，共用同一个 SQLite 会话文件与
+Cookie 签名密钥；客户端线程把同一会话的请求轮流发往不同 worker（最坏情况：每次请求都换 worker），
+结束后检查每个会话的总抽数等于发出的抽数（多 worker 下没有丢失更新）。
+另以单进程内存存储作为基线。
+
+运行:
+    python benchmarks/bench_session_store.py [sessions] [requests_per_session] [count] [workers]
+"""
+import http.client
+import logging
+import multiprocessing
+import os
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def serve(port_queue, store: str, path: str, secret: str):
+    """worker 进程：按指定会话存储启动服务，把端口号放入队列"""
+    os.environ['SESSION_STORE'] = store
+    os.environ['SESSION_STORE_PATH'] = path
+    os.environ['SECRET_KEY'] = secret
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def post(port: int, path: str, body: bytes, cookie: str = None):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/x-protobuf'}
+    if cookie:
+        headers['Cookie'] = cookie
+    conn.request('POST', path, body, headers)
+    response = conn.getresponse()
+    data = response.read()
+    set_cookie = response.getheader('Set-Cookie')
+    conn.close()
+    return data, set_cookie
+
+
+def run(store: str, workers: int, sessions: int, requests: int, count: int):
+    """返回 (耗时, 请求数, 不一致的会话数)"""
+    from proto import gacha_pb2
+
+    path = os.path.join(tempfile.mkdtemp(), 'sessions.sqlite3')
+    secret = secrets.token_hex(32)
+    ctx = multiprocessing.get_context('spawn')
+    port_queue = ctx.Queue()
+    processes = [ctx.Process(target=serve, args=(port_queue, store, path, secret), daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    ports = [port_queue.get(timeout=60) for _ in processes]
+
+    try:
+        body = gacha_pb2.PullMultiRequest(count=count).SerializeToString()
+        cookies = [post(ports[i % workers], '/proto/pull/multi', body)[1].split(';')[0]
+                   for i in range(sessions)]
+
+        def client(i: int):
+            for k in range(requests):
+                response = gacha_pb2.PullMultiResponse()
+                response.ParseFromString(
+                    post(ports[(i + k + 1) % workers], '/proto/pull/multi', body, cookies[i])[0]
+                )
+                assert response.header.success
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(sessions)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        mismatched = 0
+        for i, cookie in enumerate(cookies):
+            stats = gacha_pb2.GetStatsResponse()
+            stats.ParseFromString(post(ports[i % workers], '/proto/stats', b'', cookie)[0])
+            if stats.stats.total_pulls != (requests + 1) * count:
+                mismatched += 1
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+    return elapsed, sessions * requests, mismatched
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+
+    print(f"sessions={sessions} requests/session={requests} count={count} "
+          f"cpus={os.cpu_count()}")
+    print(f"{'store':<8} {'workers':>7} {'time (ms)':>10} {'req/s':>8} {'mismatched':>11}")
+    for store, n in (('memory', 1), ('sqlite', 1), ('sqlite', workers)):
+        elapsed, total, mismatched = run(store, n, sessions, requests, count)
+        print(f"{store:<8} {n:>7} {elapsed * 1000:>10.1f} {total / elapsed:>8.0f} "
+              f"{mismatched:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+分位数草图基准 - 对比保留全部样本后排序与流式草图的耗时、内存与分位数误差
+
+运行:
+    python benchmarks/bench_sketch.py [样本数]
+"""
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.sketch import QuantileSketch
+
+
+QUANTILES = (0.5, 0.9, 0.99)
+CHUNKS = 64
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 20000000
+    rng = np.random.default_rng(1)
+    # 长尾取值：大部分落在精确范围内，少量超出后进入对数分桶
+    values = np.minimum(rng.geometric(1 / 60, samples), 1 << 20).astype(np.int64)
+    chunks = np.array_split(values, CHUNKS)
+
+    started = time.perf_counter()
+    exact = np.quantile(np.concatenate(chunks), QUANTILES, method='lower')
+    exact_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    parts = []
+    for chunk in chunks:
+        sketch = QuantileSketch()
+        sketch.add_many(chunk)
+        parts.append(sketch)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    merged = QuantileSketch()
+    for part in parts:
+        merged.merge(part)
+    estimates = [merged.quantile(q) for q in QUANTILES]
+    merge_ms = (time.perf_counter() - started) * 1000
+
+    print(f"samples={samples:,} chunks={CHUNKS}")
+    print(f"{'method':>8} {'time (ms)':>10} {'bytes':>14}")
+    print(f"{'sort':>8} {exact_ms:>10.0f} {values.nbytes:>14,}")
+    print(f"{'sketch':>8} {build_ms + merge_ms:>10.0f} {len(pickle.dumps(merged)):>14,}")
+    print()
+    for q, truth, est in zip(QUANTILES, exact, estimates):
+        print(f"p{q * 100:g}: exact={truth} sketch={est:.0f} "
+              f"rel_err={abs(est - truth) / truth:.4%}")
+
+
+if __name__ == '__main__':
+    main()
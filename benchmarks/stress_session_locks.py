@@ -0,0 +1,96 @@
+"""
+会话并发压力测试 - 多线程同时对同一批会话单抽 / 多连抽 / 批量抽卡，检查计数器没有丢失更新
+
+每个线程在若干共享会话（所有线程争用）与自己的私有会话之间随机选择，结束后逐个会话检查:
+    total_pulls == 发出的抽数
+    ssr_count + sr_count + r_count == total_pulls
+    随机数源位置 == total_pulls * DRAWS_PER_PULL
+    历史条数 == min(total_pulls, 历史上限)
+并报告私有会话与共享会话的吞吐。线程切换间隔缩短到微秒级以放大竞争。
+
+运行:
+    python benchmarks/stress_session_locks.py [threads] [ops_per_thread] [shared_sessions]
+"""
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import PULL_LIMITS
+from services.gacha import GachaService
+from services.rng import DRAWS_PER_PULL
+
+
+def worker(service: GachaService, thread_id: int, ops: int, shared: int, issued: dict,
+           issued_lock: threading.Lock):
+    rng = random.Random(thread_id)
+    counts = {}
+    for _ in range(ops):
+        if rng.random() < 0.8:
+            session_id = f"shared-{rng.randrange(shared)}"
+        else:
+            session_id = f"private-{thread_id}"
+        kind = rng.random()
+        if kind < 0.5:
+            service.pull_single(session_id)
+            pulls = 1
+        elif kind < 0.9:
+            pulls = rng.choice((10, 10, 50))
+            service.pull_multi(pulls, session_id, return_limit=0)
+        else:
+            pulls = 1500
+            service.pull_batch_sessions([{'session_id': session_id, 'count': pulls}])
+        counts[session_id] = counts.get(session_id, 0) + pulls
+    with issued_lock:
+        for session_id, pulls in counts.items():
+            issued[session_id] = issued.get(session_id, 0) + pulls
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    shared = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    sys.setswitchinterval(1e-6)
+    service = GachaService()
+    issued, issued_lock = {}, threading.Lock()
+    pool = [threading.Thread(target=worker, args=(service, i, ops, shared, issued, issued_lock))
+            for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    errors = 0
+    for session_id, expected in sorted(issued.items()):
+        session = service._get_session(session_id)
+        stats = service.get_statistics(session_id)
+        problems = []
+        if stats['total_pulls'] != expected:
+            problems.append(f"total_pulls {stats['total_pulls']} != {expected}")
+        if stats['ssr_count'] + stats['sr_count'] + stats['r_count'] != stats['total_pulls']:
+            problems.append("rarity counts do not add up")
+        if session.rng.position != expected * DRAWS_PER_PULL:
+            problems.append(f"rng position {session.rng.position} != {expected * DRAWS_PER_PULL}")
+        history = len(session.stats['pull_history'])
+        if history != min(expected, PULL_LIMITS['max_history_size']):
+            problems.append(f"history {history} != {min(expected, PULL_LIMITS['max_history_size'])}")
+        if problems:
+            errors += 1
+            print(f"{session_id}: {'; '.join(problems)}")
+
+    total_ops = threads * ops
+    print(f"threads={threads} ops/thread={ops} shared sessions={shared}")
+    print(f"{total_ops} ops in {elapsed:.2f}s ({total_ops / elapsed:.0f} ops/s), "
+          f"{sum(issued.values())} pulls")
+    print(f"sessions checked: {len(issued)}, inconsistent: {errors}")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -44,7 +44,8 @@ POOL_TYPES = {
 PITY_CONFIG = {
     'soft_pity': 74,      # 软保底开始抽数
     'hard_pity': 90,      # 硬保底抽数
-    'pity_increase': 0.06  # 软保底后每抽增加概率
+    'pity_increase': 0.06, # 软保底后每抽增加概率
+    'featured_rate': 0.5   # 出SSR时为UP卡的概率
 }
 
 # 抽卡限制配置
@@ -52,7 +53,15 @@ PULL_LIMITS = {
     'max_single_pull_local': 100000,    # 本地模式单次最大抽卡数
     'max_single_pull_server': 100000,  # 服务端模式单次最大抽卡数
     'max_history_size': 50000,          # 历史记录最大存储数量
-    'max_return_results': 100          # API返回结果最大数量
+    'max_return_results': 100,         # API返回结果最大数量
+    'batch_pull_threshold': 1000,      # 超过该抽数时使用 NumPy 批量抽卡
+    'max_stats_only_pull': 100000000   # 仅统计模式单次最大抽卡数
+}
+
+# 精确概率计算配置
+ODDS_CONFIG = {
+    'max_copies': 20,      # 单次计算的最大目标卡数量
+    'cache_size': 256      # 概率结果缓存条数
 }
 
 # 服务器配置
@@ -68,6 +77,137 @@ SERVER_CONFIG = {
     'workers': int(os.environ.get('WORKERS', 4)),  # 生产环境 worker 数量
 }
 
+# 蒙特卡洛模拟配置
+SIMULATION_CONFIG = {
+    'max_workers': int(os.environ.get('SIM_WORKERS', os.cpu_count() or 1)),  # 模拟进程数
+    'chunk_players': 10000,        # 每个模拟任务的玩家数（决定随机数流划分）
+    'inline_threshold': 1000000,   # 玩家数 x 抽数低于此值时在当前进程计算
+    'max_players': 1000000,        # 单次模拟最大玩家数
+    'max_pulls': 10000,            # 单次模拟每名玩家最大抽数
+    # 自适应精度模拟
+    'adaptive_chunk_players': 2000,    # 每批玩家数（置信区间按批次估计）
+    'adaptive_round_chunks': 8,        # 每轮并行计算的批数，每轮结束后检查精度
+    'adaptive_time_budget': 10.0,      # 默认时间预算（秒）
+    'adaptive_max_time_budget': 300.0, # 最大时间预算（秒）
+    'adaptive_confidence': 0.95,       # 默认置信水平
+    'adaptive_tolerance': {            # 默认目标精度（置信区间半宽，绝对值）
+        'ssr_rate': 0.0001,
+        'featured_share': 0.001,
+        'mean_pulls_to_ssr': 0.1,
+    },
+}
+
+# 参数扫描配置
+SWEEP_CONFIG = {
+    'max_workers': SIMULATION_CONFIG['max_workers'],  # 并行进程数
+    'max_points': 5000,          # 单次扫描最大参数点数
+    'max_hard_pity': 100000,     # hard_pity 取值上限
+    'exact_max_pity': 5000,      # auto 模式下保底链不超过该长度时精确计算
+    'sim_players': 20000,        # 模拟评估时每个参数点的玩家数
+    'parallel_threshold': 64,    # 新增参数点少于此数时在当前进程计算
+    'cache_size': 20000,         # 参数点结果缓存条数
+}
+
+# 玩家群体模拟配置（预算单位：每期卡池的抽数）
+POPULATION_CONFIG = {
+    'max_workers': SIMULATION_CONFIG['max_workers'],  # 并行进程数
+    'chunk_players': 50000,      # 每个任务的玩家数（决定随机数流划分）
+    'inline_threshold': 100000,  # 玩家数低于此值时在当前进程计算
+    'max_players': 10000000,     # 单次模拟最大玩家数
+    'max_budget': 5000,          # 单名玩家预算上限
+    'max_copies': 10,            # UP 卡数量直方图上限（最后一格为不少于该值）
+    'segments': [
+        {'name': 'f2p', 'share': 0.80,
+         'budget': {'distribution': 'poisson', 'mean': 40}},
+        {'name': 'dolphin', 'share': 0.17,
+         'budget': {'distribution': 'lognormal', 'median': 120, 'sigma': 0.4}},
+        {'name': 'whale', 'share': 0.03,
+         'budget': {'distribution': 'lognormal', 'median': 400, 'sigma': 0.5}},
+    ],
+}
+
+# 卡池日程模拟配置（预算单位：每个窗口的抽数）
+SCHEDULE_CONFIG = {
+    'max_workers': SIMULATION_CONFIG['max_workers'],  # 并行进程数
+    'chunk_players': 100000,     # 每个任务的玩家数（决定随机数流划分）
+    'inline_threshold': 100000,  # 玩家数低于此值时在当前进程计算
+    'max_players': 10000000,     # 单次模拟最大玩家数
+    'max_windows': 100,          # 日程最大窗口数
+    'max_copies': 10,            # 每个窗口 UP 卡数量直方图上限（最后一格为不少于该值）
+    'carryover': 'carry',        # 默认保底继承策略 (carry/reset/pool_type)
+}
+
+# 流式分位数草图配置（会话统计与模拟结果中的间隔 / 连败分布）
+SKETCH_CONFIG = {
+    'exact_limit': 1024,         # 小于该值的取值精确计数
+    'relative_accuracy': 0.01,   # 超出精确范围的分位数相对误差
+    'quantiles': (0.5, 0.9, 0.99),  # 统计接口返回的分位数
+}
+
+# 结果缓存配置（概率计算与固定种子的模拟结果；内存 LRU + 多进程共享的 SQLite 文件）
+CACHE_CONFIG = {
+    'memory_entries': 1024,              # 每个命名空间内存层最大条数
+    'memory_bytes': 64 * 1024 * 1024,    # 每个命名空间内存层最大序列化字节数
+    'disk_path': os.environ.get(         # 磁盘层文件路径，设为空字符串关闭磁盘层
+        'RESULT_CACHE_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache', 'results.sqlite3')
+    ),
+    'disk_bytes': 1024 * 1024 * 1024,    # 磁盘层最大字节数（所有命名空间合计）
+    'disk_timeout': 5.0,                 # SQLite 锁等待超时（秒）
+}
+
+# 随机数源配置
+RNG_CONFIG = {
+    'backend': os.environ.get('RNG_BACKEND', 'pcg64'),  # stdlib / pcg64 / philox
+}
+
+# 会话配置
+SESSION_CONFIG = {
+    'fork_ttl': 1800,    # 分叉会话空闲超过该时间（秒）后自动回收
+    'max_forks': 10000,  # 分叉会话数量上限，超出时回收最久未使用的分叉
+    # 会话存储: memory（进程内，单进程部署）/ sqlite（多个 gunicorn worker 共享的本地文件）
+    'store': os.environ.get('SESSION_STORE', 'memory'),
+    'store_path': os.environ.get(
+        'SESSION_STORE_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sessions', 'sessions.sqlite3')
+    ),
+    'store_timeout': 5.0,           # SQLite 锁等待超时（秒）
+    'history_compact_rows': 1000,   # 单个会话历史日志超过该行数时整体重写
+    'commit_retries': 5,            # 会话被其他 worker 并发修改时的最大重试次数
+    # 过期回收与内存预算（后台回收线程每 reap_interval 秒检查一次，0 表示不启动回收线程）
+    'session_ttl': int(os.environ.get('SESSION_TTL', 7 * 24 * 3600)),  # 会话空闲超过该时间（秒）后删除
+    'reap_interval': 60,
+    'memory_budget': int(os.environ.get('SESSION_MEMORY_BUDGET', 512 * 1024 * 1024)),  # 本进程会话估算字节数上限，0 表示不限制
+    'evict_target': 0.9,            # 超出预算时淘汰到预算的该比例
+    'spill_path': os.environ.get(   # 进程内存储淘汰的会话写入该文件，再次访问时恢复；空字符串表示直接丢弃
+        'SESSION_SPILL_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sessions', 'spill.sqlite3')
+    ),
+    # 进程内存储的检查点：修改过的会话定期写入该文件，重启后首次访问时恢复；空字符串表示不写检查点
+    'checkpoint_path': os.environ.get(
+        'SESSION_CHECKPOINT_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sessions', 'checkpoint.sqlite3')
+    ),
+    'checkpoint_interval': float(os.environ.get('SESSION_CHECKPOINT_INTERVAL', 30)),  # 写入间隔（秒），0 表示只在退出时写入
+    'checkpoint_batch': 500,        # 每个写入事务的会话数（事务期间从检查点恢复会话需要等待）
+}
+
+# 多会话批量抽卡配置 (/proto/pull/batch)
+BATCH_PULL_CONFIG = {
+    'max_workers': int(os.environ.get('BATCH_PULL_WORKERS', min(4, os.cpu_count() or 1))),  # 线程数
+    'max_jobs': 1000,              # 单次请求最大任务数
+    'max_total_pulls': 10000000,   # 单次请求所有任务合计最大抽数
+    'inline_threshold': 100000,    # 合计抽数低于此值时在请求线程中顺序执行
+}
+
+# 抽卡历史配置
+HISTORY_CONFIG = {
+    # replay: 只保存随机数源位置与保底计数，读取历史 / 导出时重放（需 pcg64 / philox 后端）
+    # compact: 保存记录字典与紧凑记录段
+    'mode': os.environ.get('HISTORY_MODE', 'replay'),
+    'replay_segment_pulls': 10000,  # 单个重放段最大抽数（读取最近记录时最多重放的抽数）
+}
+
 # 游戏服务器连接配置
 GAME_SERVER_CONFIG = {
     'host': os.environ.get('GAME_HOST', '10.20.200.20'),
@@ -2,6 +2,6 @@
 数据模型模块
 """
 from .card import Card
-from .pool import Pool
+from .pool import Pool, PoolIndex
 
-__all__ = ['Card', 'Pool']
+__all__ = ['Card', 'Pool', 'PoolIndex']
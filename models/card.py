@@ -2,7 +2,7 @@ class Card:
     """卡牌类"""
     
     def __init__(self, card_id: str, name: str, rarity: str, pool_id: str = None, 
-                 is_featured: bool = False, image_url: str = None):
+                 is_featured: bool = False, image_url: str = None, weight: float = 1.0):
         """
         初始化卡牌
         
@@ -13,6 +13,7 @@ class Card:
             pool_id: 所属卡池ID
             is_featured: 是否为卡池特定UP卡
             image_url: 卡牌图片URL
+            weight: 抽取权重，同品阶内的相对概率 (默认 1)
         """
         self.card_id = card_id
         self.name = name
@@ -20,10 +21,11 @@ class Card:
         self.pool_id = pool_id
         self.is_featured = is_featured
         self.image_url = image_url or f"/static/images/cards/{card_id}.png"
+        self.weight = weight
     
     def to_dict(self) -> dict:
-        """转换为字典格式"""
-        return {
+        """转换为字典格式（权重为默认值时省略）"""
+        data = {
             'card_id': self.card_id,
             'name': self.name,
             'rarity': self.rarity,
@@ -31,6 +33,9 @@ class Card:
             'is_featured': self.is_featured,
             'image_url': self.image_url
         }
+        if self.weight != 1.0:
+            data['weight'] = self.weight
+        return data
     
     @classmethod
     def from_dict(cls, data: dict) -> 'Card':
@@ -41,7 +46,8 @@ class Card:
             rarity=data.get('rarity'),
             pool_id=data.get('pool_id'),
             is_featured=data.get('is_featured', False),
-            image_url=data.get('image_url')
+            image_url=data.get('image_url'),
+            weight=float(data.get('weight', 1.0))
         )
     
     def __repr__(self):
@@ -1,15 +1,63 @@
 """
 卡池模型 - 定义卡池数据结构
 """
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from .card import Card
 
+
+class PoolIndex:
+    """卡池只读索引 - 加载卡池时一次性构建，供抽卡热路径 O(1) 查询"""
+
+    __slots__ = ('by_rarity', 'featured_by_rarity', 'featured_positions', 'positions', 'rules',
+                 'alias_tables', 'card_dicts', 'fingerprint')
+
+    def __init__(self, cards: List[Card]):
+        """
+        构建索引
+
+        Args:
+            cards: 卡池中的卡牌列表
+        """
+        by_rarity: Dict[str, List[Card]] = {}
+        for card in cards:
+            by_rarity.setdefault(card.rarity, []).append(card)
+
+        # 品阶 -> 卡牌元组
+        self.by_rarity: Dict[str, Tuple[Card, ...]] = {
+            rarity: tuple(group) for rarity, group in by_rarity.items()
+        }
+        # 品阶 -> UP卡牌元组
+        self.featured_by_rarity: Dict[str, Tuple[Card, ...]] = {
+            rarity: tuple(c for c in group if c.is_featured)
+            for rarity, group in by_rarity.items()
+        }
+        # 品阶 -> UP卡在该品阶元组中的下标
+        self.featured_positions: Dict[str, Tuple[int, ...]] = {
+            rarity: tuple(i for i, c in enumerate(group) if c.is_featured)
+            for rarity, group in by_rarity.items()
+        }
+        # 卡牌ID -> 在卡池卡牌列表中的下标
+        self.positions: Dict[str, int] = {}
+        for i, card in enumerate(cards):
+            self.positions.setdefault(card.card_id, i)
+        # 编译后的保底规则表（由 services.pity_rules 按需填充）
+        self.rules = None
+        # (品阶, 是否UP子集) -> 按权重选牌的别名表（由 services.alias_table 按需填充）
+        self.alias_tables: Dict = {}
+        # 品阶 -> 卡牌字典元组（批量抽卡记录共用，只读；由 services.pull_engine 按需填充）
+        self.card_dicts: Dict[str, Tuple[Dict, ...]] = {}
+        # 卡池完整定义的哈希（由 services.result_cache 按需填充）
+        self.fingerprint = None
+
+
 class Pool:
     """卡池类"""
     
     def __init__(self, pool_id: str, name: str, pool_type: str,
                  description: str = '', cards: List[Card] = None,
-                 featured_ssr: List[str] = None, library_id: str = None):
+                 featured_ssr: List[str] = None, library_id: str = None,
+                 rarity_probability: Dict[str, float] = None,
+                 pity_config: Dict = None, featured_rate: float = None):
         """
         初始化卡池
         
@@ -21,6 +69,9 @@ class Pool:
             cards: 卡池包含的卡牌列表
             featured_ssr: 特定UP的SSR卡牌ID列表
             library_id: 卡库ID（真实卡库标识）
+            rarity_probability: 覆盖全局 CARD_RARITY 的品阶概率 (可选)
+            pity_config: 覆盖全局 PITY_CONFIG 的保底配置 (可选)
+            featured_rate: 出SSR时为UP卡的概率 (可选)
         """
         self.pool_id = pool_id
         self.name = name
@@ -29,18 +80,33 @@ class Pool:
         self.cards = cards or []
         self.featured_ssr = featured_ssr or []
         self.library_id = library_id or f"LIB_{pool_id}"
+        self.rarity_probability = rarity_probability
+        self.pity_config = pity_config
+        self.featured_rate = featured_rate
+        self.index = PoolIndex(self.cards)
+    
+    def reindex(self):
+        """重建只读索引（直接修改 cards 后需调用），新索引整体替换旧索引"""
+        self.index = PoolIndex(self.cards)
+    
+    def get_cards_by_rarity(self, rarity: str) -> Tuple[Card, ...]:
+        """获取指定品阶的卡牌元组"""
+        return self.index.by_rarity.get(rarity, ())
     
-    def get_cards_by_rarity(self, rarity: str) -> List[Card]:
-        """获取指定品阶的卡牌列表"""
-        return [card for card in self.cards if card.rarity == rarity]
+    def get_featured_cards(self, rarity: str = None) -> Tuple[Card, ...]:
+        """获取UP卡牌元组（可按品阶筛选）"""
+        if rarity is not None:
+            return self.index.featured_by_rarity.get(rarity, ())
+        return tuple(card for card in self.cards if card.is_featured)
     
-    def get_featured_cards(self) -> List[Card]:
-        """获取UP卡牌列表"""
-        return [card for card in self.cards if card.is_featured]
+    def get_card(self, card_id: str) -> Optional[Card]:
+        """按卡牌ID获取卡牌"""
+        pos = self.index.positions.get(card_id)
+        return self.cards[pos] if pos is not None else None
     
     def to_dict(self) -> dict:
         """转换为字典格式"""
-        return {
+        data = {
             'pool_id': self.pool_id,
             'name': self.name,
             'pool_type': self.pool_type,
@@ -49,6 +115,13 @@ class Pool:
             'featured_ssr': self.featured_ssr,
             'library_id': self.library_id
         }
+        if self.rarity_probability is not None:
+            data['rarity_probability'] = self.rarity_probability
+        if self.pity_config is not None:
+            data['pity'] = self.pity_config
+        if self.featured_rate is not None:
+            data['featured_rate'] = self.featured_rate
+        return data
     
     @classmethod
     def from_dict(cls, data: dict) -> 'Pool':
@@ -61,7 +134,10 @@ class Pool:
             description=data.get('description', ''),
             cards=cards,
             featured_ssr=data.get('featured_ssr', []),
-            library_id=data.get('library_id')
+            library_id=data.get('library_id'),
+            rarity_probability=data.get('rarity_probability'),
+            pity_config=data.get('pity'),
+            featured_rate=data.get('featured_rate')
         )
     
     def __repr__(self):
@@ -34,6 +34,7 @@ class ProtoConverter:
         proto_card.pool_id = card.pool_id or ""
         proto_card.is_featured = card.is_featured or False
         proto_card.image_url = card.image_url or ""
+        proto_card.weight = card.weight
         return proto_card
     
     @staticmethod
@@ -45,7 +46,8 @@ class ProtoConverter:
             rarity=proto_card.rarity,
             pool_id=proto_card.pool_id,
             is_featured=proto_card.is_featured,
-            image_url=proto_card.image_url
+            image_url=proto_card.image_url,
+            weight=proto_card.weight or 1.0
         )
     
     @staticmethod
@@ -54,13 +56,15 @@ class ProtoConverter:
         if not PROTO_AVAILABLE:
             raise RuntimeError("Protobuf module not available")
             
+        # Card.to_dict 中未设置的字段为 None
         proto_card = gacha_pb2.Card()
-        proto_card.card_id = card_dict.get('card_id', "")
-        proto_card.name = card_dict.get('name', "")
-        proto_card.rarity = card_dict.get('rarity', "")
-        proto_card.pool_id = card_dict.get('pool_id', "")
-        proto_card.is_featured = card_dict.get('is_featured', False)
-        proto_card.image_url = card_dict.get('image_url', "")
+        proto_card.card_id = card_dict.get('card_id') or ""
+        proto_card.name = card_dict.get('name') or ""
+        proto_card.rarity = card_dict.get('rarity') or ""
+        proto_card.pool_id = card_dict.get('pool_id') or ""
+        proto_card.is_featured = bool(card_dict.get('is_featured', False))
+        proto_card.image_url = card_dict.get('image_url') or ""
+        proto_card.weight = card_dict.get('weight', 1.0) or 1.0
         return proto_card
     
     # ============ Pool 转换 ============
@@ -121,8 +125,62 @@ class ProtoConverter:
         for card_id, count in stats.get('featured_ssr_counts', {}).items():
             proto_stats.featured_ssr_counts[card_id] = count
         
+        # 转换分位数摘要 (空草图的字段保持默认值)
+        for metric, summary in stats.get('quantiles', {}).items():
+            entry = proto_stats.quantiles[metric]
+            entry.count = summary['count']
+            for key in ('mean', 'min', 'max', 'p50', 'p90', 'p99'):
+                if summary.get(key) is not None:
+                    setattr(entry, key, summary[key])
+        
         return proto_stats
     
+    # ============ Batch Pull 转换 ============
+    
+    @staticmethod
+    def batch_pull_jobs_from_proto(jobs) -> List[Dict[str, Any]]:
+        """将 BatchPullJob 列表转换为批量抽卡任务"""
+        return [
+            {
+                'session_id': job.session_id,
+                'pool_id': job.pool_id,
+                'count': job.count,
+                'stats_only': job.stats_only,
+                'return_limit': job.return_limit,
+            }
+            for job in jobs
+        ]
+    
+    @staticmethod
+    def batch_pull_to_proto(result: Dict[str, Any]) -> 'gacha_pb2.BatchPullResponse':
+        """将多会话批量抽卡结果转换为 Protobuf 响应 (不含响应头)"""
+        if not PROTO_AVAILABLE:
+            raise RuntimeError("Protobuf module not available")
+        
+        response = gacha_pb2.BatchPullResponse()
+        cards: Dict[int, Any] = {}
+        for item in result.get('results', []):
+            entry = response.results.add()
+            entry.session_id = item['session_id']
+            entry.success = item['success']
+            if not item['success']:
+                entry.error_code = item.get('error_code', 500)
+                entry.error_msg = item.get('message', "")
+                continue
+            stats = item['stats']
+            entry.stats.CopyFrom(ProtoConverter.stats_to_proto(stats, stats.get('pity_counter', 0)))
+            for record in item.get('records', []):
+                card = record['card']
+                # 批量抽卡记录共用同一组卡牌字典，每张卡只转换一次
+                proto_card = cards.get(id(card))
+                if proto_card is None:
+                    proto_card = cards[id(card)] = ProtoConverter.card_dict_to_proto(card)
+                entry.cards.append(proto_card)
+        response.total_pulls = result.get('total_pulls', 0)
+        response.workers = result.get('workers', 0)
+        response.elapsed_ms = result.get('elapsed_ms', 0.0)
+        return response
+    
     # ============ Response Header ============
     
     @staticmethod
@@ -170,3 +228,226 @@ class ProtoConverter:
             records.append(record)
         
         return records
+    
+    # ============ Odds 转换 ============
+    
+    @staticmethod
+    def odds_to_proto(odds: Dict[str, Any]) -> 'gacha_pb2.GetOddsResponse':
+        """将概率计算结果转换为 Protobuf 响应 (不含响应头)"""
+        if not PROTO_AVAILABLE:
+            raise RuntimeError("Protobuf module not available")
+        
+        response = gacha_pb2.GetOddsResponse()
+        response.pool_id = odds.get('pool_id', "")
+        response.ssr_rate = odds.get('ssr_rate', 0.0)
+        response.expected_pulls_to_ssr = odds.get('expected_pulls_to_ssr', 0.0)
+        response.ssr_pmf.extend(odds.get('ssr_pmf', []))
+        response.ssr_cdf.extend(odds.get('ssr_cdf', []))
+        response.featured_share = odds.get('featured_share', 0.0)
+        response.featured_rate = odds.get('featured_rate', 0.0)
+        response.copies = odds.get('copies', 0)
+        response.expected_pulls_to_copies = odds.get('expected_pulls_to_copies') or 0.0
+        for label, pulls in odds.get('copies_quantiles', {}).items():
+            response.copies_quantiles[label] = pulls
+        return response
+    
+    @staticmethod
+    def copies_distribution_to_proto(result: Dict[str, Any]) -> 'gacha_pb2.GetCopiesDistributionResponse':
+        """将多份UP卡抽数分布转换为 Protobuf 响应 (不含响应头)"""
+        if not PROTO_AVAILABLE:
+            raise RuntimeError("Protobuf module not available")
+        
+        response = gacha_pb2.GetCopiesDistributionResponse()
+        response.pool_id = result.get('pool_id', "")
+        response.start_pity = result.get('start_pity', 0)
+        response.max_copies = result.get('max_copies', 0)
+        for target in result.get('targets', []):
+            proto_target = response.targets.add()
+            proto_target.card_id = target.get('card_id') or ""
+            proto_target.featured_share = target.get('featured_share', 0.0)
+            for row in target.get('copies', []):
+                proto_row = proto_target.rows.add()
+                proto_row.copies = row['copies']
+                proto_row.expected_pulls = row['expected_pulls']
+                for label, pulls in row.get('quantiles', {}).items():
+                    proto_row.quantiles[label] = pulls
+                proto_row.cdf.extend(row.get('cdf', []))
+        return response
+    
+    # ============ Simulation 转换 ============
+    
+    @staticmethod
+    def simulation_to_proto(result: Dict[str, Any]) -> 'gacha_pb2.SimulateResponse':
+        """将模拟结果转换为 Protobuf 响应 (不含响应头)"""
+        if not PROTO_AVAILABLE:
+            raise RuntimeError("Protobuf module not available")
+        
+        response = gacha_pb2.SimulateResponse()
+        response.pool_id = result.get('pool_id', "")
+        response.players = result.get('players', 0)
+        response.pulls_per_player = result.get('pulls_per_player', 0)
+        response.seed = str(result.get('seed', ""))
+        for rarity, count in result.get('rarity_counts', {}).items():
+            response.rarity_counts[rarity] = count
+        response.pulls_to_ssr.extend(result.get('pulls_to_ssr', []))
+        response.featured_copies.extend(result.get('featured_copies', []))
+        response.pulls_to_featured.extend(result.get('pulls_to_featured', []))
+        response.never_featured = result.get('never_featured', 0)
+        response.end_pity.extend(result.get('end_pity', []))
+        for card_id, count in result.get('featured_ssr_counts', {}).items():
+            response.featured_ssr_counts[card_id] = count
+        response.elapsed_ms = result.get('elapsed_ms', 0.0)
+        response.rng_backend = result.get('rng_backend', "")
+        return response
+    
+    # ============ Population 转换 ============
+    
+    @staticmethod
+    def population_segments_from_proto(segments) -> List[Dict[str, Any]]:
+        """将 PopulationSegment 列表转换为分层配置"""
+        result = []
+        for segment in segments:
+            budget = dict(segment.params)
+            budget['distribution'] = segment.distribution
+            result.append({'name': segment.name, 'share': segment.share, 'budget': budget})
+        return result
+    
+    @staticmethod
+    def population_to_proto(result: Dict[str, Any]) -> 'gacha_pb2.PopulationResponse':
+        """将群体模拟结果转换为 Protobuf 响应 (不含响应头)"""
+        if not PROTO_AVAILABLE:
+            raise RuntimeError("Protobuf module not available")
+        
+        response = gacha_pb2.PopulationResponse()
+        response.pool_id = result.get('pool_id', "")
+        response.players = result.get('players', 0)
+        response.total_pulls = result.get('total_pulls', 0)
+        for row in result.get('segments', []):
+            segment = response.segments.add()
+            segment.segment = row['segment']
+            segment.players = row['players']
+            segment.mean_budget = row['mean_budget']
+            segment.ssr_rate = row['ssr_rate']
+            segment.featured_acquisition_rate = row['featured_acquisition_rate']
+            segment.mean_featured_copies = row['mean_featured_copies']
+            segment.featured_copies.extend(row['featured_copies'])
+            segment.pity_carryover.extend(row['pity_carryover'])
+            segment.mean_pity_carryover = row['mean_pity_carryover']
+        response.seed = str(result.get('seed', ""))
+        response.rng_backend = result.get('rng_backend', "")
+        response.elapsed_ms = result.get('elapsed_ms', 0.0)
+        response.players_per_second = result.get('players_per_second') or 0.0
+        return response
+    
+    @staticmethod
+    def schedule_windows_from_proto(windows) -> List[Dict[str, Any]]:
+        """将 ScheduleWindow 列表转换为日程窗口配置"""
+        result = []
+        for window in windows:
+            item = {'pool_id': window.pool_id, 'stop_on_featured': window.stop_on_featured}
+            if window.distribution:
+                item['budget'] = dict(window.params)
+                item['budget']['distribution'] = window.distribution
+            else:
+                item['pulls'] = window.pulls
+            result.append(item)
+        return result
+    
+    @staticmethod
+    def schedule_to_proto(result: Dict[str, Any]) -> 'gacha_pb2.ScheduleResponse':
+        """将日程模拟结果转换为 Protobuf 响应 (不含响应头)"""
+        if not PROTO_AVAILABLE:
+            raise RuntimeError("Protobuf module not available")
+        
+        response = gacha_pb2.ScheduleResponse()
+        response.players = result.get('players', 0)
+        response.total_pulls = result.get('total_pulls', 0)
+        response.carryover = result.get('carryover', "")
+        for row in result.get('windows', []):
+            window = response.windows.add()
+            window.window = row['window']
+            window.pool_id = row['pool_id']
+            window.pool_type = row['pool_type'] or ""
+            window.participants = row['participants']
+            window.mean_pulls = row['mean_pulls']
+            window.ssr_rate = row['ssr_rate']
+            window.featured_acquisition_rate = row['featured_acquisition_rate']
+            window.participant_acquisition_rate = row['participant_acquisition_rate']
+            window.mean_featured_copies = row['mean_featured_copies']
+            window.featured_copies.extend(row['featured_copies'])
+            window.mean_entering_pity = row['mean_entering_pity']
+            window.mean_exit_pity = row['mean_exit_pity']
+            window.exit_pity.extend(row['exit_pity'])
+        response.banners_won.extend(result.get('banners_won', []))
+        response.mean_banners_won = result.get('mean_banners_won', 0.0)
+        response.seed = str(result.get('seed', ""))
+        response.rng_backend = result.get('rng_backend', "")
+        response.elapsed_ms = result.get('elapsed_ms', 0.0)
+        response.players_per_second = result.get('players_per_second') or 0.0
+        return response
+    
+    # ============ Sweep 转换 ============
+    
+    @staticmethod
+    def sweep_axes_from_proto(axes) -> Dict[str, Any]:
+        """将 SweepAxis 列表转换为参数网格字典"""
+        grid = {}
+        for axis in axes:
+            if axis.values:
+                grid[axis.name] = list(axis.values)
+            else:
+                grid[axis.name] = {'start': axis.start, 'stop': axis.stop, 'step': axis.step}
+        return grid
+    
+    @staticmethod
+    def sweep_to_proto(result: Dict[str, Any]) -> 'gacha_pb2.SweepResponse':
+        """将参数扫描结果转换为 Protobuf 响应 (不含响应头)"""
+        if not PROTO_AVAILABLE:
+            raise RuntimeError("Protobuf module not available")
+        
+        response = gacha_pb2.SweepResponse()
+        response.pool_id = result.get('pool_id', "")
+        response.copies = result.get('copies', 0)
+        response.method = result.get('method', "")
+        response.points = result.get('points', 0)
+        response.computed = result.get('computed', 0)
+        response.cached = result.get('cached', 0)
+        for row in result.get('results', []):
+            point = response.results.add()
+            for name, value in row.get('params', {}).items():
+                point.params[name] = value
+            point.method = row.get('method') or ""
+            point.error = row.get('error') or ""
+            for field in ('ssr_rate', 'sr_rate', 'expected_pulls_to_ssr', 'featured_share',
+                          'featured_rate', 'expected_pulls_to_copies',
+                          'expected_cost_to_ssr', 'expected_cost_to_copies'):
+                setattr(point, field, row.get(field) or 0.0)
+            for label, pulls in row.get('copies_quantiles', {}).items():
+                point.copies_quantiles[label] = pulls
+        response.elapsed_ms = result.get('elapsed_ms', 0.0)
+        return response
+    
+    @staticmethod
+    def adaptive_simulation_to_proto(result: Dict[str, Any]) -> 'gacha_pb2.AdaptiveSimulateResponse':
+        """将自适应精度模拟结果转换为 Protobuf 响应 (不含响应头)"""
+        if not PROTO_AVAILABLE:
+            raise RuntimeError("Protobuf module not available")
+        
+        response = gacha_pb2.AdaptiveSimulateResponse()
+        response.pool_id = result.get('pool_id', "")
+        response.players = result.get('players', 0)
+        response.total_pulls = result.get('total_pulls', 0)
+        response.batches = result.get('batches', 0)
+        response.seed = str(result.get('seed', ""))
+        response.rng_backend = result.get('rng_backend', "")
+        response.confidence = result.get('confidence', 0.0)
+        response.converged = result.get('converged', False)
+        response.stop_reason = result.get('stop_reason', "")
+        for name, metric in result.get('metrics', {}).items():
+            estimate = response.metrics[name]
+            estimate.estimate = metric.get('estimate') or 0.0
+            estimate.half_width = metric.get('half_width') or 0.0
+            estimate.tolerance = metric.get('tolerance', 0.0)
+            estimate.converged = metric.get('converged', False)
+        response.elapsed_ms = result.get('elapsed_ms', 0.0)
+        return response
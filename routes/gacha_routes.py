@@ -1,12 +1,13 @@
 """
 基础路由 - 主页面和本地模式数据服务
 """
-from flask import Blueprint, jsonify, render_template, session, send_from_directory
+from flask import Blueprint, jsonify, render_template, request, session, send_from_directory
 from pathlib import Path
 import uuid
 
 from services.gacha import gacha_service
-from config import GAME_SERVER_CONFIG
+from config import (GAME_SERVER_CONFIG, ODDS_CONFIG, POPULATION_CONFIG, SCHEDULE_CONFIG,
+                    SIMULATION_CONFIG)
 
 # 创建蓝图
 gacha_bp = Blueprint('gacha', __name__)
@@ -62,3 +63,319 @@ def get_server_status():
         'type': 'game_tcp_rpc',
         'message': '游戏服务器已连接' if connected else '游戏服务器未连接, 请通过连接面板连接'
     })
+
+
+@gacha_bp.route('/api/odds/<pool_id>', methods=['GET'])
+def get_odds(pool_id):
+    """
+    获取卡池的精确概率信息（保底马尔可夫链计算，结果带缓存）
+
+    查询参数:
+        copies: 目标UP卡数量，默认 1
+        card_id: 指定目标卡ID，不填表示任意UP卡
+        pity: 起始保底计数，默认 0
+    """
+    try:
+        copies = max(1, min(request.args.get('copies', 1, type=int), ODDS_CONFIG['max_copies']))
+        start_pity = max(0, request.args.get('pity', 0, type=int))
+        card_id = request.args.get('card_id') or None
+        odds = gacha_service.get_odds(pool_id, copies, card_id, start_pity)
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+    if odds is None:
+        return jsonify({'success': False, 'message': '卡池不存在'}), 404
+    return jsonify({'success': True, 'odds': odds})
+
+
+@gacha_bp.route('/api/odds/<pool_id>/copies', methods=['GET'])
+def get_copies_distribution(pool_id):
+    """
+    获取 1..N 份UP卡所需抽数的分布（任意UP卡及每张UP卡，FFT 一次求出，结果带缓存）
+
+    查询参数:
+        max_copies: 最大份数 N，默认配置上限
+        pity: 起始保底计数，默认 0
+        cdf: 为 1 时返回每个份数的累计分布
+    """
+    try:
+        max_copies = max(1, min(
+            request.args.get('max_copies', ODDS_CONFIG['max_copies'], type=int),
+            ODDS_CONFIG['max_copies']
+        ))
+        start_pity = max(0, request.args.get('pity', 0, type=int))
+        include_cdf = request.args.get('cdf', '0') in ('1', 'true')
+        result = gacha_service.get_copies_distribution(pool_id, max_copies, start_pity, include_cdf)
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+    if result is None:
+        return jsonify({'success': False, 'message': '卡池不存在'}), 404
+    return jsonify({'success': True, 'distribution': result})
+
+
+@gacha_bp.route('/api/simulate', methods=['POST'])
+def simulate():
+    """
+    并行蒙特卡洛模拟（不影响当前会话）
+
+    请求体 (JSON):
+        pool_id: 卡池ID
+        players: 虚拟玩家数量
+        pulls: 每名玩家抽卡次数
+        seed: 随机种子 (可选)
+        workers: 工作进程数 (可选)
+        rng_backend: 随机数后端 stdlib/pcg64/philox (可选)
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        players = max(1, min(int(data.get('players', 1000)), SIMULATION_CONFIG['max_players']))
+        pulls = max(1, min(int(data.get('pulls', 100)), SIMULATION_CONFIG['max_pulls']))
+        seed = int(data['seed']) if data.get('seed') is not None else None
+        workers = int(data['workers']) if data.get('workers') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': '参数格式错误'}), 400
+
+    try:
+        result = gacha_service.simulate(data.get('pool_id'), players, pulls, seed, workers,
+                                        data.get('rng_backend') or None)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+    if result is None:
+        return jsonify({'success': False, 'message': '卡池不存在'}), 404
+    return jsonify({'success': True, 'result': result})
+
+
+@gacha_bp.route('/api/simulate/adaptive', methods=['POST'])
+def simulate_adaptive():
+    """
+    自适应精度模拟：追加模拟直到指标的置信区间半宽达到目标精度或时间预算用尽
+
+    请求体 (JSON):
+        pool_id: 卡池ID
+        tolerance: 指标 -> 目标半宽 (可选)，指标为 ssr_rate / featured_share / mean_pulls_to_ssr
+        confidence: 置信水平 (可选，默认 0.95)
+        time_budget: 时间预算秒数 (可选)
+        seed: 随机种子 (可选)
+        workers: 工作进程数 (可选)
+        rng_backend: 随机数后端 stdlib/pcg64/philox (可选)
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        tolerance = data.get('tolerance')
+        if tolerance is not None:
+            tolerance = {str(k): float(v) for k, v in tolerance.items()}
+        confidence = float(data['confidence']) if data.get('confidence') else None
+        time_budget = (
+            min(float(data['time_budget']), SIMULATION_CONFIG['adaptive_max_time_budget'])
+            if data.get('time_budget') else None
+        )
+        seed = int(data['seed']) if data.get('seed') is not None else None
+        workers = int(data['workers']) if data.get('workers') else None
+        result = gacha_service.simulate_adaptive(
+            data.get('pool_id'), tolerance, confidence, time_budget, seed, workers,
+            data.get('rng_backend') or None
+        )
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+    if result is None:
+        return jsonify({'success': False, 'message': '卡池不存在'}), 404
+    return jsonify({'success': True, 'result': result})
+
+
+@gacha_bp.route('/api/simulate/population', methods=['POST'])
+def simulate_population():
+    """
+    按消费分层的玩家群体模拟（不影响当前会话）
+
+    请求体 (JSON):
+        pool_id: 卡池ID
+        players: 虚拟玩家数量
+        segments: 分层配置 (可选)，如
+                  [{"name": "f2p", "share": 0.8, "budget": {"distribution": "poisson", "mean": 40}}]
+                  预算分布: fixed(value) / uniform(low, high) / normal(mean, std) /
+                  lognormal(median, sigma) / poisson(mean)
+        seed: 随机种子 (可选)
+        workers: 工作进程数 (可选)
+        rng_backend: 随机数后端 stdlib/pcg64/philox (可选)
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        players = max(1, min(int(data.get('players', 100000)), POPULATION_CONFIG['max_players']))
+        seed = int(data['seed']) if data.get('seed') is not None else None
+        workers = int(data['workers']) if data.get('workers') else None
+        result = gacha_service.simulate_population(
+            data.get('pool_id'), players, data.get('segments') or None, seed, workers,
+            data.get('rng_backend') or None
+        )
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+    if result is None:
+        return jsonify({'success': False, 'message': '卡池不存在'}), 404
+    return jsonify({'success': True, 'result': result})
+
+
+@gacha_bp.route('/api/simulate/schedule', methods=['POST'])
+def simulate_schedule():
+    """
+    跨卡池日程模拟：虚拟玩家按顺序参与多期卡池，保底按策略在卡池间继承（不影响当前会话）
+
+    请求体 (JSON):
+        windows: 有序日程，如
+                 [{"pool_id": "standard", "pulls": 80},
+                  {"pool_id": "event", "budget": {"distribution": "poisson", "mean": 60},
+                   "stop_on_featured": true}]
+        players: 虚拟玩家数量
+        carryover: 保底继承策略 carry / reset / pool_type (可选)
+        seed: 随机种子 (可选)
+        workers: 工作进程数 (可选)
+        rng_backend: 随机数后端 stdlib/pcg64/philox (可选)
+    """
+    data = request.get_json(silent=True) or {}
+    windows = data.get('windows')
+    if not isinstance(windows, list) or not windows:
+        return jsonify({'success': False, 'message': 'windows 不能为空'}), 400
+    try:
+        players = max(1, min(int(data.get('players', 100000)), SCHEDULE_CONFIG['max_players']))
+        seed = int(data['seed']) if data.get('seed') is not None else None
+        workers = int(data['workers']) if data.get('workers') else None
+        result = gacha_service.simulate_schedule(
+            windows, players, data.get('carryover') or None, seed, workers,
+            data.get('rng_backend') or None
+        )
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    return jsonify({'success': True, 'result': result})
+
+
+@gacha_bp.route('/api/sweep', methods=['POST'])
+def sweep():
+    """
+    保底/概率参数扫描（参数点结果按哈希缓存，重复扫描只计算新增的点）
+
+    请求体 (JSON):
+        pool_id: 基准卡池ID
+        grid: 参数名 -> 取值列表或 {"start", "stop", "step"} 范围，参数名为
+              soft_pity / hard_pity / pity_increase / ssr_probability / sr_probability / featured_rate
+        copies: 目标UP卡数量 (可选，默认 1)
+        method: auto / exact / simulate (可选，默认 auto)
+        cost_per_pull: 单抽成本 (可选)
+        workers: 工作进程数 (可选)
+    """
+    data = request.get_json(silent=True) or {}
+    grid = data.get('grid')
+    if not isinstance(grid, dict) or not grid:
+        return jsonify({'success': False, 'message': 'grid 不能为空'}), 400
+    try:
+        copies = max(1, min(int(data.get('copies', 1)), ODDS_CONFIG['max_copies']))
+        cost = float(data['cost_per_pull']) if data.get('cost_per_pull') else None
+        workers = int(data['workers']) if data.get('workers') else None
+        result = gacha_service.sweep(
+            data.get('pool_id'), grid, copies, data.get('method') or 'auto', cost, workers
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+    if result is None:
+        return jsonify({'success': False, 'message': '卡池不存在'}), 404
+    return jsonify({'success': True, 'result': result})
+
+
+@gacha_bp.route('/api/session/seed', methods=['POST'])
+def set_seed():
+    """
+    设置当前会话的随机种子（不重置统计，之后的结果由种子与累计抽数确定）
+
+    请求体 (JSON):
+        seed: 随机种子，不填表示改用随机种子
+        backend: 随机数后端 stdlib/pcg64/philox (可选，不填保持不变)
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        seed = int(data['seed']) if data.get('seed') is not None else None
+        info = gacha_service.set_seed(seed, data.get('backend') or None, get_session_id())
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    return jsonify({'success': True, 'rng': info})
+
+
+@gacha_bp.route('/api/session/fork', methods=['POST'])
+def fork_session():
+    """
+    分叉当前会话并切换到分叉会话（试抽，不影响原会话）
+
+    分叉会话复制保底计数与统计、共享抽卡历史，之后的抽卡 / 统计 / 历史接口都作用于分叉会话；
+    调用 /api/session/fork/leave 返回原会话，空闲超时的分叉会话自动回收。
+
+    请求体 (JSON):
+        seed: 分叉会话的随机种子 (可选，不填时沿用原会话的随机数源与位置，
+              即得到原会话接下来会抽到的结果)
+        backend: 随机数后端 stdlib/pcg64/philox (可选)
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        seed = int(data['seed']) if data.get('seed') is not None else None
+        fork = gacha_service.fork_session(get_session_id(), seed, data.get('backend') or None)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    session['gacha_session_id'] = fork['session_id']
+    return jsonify({'success': True, 'fork': fork})
+
+
+@gacha_bp.route('/api/session/fork/leave', methods=['POST'])
+def leave_fork():
+    """丢弃当前分叉会话并切换回父会话"""
+    parent_id = gacha_service.leave_fork(get_session_id())
+    if parent_id is None:
+        return jsonify({'success': False, 'message': '当前会话不是分叉会话'}), 400
+    session['gacha_session_id'] = parent_id
+    return jsonify({'success': True, 'session_id': parent_id})
+
+
+@gacha_bp.route('/api/session/stats', methods=['GET'])
+def session_stats():
+    """
+    当前会话的抽卡统计
+
+    quantiles 字段给出 SSR 间隔、UP 间隔与连败长度的计数、均值与 p50/p90/p99，
+    来自会话的流式草图，不遍历抽卡历史。
+    """
+    return jsonify({'success': True, 'stats': gacha_service.get_statistics(get_session_id())})
+
+
+@gacha_bp.route('/api/sessions/stats', methods=['GET'])
+def session_store_stats():
+    """
+    会话存储计数器
+
+    给出本进程内存中的会话数与估算字节数、内存预算，以及淘汰、过期删除、
+    写入溢出文件与从溢出文件恢复的次数；checkpoint 为检查点的写入、删除、恢复次数、
+    待写入会话数与检查点文件中的会话数（未启用检查点时为 null）。
+    """
+    return jsonify({'success': True, 'sessions': gacha_service.get_session_store_stats()})
+
+
+@gacha_bp.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    结果缓存计数器（按命名空间）
+
+    每个命名空间给出内存层 / 磁盘层命中、未命中、写入、淘汰、失效次数，
+    以及内存层当前条数与字节数。
+    """
+    return jsonify({'success': True, 'caches': gacha_service.get_cache_stats()})
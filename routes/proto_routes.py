@@ -19,6 +19,7 @@ except ImportError:
     print("Warning: Protobuf modules not available. Run proto compilation first.")
 
 from services.gacha import gacha_service
+from config import ODDS_CONFIG, POPULATION_CONFIG, PULL_LIMITS, SCHEDULE_CONFIG, SIMULATION_CONFIG
 
 
 def get_session_id() -> str:
@@ -202,10 +203,14 @@ def pull_multi():
             gacha_service.set_current_pool(req.pool_id, session_id)
         
         # 限制抽卡次数
-        count = max(1, min(req.count or 10, 100000))
+        if req.stats_only:
+            max_count = PULL_LIMITS['max_stats_only_pull']
+        else:
+            max_count = PULL_LIMITS['max_single_pull_server']
+        count = max(1, min(req.count or 10, max_count))
         
         # 执行多连抽
-        results = gacha_service.pull_multi(count, session_id)
+        results = gacha_service.pull_multi(count, session_id, stats_only=req.stats_only)
         stats = gacha_service.get_statistics(session_id)
         
         # 构建响应
@@ -227,6 +232,37 @@ def pull_multi():
         return error_response(500, str(e))
 
 
+@proto_bp.route('/pull/batch', methods=['POST'])
+def pull_batch():
+    """
+    多会话批量抽卡 (一次请求执行多个会话的抽卡任务，供自动化测试使用)
+    
+    任务中的 session_id 直接指定会话，不使用也不修改当前 Cookie 会话。
+    
+    请求: BatchPullRequest
+    响应: BatchPullResponse
+    """
+    try:
+        req = gacha_pb2.BatchPullRequest()
+        req.ParseFromString(request.data)
+        
+        try:
+            result = gacha_service.pull_batch_sessions(
+                ProtoConverter.batch_pull_jobs_from_proto(req.jobs), req.workers or None
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
+        
+        response = ProtoConverter.batch_pull_to_proto(result)
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
 @proto_bp.route('/stats', methods=['GET', 'POST'])
 def get_stats():
     """
@@ -285,6 +321,409 @@ def get_history():
         return error_response(500, str(e))
 
 
+@proto_bp.route('/odds', methods=['GET', 'POST'])
+def get_odds():
+    """
+    获取卡池的精确概率信息
+    
+    请求: GetOddsRequest (可以为空，使用当前卡池)
+    响应: GetOddsResponse
+    """
+    try:
+        session_id = get_session_id()
+        req = gacha_pb2.GetOddsRequest()
+        if request.data:
+            req.ParseFromString(request.data)
+        
+        pool_id = req.pool_id
+        if not pool_id:
+            current_pool = gacha_service.get_current_pool(session_id)
+            pool_id = current_pool.pool_id if current_pool else ""
+        
+        copies = max(1, min(req.copies or 1, ODDS_CONFIG['max_copies']))
+        odds = gacha_service.get_odds(
+            pool_id, copies, req.card_id or None, max(0, req.start_pity)
+        )
+        
+        if odds is None:
+            response = gacha_pb2.GetOddsResponse()
+            response.header.CopyFrom(
+                ProtoConverter.create_error_header(404, "卡池不存在")
+            )
+            return proto_response(response)
+        
+        response = ProtoConverter.odds_to_proto(odds)
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
+@proto_bp.route('/odds/copies', methods=['GET', 'POST'])
+def get_copies_distribution():
+    """
+    获取 1..N 份UP卡所需抽数的分布
+    
+    请求: GetCopiesDistributionRequest (可以为空，使用当前卡池)
+    响应: GetCopiesDistributionResponse
+    """
+    try:
+        session_id = get_session_id()
+        req = gacha_pb2.GetCopiesDistributionRequest()
+        if request.data:
+            req.ParseFromString(request.data)
+        
+        pool_id = req.pool_id
+        if not pool_id:
+            current_pool = gacha_service.get_current_pool(session_id)
+            pool_id = current_pool.pool_id if current_pool else ""
+        
+        max_copies = max(1, min(req.max_copies or ODDS_CONFIG['max_copies'],
+                                ODDS_CONFIG['max_copies']))
+        result = gacha_service.get_copies_distribution(
+            pool_id, max_copies, max(0, req.start_pity), req.include_cdf
+        )
+        
+        if result is None:
+            response = gacha_pb2.GetCopiesDistributionResponse()
+            response.header.CopyFrom(
+                ProtoConverter.create_error_header(404, "卡池不存在")
+            )
+            return proto_response(response)
+        
+        response = ProtoConverter.copies_distribution_to_proto(result)
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
+@proto_bp.route('/simulate', methods=['POST'])
+def simulate():
+    """
+    并行蒙特卡洛模拟 (不影响当前会话)
+    
+    请求: SimulateRequest
+    响应: SimulateResponse
+    """
+    try:
+        session_id = get_session_id()
+        req = gacha_pb2.SimulateRequest()
+        if request.data:
+            req.ParseFromString(request.data)
+        
+        pool_id = req.pool_id
+        if not pool_id:
+            current_pool = gacha_service.get_current_pool(session_id)
+            pool_id = current_pool.pool_id if current_pool else ""
+        
+        players = max(1, min(req.players or 1000, SIMULATION_CONFIG['max_players']))
+        pulls = max(1, min(req.pulls or 100, SIMULATION_CONFIG['max_pulls']))
+        try:
+            result = gacha_service.simulate(
+                pool_id, players, pulls, req.seed or None, req.workers or None,
+                req.rng_backend or None
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
+        
+        if result is None:
+            response = gacha_pb2.SimulateResponse()
+            response.header.CopyFrom(
+                ProtoConverter.create_error_header(404, "卡池不存在")
+            )
+            return proto_response(response)
+        
+        response = ProtoConverter.simulation_to_proto(result)
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
+@proto_bp.route('/simulate/adaptive', methods=['POST'])
+def simulate_adaptive():
+    """
+    自适应精度模拟 (不影响当前会话)
+    
+    请求: AdaptiveSimulateRequest
+    响应: AdaptiveSimulateResponse
+    """
+    try:
+        session_id = get_session_id()
+        req = gacha_pb2.AdaptiveSimulateRequest()
+        if request.data:
+            req.ParseFromString(request.data)
+        
+        pool_id = req.pool_id
+        if not pool_id:
+            current_pool = gacha_service.get_current_pool(session_id)
+            pool_id = current_pool.pool_id if current_pool else ""
+        
+        time_budget = (
+            min(req.time_budget, SIMULATION_CONFIG['adaptive_max_time_budget'])
+            if req.time_budget > 0 else None
+        )
+        try:
+            result = gacha_service.simulate_adaptive(
+                pool_id, dict(req.tolerance) or None, req.confidence or None, time_budget,
+                req.seed or None, req.workers or None, req.rng_backend or None
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
+        
+        if result is None:
+            response = gacha_pb2.AdaptiveSimulateResponse()
+            response.header.CopyFrom(
+                ProtoConverter.create_error_header(404, "卡池不存在")
+            )
+            return proto_response(response)
+        
+        response = ProtoConverter.adaptive_simulation_to_proto(result)
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
+@proto_bp.route('/simulate/population', methods=['POST'])
+def simulate_population():
+    """
+    按消费分层的玩家群体模拟 (不影响当前会话)
+    
+    请求: PopulationRequest
+    响应: PopulationResponse
+    """
+    try:
+        session_id = get_session_id()
+        req = gacha_pb2.PopulationRequest()
+        if request.data:
+            req.ParseFromString(request.data)
+        
+        pool_id = req.pool_id
+        if not pool_id:
+            current_pool = gacha_service.get_current_pool(session_id)
+            pool_id = current_pool.pool_id if current_pool else ""
+        
+        players = max(1, min(req.players or 100000, POPULATION_CONFIG['max_players']))
+        segments = ProtoConverter.population_segments_from_proto(req.segments) or None
+        try:
+            result = gacha_service.simulate_population(
+                pool_id, players, segments, req.seed or None, req.workers or None,
+                req.rng_backend or None
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
+        
+        if result is None:
+            response = gacha_pb2.PopulationResponse()
+            response.header.CopyFrom(
+                ProtoConverter.create_error_header(404, "卡池不存在")
+            )
+            return proto_response(response)
+        
+        response = ProtoConverter.population_to_proto(result)
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
+@proto_bp.route('/simulate/schedule', methods=['POST'])
+def simulate_schedule():
+    """
+    跨卡池日程模拟 (不影响当前会话)
+    
+    请求: ScheduleRequest
+    响应: ScheduleResponse
+    """
+    try:
+        req = gacha_pb2.ScheduleRequest()
+        if request.data:
+            req.ParseFromString(request.data)
+        
+        if not req.windows:
+            return error_response(400, "windows 不能为空")
+        
+        players = max(1, min(req.players or 100000, SCHEDULE_CONFIG['max_players']))
+        windows = ProtoConverter.schedule_windows_from_proto(req.windows)
+        try:
+            result = gacha_service.simulate_schedule(
+                windows, players, req.carryover or None, req.seed or None,
+                req.workers or None, req.rng_backend or None
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
+        
+        response = ProtoConverter.schedule_to_proto(result)
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
+@proto_bp.route('/sweep', methods=['POST'])
+def sweep():
+    """
+    保底/概率参数扫描
+    
+    请求: SweepRequest
+    响应: SweepResponse
+    """
+    try:
+        session_id = get_session_id()
+        req = gacha_pb2.SweepRequest()
+        if request.data:
+            req.ParseFromString(request.data)
+        
+        pool_id = req.pool_id
+        if not pool_id:
+            current_pool = gacha_service.get_current_pool(session_id)
+            pool_id = current_pool.pool_id if current_pool else ""
+        
+        grid = ProtoConverter.sweep_axes_from_proto(req.axes)
+        if not grid:
+            return error_response(400, "axes 不能为空")
+        
+        copies = max(1, min(req.copies or 1, ODDS_CONFIG['max_copies']))
+        try:
+            result = gacha_service.sweep(
+                pool_id, grid, copies, req.method or 'auto',
+                req.cost_per_pull or None, req.workers or None
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
+        
+        if result is None:
+            response = gacha_pb2.SweepResponse()
+            response.header.CopyFrom(
+                ProtoConverter.create_error_header(404, "卡池不存在")
+            )
+            return proto_response(response)
+        
+        response = ProtoConverter.sweep_to_proto(result)
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
+@proto_bp.route('/seed', methods=['POST'])
+def set_seed():
+    """
+    设置当前会话的随机种子 (不重置统计)
+    
+    请求: SetSeedRequest
+    响应: SetSeedResponse
+    """
+    try:
+        session_id = get_session_id()
+        req = gacha_pb2.SetSeedRequest()
+        if request.data:
+            req.ParseFromString(request.data)
+        
+        try:
+            info = gacha_service.set_seed(req.seed or None, req.backend or None, session_id)
+        except ValueError as e:
+            return error_response(400, str(e))
+        
+        response = gacha_pb2.SetSeedResponse()
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        response.seed = str(info['seed'])
+        response.backend = info['backend']
+        response.position = info['position']
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
+@proto_bp.route('/session/fork', methods=['POST'])
+def fork_session():
+    """
+    分叉当前会话并切换到分叉会话 (试抽，不影响原会话)
+    
+    请求: ForkSessionRequest
+    响应: ForkSessionResponse
+    """
+    try:
+        req = gacha_pb2.ForkSessionRequest()
+        if request.data:
+            req.ParseFromString(request.data)
+        
+        try:
+            fork = gacha_service.fork_session(get_session_id(), req.seed or None,
+                                              req.backend or None)
+        except ValueError as e:
+            return error_response(400, str(e))
+        session['gacha_session_id'] = fork['session_id']
+        
+        response = gacha_pb2.ForkSessionResponse()
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        response.session_id = fork['session_id']
+        response.parent_id = fork['parent_id']
+        response.total_pulls = fork['total_pulls']
+        response.pity_counter = fork['pity_counter']
+        response.seed = str(fork['rng']['seed'])
+        response.backend = fork['rng']['backend']
+        response.position = fork['rng']['position']
+        response.expires_in = int(fork['expires_in'])
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
+@proto_bp.route('/session/fork/leave', methods=['POST'])
+def leave_fork():
+    """
+    丢弃当前分叉会话并切换回父会话
+    
+    请求: LeaveForkRequest
+    响应: LeaveForkResponse
+    """
+    try:
+        parent_id = gacha_service.leave_fork(get_session_id())
+        if parent_id is None:
+            return error_response(400, "当前会话不是分叉会话")
+        session['gacha_session_id'] = parent_id
+        
+        response = gacha_pb2.LeaveForkResponse()
+        response.header.CopyFrom(ProtoConverter.create_success_header())
+        response.session_id = parent_id
+        
+        return proto_response(response)
+        
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+
 @proto_bp.route('/reset', methods=['POST'])
 def reset():
     """
@@ -3,6 +3,7 @@
 使用 WSGI 服务器运行 Flask 应用
 """
 import os
+import secrets
 import sys
 
 # 设置生产环境
@@ -45,6 +46,14 @@ def run_with_gunicorn():
         print("  抽卡概率工具平台 - 生产环境 (Gunicorn)")
         print("=" * 50)
         
+        # 各 worker 是独立进程：共用同一个 Cookie 签名密钥，多 worker 时会话保存在共享存储中
+        env = dict(os.environ)
+        env.setdefault('SECRET_KEY', secrets.token_hex(32))
+        if SERVER_CONFIG['workers'] > 1:
+            env.setdefault('SESSION_STORE', 'sqlite')
+        print(f"  Worker 数: {SERVER_CONFIG['workers']}  会话存储: "
+              f"{env.get('SESSION_STORE', 'memory')}")
+
         cmd = [
             'gunicorn',
             '-w', str(SERVER_CONFIG['workers']),
@@ -53,7 +62,7 @@ def run_with_gunicorn():
             '--error-logfile', '-',
             'app:app'
         ]
-        subprocess.run(cmd)
+        subprocess.run(cmd, env=env)
     except FileNotFoundError:
         print("错误: 未安装 gunicorn，请运行: pip install gunicorn")
         sys.exit(1)
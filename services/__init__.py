@@ -1,16 +1,36 @@
 """
 服务模块
+
+各服务按需导入（PEP 562），只使用其中一个模块的脚本（如 python -m services.simulate）
+不会在启动时加载全部服务。
 """
-from .gacha import GachaService
-from .session_manager import SessionManager, UserSession
-from .pool_manager import PoolManager
-from .pull_engine import PullEngine
-from .history_manager import HistoryManager
+import importlib
+
+_EXPORTS = {
+    'GachaService': '.gacha',
+    'SessionManager': '.session_manager',
+    'UserSession': '.session_manager',
+    'PoolManager': '.pool_manager',
+    'PullEngine': '.pull_engine',
+    'HistoryManager': '.history_manager',
+    'OddsCalculator': '.odds',
+    'SimulationService': '.simulation',
+    'SweepService': '.sweep',
+    'PopulationService': '.population',
+    'ScheduleService': '.schedule',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = [
-    'GachaService',
-    'SessionManager', 'UserSession',
-    'PoolManager',
-    'PullEngine',
-    'HistoryManager',
-]
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,125 @@
+"""
+别名表 - Walker/Vose 别名法按权重 O(1) 选牌
+
+卡牌可在 cards.json 中设置 weight（默认 1），同一品阶内按权重分配被选中的概率。
+每个卡池、品阶（以及该品阶的UP卡子集）在首次使用时构建一张别名表，挂在卡池索引上，
+卡池重新加载（索引重建）后随索引一起丢弃。
+
+采样只消耗一个均匀随机数 u：x = u * n，下标 i = int(x)，小数部分 x - i 与
+prob[i] 比较决定取 i 还是 alias[i]。权重全部相等时 prob 全为 1，结果退化为
+int(u * n)，与等概率选牌完全一致。
+"""
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from models.card import Card
+from models.pool import Pool
+
+
+class AliasTable:
+    """编译后的别名表（只读）"""
+
+    __slots__ = ('size', 'prob', 'alias', 'prob_array', 'alias_array', 'uniform')
+
+    def __init__(self, weights: Sequence[float]):
+        """
+        按 Vose 算法构建别名表
+
+        Args:
+            weights: 各项的非负权重，总和为 0 时按等权处理
+
+        Raises:
+            ValueError: 权重为空或为负
+        """
+        n = len(weights)
+        if n == 0 or any(w < 0 for w in weights):
+            raise ValueError(f"Invalid alias weights: {list(weights)}")
+        total = float(sum(weights))
+
+        self.size = n
+        self.uniform = total <= 0 or all(w == weights[0] for w in weights)
+        prob = [1.0] * n
+        alias = list(range(n))
+
+        if not self.uniform:
+            scaled = [w * n / total for w in weights]
+            small = [i for i, p in enumerate(scaled) if p < 1.0]
+            large = [i for i, p in enumerate(scaled) if p >= 1.0]
+            while small and large:
+                s, l = small.pop(), large.pop()
+                prob[s] = scaled[s]
+                alias[s] = l
+                scaled[l] = (scaled[l] + scaled[s]) - 1.0
+                (small if scaled[l] < 1.0 else large).append(l)
+            # 剩余项（含浮点误差）概率取 1
+            for i in small + large:
+                prob[i] = 1.0
+
+        self.prob: Tuple[float, ...] = tuple(prob)
+        self.alias: Tuple[int, ...] = tuple(alias)
+        if NUMPY_AVAILABLE:
+            self.prob_array = np.array(prob, dtype=np.float64)
+            self.alias_array = np.array(alias, dtype=np.int64)
+        else:
+            self.prob_array = None
+            self.alias_array = None
+
+    def sample(self, u: float) -> int:
+        """由一个 [0, 1) 均匀随机数选出下标"""
+        x = u * self.size
+        i = int(x)
+        if self.uniform or x - i < self.prob[i]:
+            return i
+        return self.alias[i]
+
+    def sample_array(self, u: 'np.ndarray') -> 'np.ndarray':
+        """批量选出下标（与逐个调用 sample 结果一致）"""
+        x = u * self.size
+        idx = x.astype(np.int64)
+        if self.uniform:
+            return idx
+        return np.where(x - idx < self.prob_array[idx], idx, self.alias_array[idx])
+
+    def probabilities(self) -> List[float]:
+        """还原各下标被选中的概率"""
+        probs = [0.0] * self.size
+        share = 1.0 / self.size
+        for i, (p, a) in enumerate(zip(self.prob, self.alias)):
+            probs[i] += p * share
+            probs[a] += (1.0 - p) * share
+        return probs
+
+
+def card_weights(cards: Sequence[Card]) -> List[float]:
+    """卡牌权重列表"""
+    return [card.weight for card in cards]
+
+
+class AliasIndex:
+    """别名表缓存 - 按 (品阶, 是否UP卡子集) 挂在卡池索引上"""
+
+    @staticmethod
+    def for_pool(pool: Pool, rarity: str, featured: bool = False) -> AliasTable:
+        """
+        获取卡池指定品阶的别名表，首次使用时构建
+
+        featured 为 True 时下标对应 pool.get_featured_cards(rarity)，
+        否则对应 pool.get_cards_by_rarity(rarity)。
+        """
+        index = pool.index
+        tables: Dict = index.alias_tables
+        key = (rarity, featured)
+        table = tables.get(key)
+        if table is None:
+            cards = (pool.get_featured_cards(rarity) if featured
+                     else pool.get_cards_by_rarity(rarity))
+            table = AliasTable(card_weights(cards))
+            # 并发构建时结果相同，后写入者覆盖即可
+            tables[key] = table
+        return table
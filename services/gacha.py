@@ -6,13 +6,57 @@
   - PoolManager     (pool_manager.py)     卡池管理
   - PullEngine      (pull_engine.py)      抽卡核心逻辑
   - HistoryManager  (history_manager.py)  历史记录与统计
+  - OddsCalculator  (odds.py)             精确概率计算
+  - SimulationService (simulation.py)     并行蒙特卡洛模拟
+  - SweepService    (sweep.py)            保底/概率参数扫描
+  - PopulationService (population.py)     按消费分层的玩家群体模拟
+  - ScheduleService (schedule.py)         跨卡池日程模拟（保底继承）
+  - ResultCache     (result_cache.py)     概率与固定种子模拟结果的两级缓存
 """
-from typing import List, Dict
-
+import threading
+import time
+import uuid
+from typing import Callable, List, Dict, Optional
+
+from models.pool import Pool
+from config import (BATCH_PULL_CONFIG, PULL_LIMITS, POPULATION_CONFIG, SCHEDULE_CONFIG,
+                    SESSION_CONFIG, SIMULATION_CONFIG)
 from services.session_manager import SessionManager, UserSession
 from services.pool_manager import PoolManager
 from services.pull_engine import PullEngine
 from services.history_manager import HistoryManager
+from services.odds import OddsCalculator
+from services.simulation import SimulationService
+from services.sweep import SweepService
+from services.population import PopulationService
+from services.schedule import ScheduleService
+from services.result_cache import ResultCache, cache_key, cache_stats
+from services.rng import default_backend
+
+
+# 固定种子的模拟结果缓存（结果与工作进程数无关，键中不含 workers）
+_simulation_caches = {
+    kind: ResultCache(kind) for kind in ('simulate', 'population', 'schedule')
+}
+
+# 多会话批量抽卡的共享线程池（会话状态在本进程内，NumPy 批量路径大部分时间释放 GIL）
+_batch_executor = None
+_batch_executor_workers = 0
+_batch_executor_lock = threading.Lock()
+
+
+def _get_batch_executor(workers: int):
+    """获取共享线程池（线程数变化时重建）"""
+    global _batch_executor, _batch_executor_workers
+    from concurrent.futures import ThreadPoolExecutor
+    with _batch_executor_lock:
+        if _batch_executor is None or _batch_executor_workers != workers:
+            if _batch_executor is not None:
+                _batch_executor.shutdown(wait=False)
+            _batch_executor = ThreadPoolExecutor(max_workers=workers,
+                                                 thread_name_prefix='batch-pull')
+            _batch_executor_workers = workers
+        return _batch_executor
 
 
 class GachaService:
@@ -24,14 +68,47 @@ class GachaService:
 
     # ---- 内部辅助 ----
 
-    def _get_session(self, session_id: str = None) -> UserSession:
-        return self._session_mgr.get_or_create(
-            session_id,
-            default_pool_id=self._pool_mgr.default_pool_id,
-            featured_ssr=self._pool_mgr.get_featured_ssr(
+    def _session_defaults(self) -> Dict:
+        return {
+            'default_pool_id': self._pool_mgr.default_pool_id,
+            'featured_ssr': self._pool_mgr.get_featured_ssr(
                 self._pool_mgr.default_pool_id
             ) if self._pool_mgr.default_pool_id else None
-        )
+        }
+
+    def _get_session(self, session_id: str = None) -> UserSession:
+        return self._session_mgr.get_or_create(session_id, **self._session_defaults())
+
+    def _mutate(self, session_id: Optional[str], action):
+        """
+        修改会话并写回会话存储（见 SessionManager.modify），返回 action 的返回值
+
+        Raises:
+            RuntimeError: 会话持续被其他 worker 并发修改
+        """
+        return self._session_mgr.modify(session_id, action, **self._session_defaults())
+
+    def _read(self, session_id: Optional[str], action):
+        """持有会话锁读取会话（见 SessionManager.read）"""
+        return self._session_mgr.read(session_id, action, **self._session_defaults())
+
+    @staticmethod
+    def _cached_run(kind: str, pools: List[Pool], params: List, seed: int,
+                    run: Callable[[], Dict]) -> Dict:
+        """
+        固定种子的模拟按请求缓存，结果中 cache_hit 标记是否来自缓存；
+        未指定种子时每次重新运行，不读写缓存。
+        """
+        if seed is None:
+            return run()
+        cache = _simulation_caches[kind]
+        key = cache_key(kind, pools, params)
+        cached = cache.get(key)
+        if cached is not None:
+            return dict(cached, cache_hit=True)
+        result = run()
+        cache.put(key, result, [pool.pool_id for pool in pools])
+        return dict(result, cache_hit=False)
 
     # ---- 兼容属性（供外部直接访问） ----
 
@@ -44,6 +121,39 @@ class GachaService:
     def get_session_id(self, session_id: str = None) -> str:
         return self._get_session(session_id).session_id
 
+    def set_seed(self, seed: int = None, backend: str = None, session_id: str = None) -> Dict:
+        """设置会话随机种子，返回当前随机数源信息"""
+        def action(session: UserSession) -> Dict:
+            session.set_seed(seed, backend)
+            return {'seed': session.rng.seed, 'backend': session.rng.name,
+                    'position': session.rng.position}
+        return self._mutate(session_id, action)
+
+    def fork_session(self, session_id: str = None, seed: int = None,
+                     backend: str = None) -> Dict:
+        """
+        分叉会话用于"如果继续抽会怎样"的试抽：子会话复制计数器并共享历史，
+        在子会话上抽卡不会影响原会话
+
+        Raises:
+            ValueError: 随机数后端未知
+        """
+        parent = self._get_session(session_id)
+        child = self._session_mgr.fork(parent.session_id, seed, backend)
+        return {
+            'session_id': child.session_id,
+            'parent_id': child.parent_id,
+            'total_pulls': child.total_pulls,
+            'pity_counter': child.pity_counter,
+            'rng': {'seed': child.rng.seed, 'backend': child.rng.name,
+                    'position': child.rng.position},
+            'expires_in': SESSION_CONFIG['fork_ttl'],
+        }
+
+    def leave_fork(self, session_id: str) -> Optional[str]:
+        """丢弃分叉会话，返回父会话ID（不是分叉会话时为 None）"""
+        return self._session_mgr.discard_fork(session_id)
+
     # ---- 卡池相关（委托给 PoolManager） ----
 
     def load_pools_from_dict(self, data: Dict):
@@ -71,55 +181,285 @@ class GachaService:
     def set_current_pool(self, pool_id: str, session_id: str = None, auto_reset: bool = True) -> bool:
         if not self._pool_mgr.exists(pool_id):
             return False
-        session = self._get_session(session_id)
+        self._mutate(session_id, lambda session: self._select_pool(session, pool_id, auto_reset))
+        return True
+
+    def _select_pool(self, session: UserSession, pool_id: str, auto_reset: bool):
         if auto_reset and pool_id != session.current_pool_id:
             session.current_pool_id = pool_id
-            self.reset(session_id)
+            self._reset(session)
         else:
             session.current_pool_id = pool_id
-        return True
 
     # ---- 抽卡相关（委托给 PullEngine + HistoryManager） ----
 
     def pull_single(self, session_id: str = None, save_history: bool = True) -> Dict:
-        session = self._get_session(session_id)
+        return self._mutate(session_id, lambda session: self._pull_single(session, save_history))
+
+    def _pull_single(self, session: UserSession, save_history: bool) -> Dict:
         pool = self._pool_mgr.get(session.current_pool_id)
+        point = HistoryManager.replay_point(session, pool) if save_history else None
         record = PullEngine.pull_once(session, pool)
         if save_history:
-            HistoryManager.add_record(session, record)
+            HistoryManager.add_record(session, record, pool, point)
         return record
 
-    def pull_multi(self, count: int = 10, session_id: str = None, return_limit: int = 100) -> List[Dict]:
+    def pull_multi(self, count: int = 10, session_id: str = None, return_limit: int = 100,
+                   stats_only: bool = False) -> List[Dict]:
+        return self._mutate(
+            session_id, lambda session: self._pull_multi(session, count, return_limit, stats_only)
+        )
+
+    def _pull_multi(self, session: UserSession, count: int, return_limit: int,
+                    stats_only: bool) -> List[Dict]:
+        if stats_only:
+            # 仅统计模式：只更新计数，不生成记录也不写入历史
+            pool = self._pool_mgr.get(session.current_pool_id)
+            PullEngine.pull_counts(session, pool, count)
+            return []
+
+        if count >= PULL_LIMITS['batch_pull_threshold']:
+            return self._pull_bulk(session, count, return_limit)
+
         results = []
         for i in range(count):
-            record = self.pull_single(session_id, save_history=True)
+            record = self._pull_single(session, save_history=True)
             if i >= count - return_limit:
                 results.append(record)
         return results
 
+    def _pull_bulk(self, session: UserSession, count: int, return_limit: int) -> List[Dict]:
+        """批量路径：只为返回的尾部生成记录字典，历史以紧凑形式（或重放段）保存"""
+        pool = self._pool_mgr.get(session.current_pool_id)
+        point = HistoryManager.replay_point(session, pool)
+        segment = PullEngine.pull_batch_compact(session, pool, count)
+        HistoryManager.add_segment(session, segment, pool, point)
+        return segment.records(max(count - return_limit, 0)) if return_limit > 0 else []
+
+    # ---- 多会话批量抽卡 ----
+
+    @staticmethod
+    def validate_batch_jobs(jobs: List[Dict]) -> List[Dict]:
+        """
+        校验并规范化批量抽卡任务
+
+        每个任务形如 {'session_id': 'qa-1', 'pool_id': 'event', 'count': 100,
+        'stats_only': false, 'return_limit': 10}；session_id 为空时创建新会话。
+
+        Raises:
+            ValueError: 任务为空、过多或合计抽数超出上限
+        """
+        if not jobs:
+            raise ValueError("No pull jobs")
+        if len(jobs) > BATCH_PULL_CONFIG['max_jobs']:
+            raise ValueError(f"Batch exceeds {BATCH_PULL_CONFIG['max_jobs']} jobs")
+        result = []
+        for job in jobs:
+            stats_only = bool(job.get('stats_only', False))
+            max_count = (PULL_LIMITS['max_stats_only_pull'] if stats_only
+                         else PULL_LIMITS['max_single_pull_server'])
+            result.append({
+                'session_id': job.get('session_id') or str(uuid.uuid4()),
+                'pool_id': job.get('pool_id') or None,
+                'count': max(1, min(int(job.get('count') or 10), max_count)),
+                'stats_only': stats_only,
+                'return_limit': max(0, min(int(job.get('return_limit') or 0),
+                                           PULL_LIMITS['max_return_results'])),
+            })
+        total = sum(job['count'] for job in result if not job['stats_only'])
+        if total > BATCH_PULL_CONFIG['max_total_pulls']:
+            raise ValueError(f"Batch exceeds {BATCH_PULL_CONFIG['max_total_pulls']} pulls")
+        return result
+
+    def _run_batch_job(self, job: Dict) -> Dict:
+        """执行一个批量抽卡任务，返回该会话的统计（卡池不存在时返回错误）"""
+        if job['pool_id'] and not self._pool_mgr.exists(job['pool_id']):
+            return {'session_id': self._get_session(job['session_id']).session_id,
+                    'success': False, 'error_code': 404, 'message': '卡池不存在'}
+
+        def action(session: UserSession) -> Dict:
+            if job['pool_id']:
+                self._select_pool(session, job['pool_id'], auto_reset=True)
+            if job['stats_only']:
+                pool = self._pool_mgr.get(session.current_pool_id)
+                PullEngine.pull_counts(session, pool, job['count'])
+                records = []
+            else:
+                records = self._pull_bulk(session, job['count'], job['return_limit'])
+            return {
+                'session_id': session.session_id,
+                'success': True,
+                'stats': HistoryManager.get_statistics(session),
+                'records': records,
+            }
+        return self._mutate(job['session_id'], action)
+
+    def _run_batch_group(self, jobs: List[Dict]) -> List[Dict]:
+        return [self._run_batch_job(job) for job in jobs]
+
+    def pull_batch_sessions(self, jobs: List[Dict], workers: int = None) -> Dict:
+        """
+        多会话批量抽卡：一次执行多个 (会话, 卡池, 抽数) 任务
+
+        所有任务都走批量抽卡路径（与逐抽结果一致）。同一会话的任务按顺序在同一线程中执行，
+        不同会话分组后由共享线程池并行执行；合计抽数较少时在当前线程顺序执行。
+
+        Returns:
+            'results': 与任务一一对应的结果（含任务完成后的会话统计），
+            以及合计抽数、线程数与耗时
+
+        Raises:
+            ValueError: 任务无效（见 validate_batch_jobs）
+        """
+        jobs = self.validate_batch_jobs(jobs)
+        started = time.perf_counter()
+
+        groups: Dict[str, List[int]] = {}
+        for i, job in enumerate(jobs):
+            groups.setdefault(job['session_id'], []).append(i)
+        total = sum(job['count'] for job in jobs)
+        workers = max(1, min(workers or BATCH_PULL_CONFIG['max_workers'], len(groups)))
+
+        results: List[Optional[Dict]] = [None] * len(jobs)
+        if workers == 1 or total < BATCH_PULL_CONFIG['inline_threshold']:
+            workers = 1
+            for indices in groups.values():
+                for i in indices:
+                    results[i] = self._run_batch_job(jobs[i])
+        else:
+            executor = _get_batch_executor(workers)
+            futures = {
+                executor.submit(self._run_batch_group, [jobs[i] for i in indices]): indices
+                for indices in groups.values()
+            }
+            for future, indices in futures.items():
+                for i, result in zip(indices, future.result()):
+                    results[i] = result
+
+        return {
+            'results': results,
+            'total_pulls': total,
+            'workers': workers,
+            'elapsed_ms': (time.perf_counter() - started) * 1000,
+        }
+
     # ---- 统计与历史（委托给 HistoryManager） ----
 
     def get_statistics(self, session_id: str = None) -> Dict:
-        return HistoryManager.get_statistics(self._get_session(session_id))
+        return self._read(session_id, HistoryManager.get_statistics)
 
     def get_pull_history(self, limit: int = None, session_id: str = None) -> List[Dict]:
-        return HistoryManager.get_history(self._get_session(session_id), limit)
+        return self._read(session_id, lambda session: HistoryManager.get_history(session, limit))
 
     def generate_export_data(self, session_id: str = None) -> str:
-        session = self._get_session(session_id)
-        pool = self._pool_mgr.get(session.current_pool_id)
-        library_id = pool.library_id if pool else None
-        return HistoryManager.generate_export_data(session, library_id)
+        def action(session: UserSession) -> str:
+            pool = self._pool_mgr.get(session.current_pool_id)
+            library_id = pool.library_id if pool else None
+            return HistoryManager.generate_export_data(session, library_id)
+        return self._read(session_id, action)
+
+    # ---- 概率计算（委托给 OddsCalculator） ----
+
+    def get_odds(self, pool_id: str, copies: int = 1, card_id: str = None,
+                 start_pity: int = 0) -> Dict:
+        pool = self._pool_mgr.get(pool_id)
+        if not pool:
+            return None
+        return OddsCalculator.get_odds(pool, copies, card_id, start_pity)
+
+    def get_copies_distribution(self, pool_id: str, max_copies: int, start_pity: int = 0,
+                                include_cdf: bool = False) -> Dict:
+        pool = self._pool_mgr.get(pool_id)
+        if not pool:
+            return None
+        return OddsCalculator.get_copies_distribution(
+            pool, max_copies, start_pity, include_cdf=include_cdf
+        )
+
+    # ---- 模拟（委托给 SimulationService） ----
+
+    def simulate(self, pool_id: str, players: int, pulls: int, seed: int = None,
+                 workers: int = None, backend: str = None) -> Dict:
+        pool = self._pool_mgr.get(pool_id)
+        if not pool:
+            return None
+        params = [players, pulls, seed, backend or default_backend(),
+                  SIMULATION_CONFIG['chunk_players']]
+        return self._cached_run(
+            'simulate', [pool], params, seed,
+            lambda: SimulationService.run(pool, players, pulls, seed, workers, backend)
+        )
+
+    def simulate_adaptive(self, pool_id: str, tolerance: Dict[str, float] = None,
+                          confidence: float = None, time_budget: float = None,
+                          seed: int = None, workers: int = None,
+                          backend: str = None) -> Dict:
+        pool = self._pool_mgr.get(pool_id)
+        if not pool:
+            return None
+        return SimulationService.run_adaptive(
+            pool, tolerance, confidence, time_budget, seed=seed, workers=workers,
+            backend=backend
+        )
+
+    def simulate_population(self, pool_id: str, players: int, segments: List[Dict] = None,
+                            seed: int = None, workers: int = None,
+                            backend: str = None) -> Dict:
+        pool = self._pool_mgr.get(pool_id)
+        if not pool:
+            return None
+        params = [players, segments or POPULATION_CONFIG['segments'], seed,
+                  backend or default_backend(), POPULATION_CONFIG['chunk_players']]
+        return self._cached_run(
+            'population', [pool], params, seed,
+            lambda: PopulationService.run(pool, players, segments, seed, workers, backend)
+        )
+
+    # ---- 卡池日程模拟（委托给 ScheduleService） ----
+
+    def simulate_schedule(self, windows: List[Dict], players: int, carryover: str = None,
+                          seed: int = None, workers: int = None, backend: str = None) -> Dict:
+        pools = {}
+        for window in windows:
+            pool_id = window.get('pool_id')
+            pool = self._pool_mgr.get(pool_id) if pool_id not in pools else None
+            if pool:
+                pools[pool_id] = pool
+        params = [windows, players, carryover or SCHEDULE_CONFIG['carryover'], seed,
+                  backend or default_backend(), SCHEDULE_CONFIG['chunk_players']]
+        return self._cached_run(
+            'schedule', list(pools.values()), params, seed,
+            lambda: ScheduleService.run(pools, windows, players, carryover, seed, workers,
+                                        backend)
+        )
+
+    # ---- 结果缓存 ----
+
+    def get_cache_stats(self) -> Dict[str, Dict]:
+        return cache_stats()
+
+    # ---- 参数扫描（委托给 SweepService） ----
+
+    def sweep(self, pool_id: str, grid: Dict, copies: int = 1, method: str = 'auto',
+              cost_per_pull: float = None, workers: int = None) -> Dict:
+        pool = self._pool_mgr.get(pool_id)
+        if not pool:
+            return None
+        return SweepService.run(pool, grid, copies, method, cost_per_pull, workers)
 
     # ---- 重置 ----
 
     def reset(self, session_id: str = None):
-        session = self._get_session(session_id)
-        featured_ssr = self._pool_mgr.get_featured_ssr(session.current_pool_id)
-        self._session_mgr.reset_session(session.session_id, featured_ssr)
+        self._mutate(session_id, self._reset)
+
+    def _reset(self, session: UserSession):
+        session.reset(self._pool_mgr.get_featured_ssr(session.current_pool_id))
+
+    def cleanup_expired_sessions(self, max_age_seconds: float = None) -> int:
+        return self._session_mgr.cleanup_expired_sessions(max_age_seconds)
 
-    def cleanup_expired_sessions(self, max_age_seconds: int = 3600):
-        self._session_mgr.cleanup_expired_sessions(max_age_seconds)
+    def get_session_store_stats(self) -> Dict:
+        return self._session_mgr.stats()
 
 
 # 全局服务实例
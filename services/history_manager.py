@@ -1,10 +1,14 @@
 """
 历史记录与统计管理器 - 统计查询、历史导出
 """
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-from config import PULL_LIMITS
+from models.pool import Pool
+from config import HISTORY_CONFIG, PULL_LIMITS
 from services.session_manager import UserSession
+from services.pull_history import CompactSegment
+from services.pity_rules import RuleCompiler
+from services.rng import DRAWS_PER_PULL
 
 
 MAX_HISTORY_SIZE = PULL_LIMITS['max_history_size']
@@ -14,42 +18,93 @@ class HistoryManager:
     """历史记录与统计管理器"""
 
     @staticmethod
-    def add_record(session: UserSession, pull_record: Dict):
-        """添加一条抽卡记录并限制历史总量"""
-        session.stats['pull_history'].append(pull_record)
-        if len(session.stats['pull_history']) > MAX_HISTORY_SIZE:
-            session.stats['pull_history'] = session.stats['pull_history'][-MAX_HISTORY_SIZE:]
+    def replay_point(session: UserSession, pool: Optional[Pool]) -> Optional[tuple]:
+        """
+        抽卡前调用：重放模式下返回记录重放段所需的抽卡前状态
+        (总抽数, 随机数源描述, 随机数位置, 保底计数, 阈值表)；
+        未启用重放或随机数源不支持常数时间定位（stdlib）时返回 None，历史按记录保存
+        """
+        if HISTORY_CONFIG['mode'] != 'replay' or not session.rng.constant_seek:
+            return None
+        return (session.total_pulls, session.rng.spec(), session.rng.position,
+                session.pity_counter, RuleCompiler.for_pool(pool))
+
+    @staticmethod
+    def add_record(session: UserSession, pull_record: Dict, pool: Pool = None,
+                   point: tuple = None):
+        """
+        添加一条抽卡记录（历史总量由 PullHistory 限制）
+
+        提供抽卡前的 replay_point 时只记录重放段，不保存记录字典
+        """
+        if point is None:
+            session.pull_history.append(pull_record)
+            return
+        start, rng_spec, position, pity, rules = point
+        session.pull_history.extend_replay(start, rng_spec, position, pity, 1,
+                                           pool, rules)
+
+    @staticmethod
+    def add_records(session: UserSession, pull_records: List[Dict]):
+        """批量添加抽卡记录"""
+        session.pull_history.extend(pull_records)
+
+    @staticmethod
+    def add_segment(session: UserSession, segment: CompactSegment, pool: Pool = None,
+                    point: tuple = None):
+        """
+        以紧凑形式批量添加抽卡记录，读取时再还原
+
+        提供抽卡前的 replay_point 时按段长上限拆分为重放段，
+        各段起点的保底计数取自记录段中前一抽的抽后保底
+        """
+        history = session.pull_history
+        if point is None:
+            history.extend_compact(segment)
+            return
+        start, rng_spec, position, pity, rules = point
+        n = len(segment)
+        step = HISTORY_CONFIG['replay_segment_pulls']
+        # 超出历史上限的部分不会被读取，直接跳过
+        first = max(n - history.maxlen, 0)
+        for offset in range(first, n, step):
+            if offset:
+                pity = int(segment.pity[offset - 1])
+            history.extend_replay(start + offset, rng_spec, position + offset * DRAWS_PER_PULL,
+                                  pity, min(step, n - offset), pool, rules)
 
     @staticmethod
     def get_statistics(session: UserSession) -> Dict:
-        """获取抽卡统计信息"""
-        total = session.stats['total_pulls']
+        """获取抽卡统计信息（quantiles 来自会话草图，不遍历历史记录）"""
+        total = session.total_pulls
         if total == 0:
             return {
                 'total_pulls': 0,
                 'ssr_count': 0, 'sr_count': 0, 'r_count': 0,
                 'ssr_rate': '0.00%', 'sr_rate': '0.00%', 'r_rate': '0.00%',
                 'featured_ssr_counts': {},
-                'pity_counter': session.pity_counter
+                'pity_counter': session.pity_counter,
+                'quantiles': session.sketches.summary()
             }
         return {
             'total_pulls': total,
-            'ssr_count': session.stats['ssr_count'],
-            'sr_count': session.stats['sr_count'],
-            'r_count': session.stats['r_count'],
-            'ssr_rate': f"{(session.stats['ssr_count'] / total * 100):.2f}%",
-            'sr_rate': f"{(session.stats['sr_count'] / total * 100):.2f}%",
-            'r_rate': f"{(session.stats['r_count'] / total * 100):.2f}%",
-            'featured_ssr_counts': session.stats['featured_ssr_counts'],
-            'pity_counter': session.pity_counter
+            'ssr_count': session.ssr_count,
+            'sr_count': session.sr_count,
+            'r_count': session.r_count,
+            'ssr_rate': f"{(session.ssr_count / total * 100):.2f}%",
+            'sr_rate': f"{(session.sr_count / total * 100):.2f}%",
+            'r_rate': f"{(session.r_count / total * 100):.2f}%",
+            'featured_ssr_counts': session.featured_counts_dict(),
+            'pity_counter': session.pity_counter,
+            'quantiles': session.sketches.summary()
         }
 
     @staticmethod
     def get_history(session: UserSession, limit: int = None) -> List[Dict]:
         """获取抽卡历史记录"""
         if limit:
-            return session.stats['pull_history'][-limit:]
-        return session.stats['pull_history']
+            return session.pull_history[-limit:]
+        return session.pull_history[:]
 
     @staticmethod
     def generate_export_data(session: UserSession, pool_library_id: str = None) -> str:
@@ -66,8 +121,10 @@ class HistoryManager:
         ssr_cards = {}
         sr_cards = {}
         r_cards = {}
+        # 卡牌信息列表与品级统计在同一次遍历中生成（重放模式下遍历历史需要重新抽卡）
+        card_lines = []
 
-        for record in session.stats['pull_history']:
+        for i, record in enumerate(session.pull_history):
             card = record['card']
             card_id = card['card_id']
             card_name = card['name']
@@ -79,6 +136,10 @@ class HistoryManager:
                 bucket[key] = {'id': card_id, 'name': card_name, 'count': 0}
             bucket[key]['count'] += 1
 
+            card_lines.append(f"{record['pull_number']}. {card_id} {rarity} {card_name}")
+            if (i + 1) % 10 == 0:
+                card_lines.append("")
+
         def _append_rarity_stats(label: str, cards: dict, total_count: int, rate_str: str):
             lines.append(f"{label} 占 {rate_str}")
             for info in cards.values():
@@ -91,10 +152,6 @@ class HistoryManager:
         _append_rarity_stats('R', r_cards, stats['r_count'], stats['r_rate'])
 
         lines.append("=== 卡牌信息列表 ===")
-        for i, record in enumerate(session.stats['pull_history']):
-            card = record['card']
-            lines.append(f"{record['pull_number']}. {card['card_id']} {card['rarity']} {card['name']}")
-            if (i + 1) % 10 == 0:
-                lines.append("")
+        lines.extend(card_lines)
 
         return "\n".join(lines)
@@ -0,0 +1,320 @@
+"""
+概率计算器 - 基于保底马尔可夫链精确计算抽卡概率
+
+卡池编译后的保底规则表 (RarityTable) 定义了保底计数 0..hard_pity-1 上的
+有限马尔可夫链：每抽以当前计数对应的概率出 SSR 并归零，否则计数 +1。
+本模块直接由该链求出精确分布，替代大规模蒙特卡洛模拟；多份目标卡的
+抽数分布在 FFT 频域中由生成函数一次求出全部份数。
+"""
+import math
+from typing import Dict, Optional, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from models.pool import Pool
+from config import ODDS_CONFIG
+from services.pity_rules import RuleCompiler
+from services.pull_engine import PullEngine
+from services.result_cache import ResultCache, cache_key
+
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+MAX_CACHE_ENTRIES = ODDS_CONFIG['cache_size']
+
+# 截断分布时保留到均值之后多少个标准差（几何尾部 e^-21 量级）
+_TAIL_SIGMAS = 20
+
+
+class OddsCalculator:
+    """概率计算器 - 保底链上的精确分布与期望"""
+
+    # 两级结果缓存：对外结果同时写入磁盘层，FFT 中间矩阵只放内存层
+    _cache = ResultCache('odds', max_entries=MAX_CACHE_ENTRIES)
+
+    # ---- 基础分布 ----
+
+    @staticmethod
+    def ssr_hazard(pool: Pool = None) -> 'np.ndarray':
+        """保底计数 0..hard_pity-1 下单抽出 SSR 的概率（卡池规则）"""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy not available")
+        return RuleCompiler.for_pool(pool).ssr_array
+
+    @staticmethod
+    def pulls_to_ssr_pmf(start_pity: int = 0, pool: Pool = None) -> 'np.ndarray':
+        """
+        从指定保底计数开始，第 t 抽首次出 SSR 的概率。
+
+        Returns:
+            长度为 hard_pity - start_pity 的数组，下标 i 对应第 i+1 抽
+        """
+        hazard = OddsCalculator.ssr_hazard(pool)
+        hazard = hazard[OddsCalculator.clamp_pity(start_pity, pool):]
+        survival = np.concatenate(([1.0], np.cumprod(1.0 - hazard)[:-1]))
+        return survival * hazard
+
+    @staticmethod
+    def clamp_pity(start_pity: int, pool: Pool = None) -> int:
+        """将起始保底计数限制在 0..hard_pity-1（超出范围的计数与 hard_pity-1 结果相同）"""
+        return RuleCompiler.for_pool(pool).clamp(max(start_pity, 0))
+
+    @staticmethod
+    def featured_share(pool: Pool, card_id: str = None) -> float:
+        """
+        出 SSR 时命中目标卡的概率（与 PullEngine.select_card 规则一致）。
+
+        card_id 为空时目标为任意 UP 卡，否则为指定卡牌。
+        """
+        if not pool:
+            return 0.0
+        ssr_cards = pool.get_cards_by_rarity('SSR')
+        probs = PullEngine.card_probabilities(pool, 'SSR')
+        if card_id is None:
+            if not pool.featured_ssr:
+                return 0.0
+            return sum(p for c, p in zip(ssr_cards, probs) if c.is_featured)
+        return sum(p for c, p in zip(ssr_cards, probs) if c.card_id == card_id)
+
+    # ---- 多份目标卡 ----
+
+    @staticmethod
+    def _horizon(mean: float, var: float, extra: int) -> int:
+        """根据均值和方差确定分布截断长度"""
+        return int(math.ceil(mean + _TAIL_SIGMAS * math.sqrt(max(var, 0.0)))) + extra
+
+    @staticmethod
+    def _fft_size(n: int) -> int:
+        """不小于 n 的 2 的幂"""
+        return 1 << max(n - 1, 1).bit_length()
+
+    @staticmethod
+    def copies_matrix(pool: Pool, max_copies: int, card_id: str = None,
+                      start_pity: int = 0, cache: bool = True) -> Optional['np.ndarray']:
+        """
+        一次求出获得 1..max_copies 张目标卡所需抽数的分布（cache 为 False 时不读写缓存）。
+
+        每个 SSR 以 share 概率命中目标卡，设 T0、T 为从起始保底和从零保底
+        到出 SSR 的抽数分布，其生成函数满足：
+            G = share * T / (1 - (1 - share) * T)      相邻两次命中的间隔
+            F = T0 * (share + (1 - share) * G)          首次命中
+            第 k 次命中 = F * G^(k-1)
+        在 FFT 频域中逐点计算，再对全部 k 做一次逆变换。变换长度覆盖
+        max_copies 份的均值之后 _TAIL_SIGMAS 个标准差，循环卷积的回绕误差可忽略。
+
+        Returns:
+            形状为 (max_copies, horizon + 1) 的数组，第 k-1 行为 k 份的分布（下标为抽数）；
+            目标卡不可能出现时返回 None
+        """
+        share = OddsCalculator.featured_share(pool, card_id)
+        if share <= 0 or max_copies < 1:
+            return None
+
+        start_pity = OddsCalculator.clamp_pity(start_pity, pool)
+        if cache:
+            key = OddsCalculator._cache_key(pool, max_copies, card_id, start_pity, (), 'copies')
+            cached = OddsCalculator._cache.get(key)
+            if cached is not None:
+                return cached
+
+        cycle_pmf = OddsCalculator.pulls_to_ssr_pmf(0, pool)
+        first_pmf = OddsCalculator.pulls_to_ssr_pmf(start_pity, pool)
+        pulls = np.arange(1, len(cycle_pmf) + 1)
+        mean_t = float(np.dot(pulls, cycle_pmf))
+        var_t = float(np.dot(pulls ** 2, cycle_pmf)) - mean_t ** 2
+
+        # 每份目标卡所需 SSR 数服从几何分布
+        mean_n = 1.0 / share
+        var_n = (1.0 - share) / share ** 2
+        mean_f = mean_n * mean_t
+        var_f = mean_n * var_t + var_n * mean_t ** 2
+        horizon = OddsCalculator._horizon(
+            max_copies * mean_f, max_copies * var_f, len(cycle_pmf)
+        )
+        size = OddsCalculator._fft_size(horizon + 1)
+
+        cycle = np.zeros(size)
+        cycle[1:len(cycle_pmf) + 1] = cycle_pmf
+        first = np.zeros(size)
+        first[1:len(first_pmf) + 1] = first_pmf
+        cycle_hat = np.fft.rfft(cycle)
+        first_hat = np.fft.rfft(first)
+
+        gap_hat = share * cycle_hat / (1.0 - (1.0 - share) * cycle_hat)
+        hit_hat = first_hat * (share + (1.0 - share) * gap_hat)
+        powers = np.cumprod(
+            np.vstack([hit_hat] + [gap_hat] * (max_copies - 1)), axis=0
+        )
+        matrix = np.fft.irfft(powers, n=size, axis=1)[:, :horizon + 1]
+        np.clip(matrix, 0.0, None, out=matrix)
+        matrix.setflags(write=False)
+
+        if cache:
+            OddsCalculator._cache.put(key, matrix, [pool.pool_id], persist=False)
+        return matrix
+
+    @staticmethod
+    def pulls_to_copies_pmf(pool: Pool, copies: int = 1, card_id: str = None,
+                            start_pity: int = 0, cache: bool = True) -> Optional['np.ndarray']:
+        """
+        获得 copies 张目标卡所需抽数的分布（下标为抽数）。
+
+        目标卡不可能出现时返回 None。
+        """
+        if copies < 1:
+            return None
+        matrix = OddsCalculator.copies_matrix(pool, copies, card_id, start_pity, cache)
+        return None if matrix is None else matrix[copies - 1]
+
+    @staticmethod
+    def quantiles(pmf: 'np.ndarray', probs: Sequence[float]) -> Dict[str, int]:
+        """由抽数分布求分位抽数（下标即抽数）"""
+        cdf = np.cumsum(pmf)
+        result = {}
+        for p in probs:
+            idx = int(np.searchsorted(cdf, p - 1e-12))
+            result[f"p{p * 100:g}"] = min(idx, len(pmf) - 1)
+        return result
+
+    # ---- 对外接口 ----
+
+    @staticmethod
+    def _cache_key(pool: Pool, copies: int, card_id: Optional[str],
+                   start_pity: int, probs: Sequence[float], kind: str = 'odds') -> str:
+        """卡池定义、全局保底 / 品阶配置、结果类型与参数的哈希"""
+        return cache_key('odds', [pool], [kind, copies, card_id, start_pity, list(probs)])
+
+    @staticmethod
+    def _compute(pool: Pool, copies: int, card_id: Optional[str],
+                 start_pity: int, probs: Sequence[float], cache: bool = True) -> Dict:
+        pmf = OddsCalculator.pulls_to_ssr_pmf(start_pity, pool)
+        cycle_pmf = OddsCalculator.pulls_to_ssr_pmf(0, pool)
+        expected_to_ssr = float(np.dot(np.arange(1, len(pmf) + 1), pmf))
+        expected_cycle = float(np.dot(np.arange(1, len(cycle_pmf) + 1), cycle_pmf))
+        share = OddsCalculator.featured_share(pool, card_id)
+
+        result = {
+            'pool_id': pool.pool_id,
+            'start_pity': start_pity,
+            'ssr_rate': 1.0 / expected_cycle,
+            'expected_pulls_to_ssr': expected_to_ssr,
+            'ssr_pmf': pmf.tolist(),
+            'ssr_cdf': np.cumsum(pmf).tolist(),
+            'target_card_id': card_id,
+            'featured_share': share,
+            'featured_rate': share / expected_cycle,
+            'copies': copies,
+            'expected_pulls_to_copies': None,
+            'copies_quantiles': {},
+        }
+
+        copies_pmf = OddsCalculator.pulls_to_copies_pmf(pool, copies, card_id, start_pity,
+                                                        cache)
+        if copies_pmf is not None:
+            pulls = np.arange(len(copies_pmf))
+            result['expected_pulls_to_copies'] = float(np.dot(pulls, copies_pmf))
+            result['copies_quantiles'] = OddsCalculator.quantiles(copies_pmf, probs)
+        return result
+
+    @staticmethod
+    def get_odds(pool: Pool, copies: int = 1, card_id: str = None,
+                 start_pity: int = 0,
+                 probs: Sequence[float] = DEFAULT_QUANTILES) -> Dict:
+        """
+        获取卡池的精确概率信息（带缓存）
+
+        Args:
+            pool: 目标卡池
+            copies: 目标卡数量
+            card_id: 指定目标卡ID，为空时目标为任意UP卡
+            start_pity: 起始保底计数（限制在 0..hard_pity-1，结果中为限制后的值）
+            probs: 需要计算的分位点
+
+        Returns:
+            SSR 抽数分布、综合 SSR 概率、目标卡期望抽数与分位抽数
+        """
+        start_pity = OddsCalculator.clamp_pity(start_pity, pool)
+        key = OddsCalculator._cache_key(pool, copies, card_id, start_pity, probs)
+        cached = OddsCalculator._cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = OddsCalculator._compute(pool, copies, card_id, start_pity, probs)
+
+        OddsCalculator._cache.put(key, result, [pool.pool_id])
+        return result
+
+    @staticmethod
+    def evaluate(pool: Pool, copies: int = 1, card_id: str = None, start_pity: int = 0,
+                 probs: Sequence[float] = DEFAULT_QUANTILES, cache: bool = True) -> Dict:
+        """
+        计算卡池的精确概率信息（结果同 get_odds）
+
+        cache 为 False 时不查询也不写入缓存（含 FFT 中间矩阵），用于参数扫描等一次性卡池，
+        避免挤出对外接口的缓存结果。
+        """
+        if cache:
+            return OddsCalculator.get_odds(pool, copies, card_id, start_pity, probs)
+        start_pity = OddsCalculator.clamp_pity(start_pity, pool)
+        return OddsCalculator._compute(pool, copies, card_id, start_pity, probs, cache=False)
+
+    @staticmethod
+    def get_copies_distribution(pool: Pool, max_copies: int, start_pity: int = 0,
+                                probs: Sequence[float] = DEFAULT_QUANTILES,
+                                include_cdf: bool = False) -> Dict:
+        """
+        按卡池的 featured_ssr 获取 1..max_copies 份目标卡的抽数分布（带缓存）
+
+        目标包括任意UP卡以及每张UP卡，每个目标一次 FFT 求出全部份数。
+
+        Returns:
+            各目标的命中占比，以及每个份数的期望抽数、分位抽数和（可选）累计分布
+            （start_pity 为限制在 0..hard_pity-1 后的值）
+        """
+        start_pity = OddsCalculator.clamp_pity(start_pity, pool)
+        key = OddsCalculator._cache_key(
+            pool, max_copies, None, start_pity, probs, f'copies_table:{include_cdf}'
+        )
+        cached = OddsCalculator._cache.get(key)
+        if cached is not None:
+            return cached
+
+        targets = []
+        for card_id in [None] + list(pool.featured_ssr):
+            matrix = OddsCalculator.copies_matrix(pool, max_copies, card_id, start_pity)
+            if matrix is None:
+                continue
+            pulls = np.arange(matrix.shape[1])
+            rows = []
+            for k, pmf in enumerate(matrix, start=1):
+                row = {
+                    'copies': k,
+                    'expected_pulls': float(np.dot(pulls, pmf)),
+                    'quantiles': OddsCalculator.quantiles(pmf, probs),
+                }
+                if include_cdf:
+                    row['cdf'] = np.cumsum(pmf).tolist()
+                rows.append(row)
+            targets.append({
+                'card_id': card_id,
+                'featured_share': OddsCalculator.featured_share(pool, card_id),
+                'copies': rows,
+            })
+
+        result = {
+            'pool_id': pool.pool_id,
+            'start_pity': start_pity,
+            'max_copies': max_copies,
+            'targets': targets,
+        }
+        OddsCalculator._cache.put(key, result, [pool.pool_id])
+        return result
+
+    @staticmethod
+    def clear_cache():
+        """清空概率缓存（含磁盘层）"""
+        OddsCalculator._cache.clear()
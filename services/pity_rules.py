@@ -0,0 +1,165 @@
+"""
+保底规则编译器 - 将卡池的品阶概率、软/硬保底与UP概率编译为按保底计数索引的阈值表
+
+每个保底计数对应一组累计阈值 (SSR, SSR+SR)，抽卡时一次查表 + 比较即可确定品阶。
+卡池可在 cards.json 中覆盖全局的 CARD_RARITY / PITY_CONFIG：
+
+    {
+        "pool_id": "event",
+        "rarity_probability": {"SSR": 0.03, "SR": 0.12, "R": 0.85},
+        "pity": {"soft_pity": 60, "hard_pity": 80, "pity_increase": 0.08},
+        "featured_rate": 0.5,
+        ...
+    }
+
+编译结果挂在卡池索引上，卡池重新加载（索引重建）或调用 invalidate() 后重新编译。
+"""
+import json
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from models.pool import Pool
+from config import CARD_RARITY, PITY_CONFIG
+
+
+class RarityTable:
+    """编译后的品阶阈值表（只读）"""
+
+    __slots__ = ('rarity_probability', 'pity_config', 'featured_rate',
+                 'ssr_thresholds', 'sr_thresholds', 'ssr_array', 'sr_array',
+                 'survival', 'gap_cdf', 'sr_given_miss',
+                 'size', 'fingerprint', 'generation')
+
+    def __init__(self, rarity_probability: Dict[str, float], pity_config: Dict,
+                 featured_rate: float, fingerprint: str, generation: int):
+        self.rarity_probability = rarity_probability
+        self.pity_config = pity_config
+        self.featured_rate = featured_rate
+        self.fingerprint = fingerprint
+        self.generation = generation
+
+        self.size = max(int(pity_config['hard_pity']), 1)
+        sr_prob = rarity_probability['SR']
+        ssr = tuple(
+            ssr_probability(p, rarity_probability['SSR'], pity_config)
+            for p in range(self.size)
+        )
+        # 下标为保底计数：roll < ssr_thresholds[p] 出 SSR，roll < sr_thresholds[p] 出 SR
+        self.ssr_thresholds: Tuple[float, ...] = ssr
+        self.sr_thresholds: Tuple[float, ...] = tuple(p + sr_prob for p in ssr)
+
+        if NUMPY_AVAILABLE:
+            self.ssr_array = np.array(self.ssr_thresholds, dtype=np.float64)
+            self.sr_array = np.array(self.sr_thresholds, dtype=np.float64)
+            # survival[j]: 从零保底开始前 j 抽都未出 SSR 的概率 (j = 0..size)
+            self.survival = np.concatenate(([1.0], np.cumprod(1.0 - self.ssr_array)))
+            # gap_cdf[k-1]: 从零保底开始 k 抽内出 SSR 的概率
+            self.gap_cdf = 1.0 - self.survival[1:]
+            # 未出 SSR 的前提下出 SR 的条件概率
+            miss = 1.0 - self.ssr_array
+            sr_hit = np.minimum(self.sr_array, 1.0) - self.ssr_array
+            self.sr_given_miss = np.divide(
+                sr_hit, miss, out=np.zeros_like(miss), where=miss > 0
+            )
+        else:
+            self.ssr_array = None
+            self.sr_array = None
+            self.survival = None
+            self.gap_cdf = None
+            self.sr_given_miss = None
+
+    def clamp(self, pity_counter: int) -> int:
+        """将保底计数限制在表范围内"""
+        return pity_counter if pity_counter < self.size else self.size - 1
+
+
+def ssr_probability(pity_counter: int, base_prob: float, pity_config: Dict) -> float:
+    """按给定规则计算指定保底计数下的 SSR 概率"""
+    prob = base_prob
+
+    if pity_counter >= pity_config['soft_pity']:
+        extra_pulls = pity_counter - pity_config['soft_pity']
+        prob += extra_pulls * pity_config['pity_increase']
+
+    if pity_counter >= pity_config['hard_pity'] - 1:
+        prob = 1.0
+
+    return min(prob, 1.0)
+
+
+class RuleCompiler:
+    """保底规则编译器 - 按规则指纹缓存阈值表"""
+
+    _lock = threading.Lock()
+    _tables: Dict[str, RarityTable] = {}
+    _default: Optional[RarityTable] = None
+    _generation = 0
+
+    @staticmethod
+    def effective_rules(pool: Optional[Pool]) -> Tuple[Dict[str, float], Dict, float]:
+        """合并全局配置与卡池覆盖项，返回 (品阶概率, 保底配置, UP概率)"""
+        rarity_probability = {k: v['probability'] for k, v in CARD_RARITY.items()}
+        pity_config = dict(PITY_CONFIG)
+        if pool is not None:
+            rarity_probability.update(pool.rarity_probability or {})
+            pity_config.update(pool.pity_config or {})
+        featured_rate = pity_config.pop('featured_rate', 0.5)
+        if pool is not None and pool.featured_rate is not None:
+            featured_rate = pool.featured_rate
+        return rarity_probability, pity_config, featured_rate
+
+    @staticmethod
+    def fingerprint(rarity_probability: Dict[str, float], pity_config: Dict,
+                    featured_rate: float) -> str:
+        """规则内容的哈希"""
+        raw = json.dumps([rarity_probability, pity_config, featured_rate], sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def compile(pool: Optional[Pool] = None, cache: bool = True) -> RarityTable:
+        """
+        编译卡池规则（相同规则的卡池共享同一张表）
+
+        cache 为 False 时不查询也不写入共享缓存，用于参数扫描等一次性规则。
+        """
+        rules = RuleCompiler.effective_rules(pool)
+        key = RuleCompiler.fingerprint(*rules)
+        if not cache:
+            return RarityTable(*rules, fingerprint=key, generation=RuleCompiler._generation)
+        with RuleCompiler._lock:
+            table = RuleCompiler._tables.get(key)
+            if table is None or table.generation != RuleCompiler._generation:
+                table = RarityTable(*rules, fingerprint=key,
+                                    generation=RuleCompiler._generation)
+                RuleCompiler._tables[key] = table
+        return table
+
+    @staticmethod
+    def for_pool(pool: Optional[Pool]) -> RarityTable:
+        """获取卡池的阈值表，已编译且未失效时直接返回"""
+        if pool is None:
+            table = RuleCompiler._default
+            if table is None or table.generation != RuleCompiler._generation:
+                table = RuleCompiler.compile(None)
+                RuleCompiler._default = table
+            return table
+        table = pool.index.rules
+        if table is None or table.generation != RuleCompiler._generation:
+            table = RuleCompiler.compile(pool)
+            pool.index.rules = table
+        return table
+
+    @staticmethod
+    def invalidate():
+        """使全部已编译的表失效（修改全局 CARD_RARITY / PITY_CONFIG 后调用）"""
+        with RuleCompiler._lock:
+            RuleCompiler._generation += 1
+            RuleCompiler._tables.clear()
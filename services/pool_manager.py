@@ -32,12 +32,23 @@ class PoolManager:
                 data = json.load(f)
                 self.load_from_dict(data)
 
+    def _replace(self, pool: Pool):
+        """加入或替换卡池；替换已有卡池时使其结果缓存失效"""
+        if pool.pool_id in self.pools:
+            from services.result_cache import invalidate_pool
+            invalidate_pool(pool.pool_id)
+        self.pools[pool.pool_id] = pool
+
     def load_from_dict(self, data: Dict):
-        """从字典数据加载卡池"""
+        """
+        从字典数据加载卡池
+
+        Pool 在构造时即建立只读索引，这里整体替换字典中的 Pool 对象，
+        正在进行的抽卡仍持有旧对象及其索引，不会读到半更新状态。
+        """
         with self._lock:
             for pool_data in data.get('pools', []):
-                pool = Pool.from_dict(pool_data)
-                self.pools[pool.pool_id] = pool
+                self._replace(Pool.from_dict(pool_data))
             if self.pools and not self._default_pool_id:
                 self._default_pool_id = list(self.pools.keys())[0]
 
@@ -47,8 +58,7 @@ class PoolManager:
             from proto.converter import ProtoConverter
             with self._lock:
                 for proto_pool in proto_pools:
-                    pool = ProtoConverter.proto_to_pool(proto_pool)
-                    self.pools[pool.pool_id] = pool
+                    self._replace(ProtoConverter.proto_to_pool(proto_pool))
                 if self.pools and not self._default_pool_id:
                     self._default_pool_id = list(self.pools.keys())[0]
             return True
@@ -100,7 +110,7 @@ class PoolManager:
             from proto.converter import ProtoConverter
             pool = ProtoConverter.proto_to_pool(proto_pool)
             with self._lock:
-                self.pools[pool.pool_id] = pool
+                self._replace(pool)
             return True
         except Exception as e:
             print(f"Error updating pool from proto: {e}")
@@ -109,6 +119,10 @@ class PoolManager:
     def clear(self):
         """清空所有卡池数据"""
         with self._lock:
+            if self.pools:
+                from services.result_cache import invalidate_pool
+                for pool_id in self.pools:
+                    invalidate_pool(pool_id)
             self.pools.clear()
             self._default_pool_id = None
 
@@ -0,0 +1,299 @@
+"""
+玩家群体模拟 - 按消费分层（零氪 / 中氪 / 重氪）模拟大量虚拟玩家在一个卡池中的抽卡结果
+
+每名玩家先按分层占比归入一个分层，再从该分层的预算分布中抽取本期抽数预算，
+从零保底开始抽完预算（规则与 PullEngine 一致：编译后的保底阈值表 + UP 卡命中占比）。
+
+玩家按固定大小分块，第 i 块使用根随机数源的第 i 个子流，在共享进程池中计算。
+各块直接把计数写入 multiprocessing.shared_memory 中属于自己的一行直方图，
+不通过进程间序列化返回结果；主进程在全部块完成后按行求和。
+
+块内玩家按预算降序排列，第 t 抽只推进预算不少于 t 的前缀，总计算量与总抽数成正比。
+"""
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from models.pool import Pool
+from config import POPULATION_CONFIG
+from services.odds import OddsCalculator
+from services.pity_rules import RuleCompiler
+from services.rng import create_source, from_spec
+from services.simulation import SimulationService
+
+
+# 预算分布 -> 必填参数
+BUDGET_DISTRIBUTIONS = {
+    'fixed': ('value',),
+    'uniform': ('low', 'high'),
+    'normal': ('mean', 'std'),
+    'lognormal': ('median', 'sigma'),
+    'poisson': ('mean',),
+}
+
+
+def validate_segments(segments: List[Dict]) -> List[Dict]:
+    """
+    校验分层配置并归一化占比
+
+    每个分层形如 {'name': 'f2p', 'share': 0.8, 'budget': {'distribution': 'poisson', 'mean': 40}}
+
+    Raises:
+        ValueError: 分层为空、重名、占比非正或预算分布无效
+    """
+    if not segments:
+        raise ValueError("At least one segment is required")
+    names = [s.get('name') for s in segments]
+    if not all(names) or len(set(names)) != len(names):
+        raise ValueError("Segment names must be unique and non-empty")
+
+    total = sum(float(s.get('share', 0)) for s in segments)
+    if total <= 0 or any(float(s.get('share', 0)) < 0 for s in segments):
+        raise ValueError("Segment shares must be non-negative with a positive sum")
+
+    result = []
+    for segment in segments:
+        budget = dict(segment.get('budget') or {})
+        distribution = budget.get('distribution')
+        required = BUDGET_DISTRIBUTIONS.get(distribution)
+        if required is None:
+            raise ValueError(f"Unknown budget distribution: {distribution}")
+        missing = [key for key in required if key not in budget]
+        if missing:
+            raise ValueError(f"Segment {segment['name']} budget missing {missing}")
+        for key in required:
+            budget[key] = float(budget[key])
+            if budget[key] < 0:
+                raise ValueError(f"Segment {segment['name']} budget {key} must be non-negative")
+        result.append({
+            'name': segment['name'],
+            'share': float(segment['share']) / total,
+            'budget': budget,
+        })
+    return result
+
+
+def draw_budgets(budget: Dict, count: int, rng: 'np.random.Generator') -> 'np.ndarray':
+    """按预算分布抽取 count 名玩家的抽数预算（取整并限制在 [0, max_budget]）"""
+    distribution = budget['distribution']
+    if distribution == 'fixed':
+        values = np.full(count, budget['value'])
+    elif distribution == 'uniform':
+        values = rng.uniform(budget['low'], budget['high'] + 1, count)
+    elif distribution == 'normal':
+        values = rng.normal(budget['mean'], budget['std'], count)
+    elif distribution == 'lognormal':
+        values = rng.lognormal(np.log(max(budget['median'], 1e-9)), budget['sigma'], count)
+    else:
+        values = rng.poisson(budget['mean'], count)
+    return np.clip(np.floor(values), 0, POPULATION_CONFIG['max_budget']).astype(np.int64)
+
+
+class PopulationLayout:
+    """共享内存直方图中每一行（一个块 x 一个分层）的列布局"""
+
+    SCALARS = ('players', 'pulls', 'ssr', 'featured', 'acquired')
+
+    def __init__(self, max_copies: int, pity_size: int):
+        self.max_copies = max_copies
+        self.pity_size = pity_size
+        self.offsets = {name: i for i, name in enumerate(self.SCALARS)}
+        self.copies_start = len(self.SCALARS)
+        self.pity_start = self.copies_start + max_copies + 1
+        self.width = self.pity_start + pity_size
+
+
+def simulate_chunk(pool: Pool, segments: List[Dict], players: int,
+                   rng: 'np.random.Generator', layout: PopulationLayout) -> 'np.ndarray':
+    """
+    模拟一块玩家，返回形状为 (分层数, layout.width) 的计数数组
+
+    列依次为: 玩家数、总抽数、SSR 数、UP 卡数、获得至少一张 UP 的玩家数、
+    UP 卡数量直方图（最后一格为不少于 max_copies）、结束时保底计数直方图。
+    """
+    rules = RuleCompiler.for_pool(pool)
+    share = OddsCalculator.featured_share(pool)
+    n_segments = len(segments)
+
+    seg = rng.choice(n_segments, size=players, p=[s['share'] for s in segments])
+    budgets = np.zeros(players, dtype=np.int64)
+    for i, segment in enumerate(segments):
+        mask = seg == i
+        budgets[mask] = draw_budgets(segment['budget'], int(mask.sum()), rng)
+
+    # 按预算降序排列，第 t 抽只推进前 active[t] 名玩家
+    order = np.argsort(-budgets, kind='stable')
+    budgets, seg = budgets[order], seg[order]
+    max_budget = int(budgets[0]) if players else 0
+    active = np.searchsorted(-budgets, -np.arange(1, max_budget + 1), side='right')
+
+    pity = np.zeros(players, dtype=np.int64)
+    ssr = np.zeros(players, dtype=np.int64)
+    copies = np.zeros(players, dtype=np.int64)
+    ssr_array = rules.ssr_array
+    for n in active.tolist():
+        p = pity[:n]
+        winners = np.flatnonzero(rng.random(n) < ssr_array[p])
+        p += 1
+        if winners.size:
+            pity[winners] = 0
+            ssr[winners] += 1
+            if share > 0:
+                copies[winners[rng.random(winners.size) < share]] += 1
+
+    counts = np.zeros((n_segments, layout.width), dtype=np.int64)
+    off = layout.offsets
+    counts[:, off['players']] = np.bincount(seg, minlength=n_segments)
+    counts[:, off['pulls']] = np.bincount(seg, weights=budgets, minlength=n_segments)
+    counts[:, off['ssr']] = np.bincount(seg, weights=ssr, minlength=n_segments)
+    counts[:, off['featured']] = np.bincount(seg, weights=copies, minlength=n_segments)
+    counts[:, off['acquired']] = np.bincount(seg, weights=copies > 0, minlength=n_segments)
+    capped = np.minimum(copies, layout.max_copies)
+    np.add.at(counts, (seg, layout.copies_start + capped), 1)
+    np.add.at(counts, (seg, layout.pity_start + pity), 1)
+    return counts
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """连接已有的共享内存块（不交给资源跟踪器管理，由创建者负责释放）"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 没有 track 参数
+        return shared_memory.SharedMemory(name=name)
+
+
+def _population_chunk(shm_name: str, shape: tuple, slot: int, pool_data: Dict,
+                      segments: List[Dict], players: int, rng_spec: tuple,
+                      max_copies: int) -> int:
+    """进程池任务：模拟一块玩家并把计数写入共享内存中的第 slot 行，返回玩家数"""
+    pool = Pool.from_dict(pool_data)
+    layout = PopulationLayout(max_copies, RuleCompiler.for_pool(pool).size)
+    counts = simulate_chunk(pool, segments, players, from_spec(rng_spec).generator(), layout)
+    shm = _attach(shm_name)
+    try:
+        table = np.ndarray(shape, dtype=np.int64, buffer=shm.buf)
+        table[slot] = counts
+        del table
+    finally:
+        shm.close()
+    return players
+
+
+class PopulationService:
+    """玩家群体模拟服务"""
+
+    @staticmethod
+    def run(pool: Pool, players: int, segments: List[Dict] = None, seed: int = None,
+            workers: int = None, backend: str = None) -> Dict:
+        """
+        运行群体模拟
+
+        Args:
+            pool: 目标卡池
+            players: 虚拟玩家数量
+            segments: 分层配置（默认使用 POPULATION_CONFIG['segments']）
+            seed: 随机种子（为空时随机生成，并在结果中返回）
+            workers: 工作进程数（默认使用配置值）
+            backend: 随机数后端 (stdlib/pcg64/philox)，默认使用配置值
+
+        Returns:
+            各分层的 UP 获取率、UP 数量分布与保底继承（结束时保底计数）分布
+
+        Raises:
+            RuntimeError: NumPy 不可用
+            ValueError: 分层配置或随机数后端无效
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy not available")
+
+        started = time.perf_counter()
+        segments = validate_segments(segments or POPULATION_CONFIG['segments'])
+        root = create_source(backend, seed)
+        max_copies = POPULATION_CONFIG['max_copies']
+        layout = PopulationLayout(max_copies, RuleCompiler.for_pool(pool).size)
+
+        chunk = POPULATION_CONFIG['chunk_players']
+        sizes = [min(chunk, players - i) for i in range(0, players, chunk)]
+        specs = [root.jumped(i).spec() for i in range(len(sizes))]
+        workers = max(1, min(workers or POPULATION_CONFIG['max_workers'], len(sizes)))
+        shape = (len(sizes), len(segments), layout.width)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 8))
+        try:
+            table = np.ndarray(shape, dtype=np.int64, buffer=shm.buf)
+            table[:] = 0
+            if workers == 1 or players < POPULATION_CONFIG['inline_threshold']:
+                for slot, (size, spec) in enumerate(zip(sizes, specs)):
+                    table[slot] = simulate_chunk(
+                        pool, segments, size, from_spec(spec).generator(), layout
+                    )
+            else:
+                executor = SimulationService._get_executor(workers)
+                pool_data = pool.to_dict()
+                futures = [
+                    executor.submit(_population_chunk, shm.name, shape, slot, pool_data,
+                                    segments, size, spec, max_copies)
+                    for slot, (size, spec) in enumerate(zip(sizes, specs))
+                ]
+                for f in futures:
+                    f.result()
+            totals = table.sum(axis=0)
+            del table
+        finally:
+            shm.close()
+            shm.unlink()
+
+        elapsed = time.perf_counter() - started
+        result = PopulationService.summarize(pool, segments, totals, layout)
+        result.update({
+            'seed': root.seed,
+            'rng_backend': root.name,
+            'workers': workers,
+            'elapsed_ms': elapsed * 1000,
+            'players_per_second': players / elapsed if elapsed > 0 else None,
+        })
+        return result
+
+    @staticmethod
+    def summarize(pool: Pool, segments: List[Dict], totals: 'np.ndarray',
+                  layout: PopulationLayout) -> Dict:
+        """将各分层的计数整理为对外结果"""
+        off = layout.offsets
+        rows = []
+        for segment, counts in zip(segments, totals):
+            players = int(counts[off['players']])
+            pulls = int(counts[off['pulls']])
+            pity_hist = counts[layout.pity_start:layout.pity_start + layout.pity_size]
+            rows.append({
+                'segment': segment['name'],
+                'share': segment['share'],
+                'budget': segment['budget'],
+                'players': players,
+                'mean_budget': pulls / players if players else 0.0,
+                'ssr_rate': int(counts[off['ssr']]) / pulls if pulls else 0.0,
+                'featured_acquisition_rate': (
+                    int(counts[off['acquired']]) / players if players else 0.0
+                ),
+                'mean_featured_copies': int(counts[off['featured']]) / players if players else 0.0,
+                'featured_copies': counts[layout.copies_start:layout.pity_start].tolist(),
+                'pity_carryover': pity_hist.tolist(),
+                'mean_pity_carryover': (
+                    float(np.dot(np.arange(layout.pity_size), pity_hist)) / players
+                    if players else 0.0
+                ),
+            })
+        return {
+            'pool_id': pool.pool_id,
+            'players': int(totals[:, off['players']].sum()),
+            'total_pulls': int(totals[:, off['pulls']].sum()),
+            'max_copies': layout.max_copies,
+            'segments': rows,
+        }
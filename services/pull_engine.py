@@ -1,13 +1,33 @@
 """
 抽卡引擎 - 核心概率计算和卡牌抽取逻辑
+
+每抽固定消耗随机数源中的 DRAWS_PER_PULL 个均匀随机数（品阶、UP判定、选牌），
+单抽与批量抽卡在相同位置得到相同结果。
 """
-import random
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
 
 from models.card import Card
 from models.pool import Pool
 from config import CARD_RARITY, PITY_CONFIG
 from services.session_manager import UserSession
+from services.pull_history import CompactSegment
+from services.alias_table import AliasIndex
+from services.pity_rules import RarityTable, RuleCompiler, ssr_probability
+from services.rng import DRAWS_PER_PULL, RandomSource, create_source, from_spec
+
+
+_RARITY_NAMES = ('SSR', 'SR', 'R')
+_RARITY_SSR, _RARITY_SR, _RARITY_R = 0, 1, 2
+
+# 未指定随机数源时使用的进程级随机数源
+_default_rng = create_source()
 
 
 class PullEngine:
@@ -15,35 +35,39 @@ class PullEngine:
 
     @staticmethod
     def calculate_ssr_probability(pity_counter: int) -> float:
-        """计算当前SSR抽中概率"""
-        base_prob = CARD_RARITY['SSR']['probability']
-
-        if pity_counter >= PITY_CONFIG['soft_pity']:
-            extra_pulls = pity_counter - PITY_CONFIG['soft_pity']
-            base_prob += extra_pulls * PITY_CONFIG['pity_increase']
-
-        if pity_counter >= PITY_CONFIG['hard_pity'] - 1:
-            base_prob = 1.0
-
-        return min(base_prob, 1.0)
+        """计算当前SSR抽中概率（全局规则）"""
+        return ssr_probability(pity_counter, CARD_RARITY['SSR']['probability'], PITY_CONFIG)
 
     @staticmethod
-    def determine_rarity(pity_counter: int) -> str:
-        """根据概率决定抽中卡牌的品阶"""
-        roll = random.random()
-        ssr_prob = PullEngine.calculate_ssr_probability(pity_counter)
-        sr_prob = CARD_RARITY['SR']['probability']
+    def rarity_from_roll(roll: float, pity_counter: int, table: RarityTable) -> str:
+        """由品阶随机数和保底计数确定品阶（一次查表 + 比较）"""
+        pity = table.clamp(pity_counter)
 
-        if roll < ssr_prob:
+        if roll < table.ssr_thresholds[pity]:
             return 'SSR'
-        elif roll < ssr_prob + sr_prob:
+        elif roll < table.sr_thresholds[pity]:
             return 'SR'
         else:
             return 'R'
 
     @staticmethod
-    def select_card(pool: Pool, rarity: str) -> Optional[Card]:
-        """从卡池中选择一张指定品阶的卡牌"""
+    def determine_rarity(pity_counter: int, rules: RarityTable = None,
+                         rng: RandomSource = None) -> str:
+        """根据概率决定抽中卡牌的品阶"""
+        table = rules or RuleCompiler.for_pool(None)
+        roll = (rng or _default_rng).random()
+        return PullEngine.rarity_from_roll(roll, pity_counter, table)
+
+    @staticmethod
+    def pick_card(pool: Pool, rarity: str, coin: float, pick: float,
+                  featured_rate: float) -> Optional[Card]:
+        """
+        由 UP 判定随机数和选牌随机数选出一张指定品阶的卡牌
+
+        Args:
+            coin: UP判定随机数，小于 featured_rate 时从UP卡中选
+            pick: 选牌随机数，经别名表按卡牌权重映射为候选卡牌下标
+        """
         if not pool:
             return None
 
@@ -51,14 +75,31 @@ class PullEngine:
         if not cards:
             return None
 
-        # SSR有50%概率出UP卡
-        if rarity == 'SSR' and pool.featured_ssr:
-            if random.random() < 0.5:
-                featured_cards = [c for c in cards if c.is_featured]
-                if featured_cards:
-                    return random.choice(featured_cards)
+        # SSR按UP概率出UP卡
+        if rarity == 'SSR' and pool.featured_ssr and coin < featured_rate:
+            featured_cards = pool.get_featured_cards(rarity)
+            if featured_cards:
+                return featured_cards[AliasIndex.for_pool(pool, rarity, True).sample(pick)]
+
+        return cards[AliasIndex.for_pool(pool, rarity).sample(pick)]
 
-        return random.choice(cards)
+    @staticmethod
+    def select_card(pool: Pool, rarity: str, rules: RarityTable = None,
+                    rng: RandomSource = None) -> Optional[Card]:
+        """从卡池中选择一张指定品阶的卡牌"""
+        rng = rng or _default_rng
+        featured_rate = (rules or RuleCompiler.for_pool(pool)).featured_rate
+        coin, pick = rng.random(), rng.random()
+        return PullEngine.pick_card(pool, rarity, coin, pick, featured_rate)
+
+    @staticmethod
+    def _mock_card(rarity: str, pick: float) -> Card:
+        """卡池中没有该品阶卡牌时生成的模拟卡牌"""
+        return Card(
+            card_id=f"MOCK_{rarity}_{1000 + int(pick * 9000)}",
+            name=f"模拟{rarity}卡牌",
+            rarity=rarity
+        )
 
     @staticmethod
     def pull_once(session: UserSession, pool: Pool) -> Dict:
@@ -66,32 +107,352 @@ class PullEngine:
         执行一次抽卡，更新会话统计，返回抽卡记录。
         不涉及历史记录存储（由调用方决定）。
         """
-        rarity = PullEngine.determine_rarity(session.pity_counter)
-        card = PullEngine.select_card(pool, rarity)
+        rules = RuleCompiler.for_pool(pool)
+        rng = session.rng
+        roll, coin, pick = rng.random(), rng.random(), rng.random()
+        rarity = PullEngine.rarity_from_roll(roll, session.pity_counter, rules)
+        card = PullEngine.pick_card(pool, rarity, coin, pick, rules.featured_rate)
 
         if not card:
-            card = Card(
-                card_id=f"MOCK_{rarity}_{random.randint(1000, 9999)}",
-                name=f"模拟{rarity}卡牌",
-                rarity=rarity
-            )
+            card = PullEngine._mock_card(rarity, pick)
 
         # 更新统计
-        session.stats['total_pulls'] += 1
-        session.pity_counter += 1
+        session.total_pulls += 1
+        pity = session.pity_counter + 1
 
         if rarity == 'SSR':
-            session.stats['ssr_count'] += 1
-            session.pity_counter = 0
-            if card.card_id in session.stats['featured_ssr_counts']:
-                session.stats['featured_ssr_counts'][card.card_id] += 1
+            session.ssr_count += 1
+            slot = session.featured.slots.get(card.card_id)
+            session.sketches.observe_one(pity, slot is not None)
+            pity = 0
+            if slot is not None:
+                session.featured_counts[slot] += 1
         elif rarity == 'SR':
-            session.stats['sr_count'] += 1
+            session.sr_count += 1
         else:
-            session.stats['r_count'] += 1
+            session.r_count += 1
+        session.pity_counter = pity
 
         return {
-            'pull_number': session.stats['total_pulls'],
+            'pull_number': session.total_pulls,
             'card': card.to_dict(),
-            'pity_count': session.pity_counter
+            'pity_count': pity
         }
+
+    @staticmethod
+    def card_probabilities(pool: Pool, rarity: str, rules: RarityTable = None) -> List[float]:
+        """
+        出指定品阶时每张卡被选中的概率（与 select_card 规则一致）
+
+        Returns:
+            与 pool.get_cards_by_rarity(rarity) 对齐的概率列表
+        """
+        cards = pool.get_cards_by_rarity(rarity) if pool else ()
+        if not cards:
+            return []
+        probs = AliasIndex.for_pool(pool, rarity).probabilities()
+        if rarity == 'SSR' and pool.featured_ssr:
+            featured_pos = pool.index.featured_positions[rarity]
+            if featured_pos:
+                featured_rate = (rules or RuleCompiler.for_pool(pool)).featured_rate
+                featured_probs = AliasIndex.for_pool(pool, rarity, True).probabilities()
+                probs = [p * (1 - featured_rate) for p in probs]
+                for pos, p in zip(featured_pos, featured_probs):
+                    probs[pos] += featured_rate * p
+        return probs
+
+    # ---- 批量抽卡（NumPy 向量化） ----
+
+    @staticmethod
+    def _resolve_rarities(rolls: 'np.ndarray', start_pity: int, rules: RarityTable):
+        """
+        根据均匀随机数序列解析每一抽的品阶与抽前保底计数。
+
+        保底只在 SSR 处重置，因此按 SSR 逐段扫描：每段内保底计数连续递增，
+        一次向量比较即可找到该段第一个 SSR。循环次数等于 SSR 数量。
+
+        Returns:
+            (rarities, pity_before, end_pity)
+        """
+        n = len(rolls)
+        table = rules.ssr_array
+        size = rules.size
+
+        pity_before = np.empty(n, dtype=np.int64)
+        ssr_mask = np.zeros(n, dtype=bool)
+
+        pos = 0
+        pity = rules.clamp(start_pity)
+        while pos < n:
+            span = min(size - pity, n - pos)
+            hits = np.flatnonzero(rolls[pos:pos + span] < table[pity:pity + span])
+            if hits.size:
+                length = int(hits[0]) + 1
+                pity_before[pos:pos + length] = np.arange(pity, pity + length)
+                ssr_mask[pos + length - 1] = True
+                pos += length
+                pity = 0
+            else:
+                pity_before[pos:pos + span] = np.arange(pity, pity + span)
+                pos += span
+                pity += span
+        end_pity = pity
+
+        rarities = np.full(n, _RARITY_R, dtype=np.int8)
+        rarities[rolls < rules.sr_array[pity_before]] = _RARITY_SR
+        rarities[ssr_mask] = _RARITY_SSR
+        return rarities, pity_before, end_pity
+
+    @staticmethod
+    def _select_cards_batch(pool: Pool, rarity: str, coins: 'np.ndarray',
+                            picks: 'np.ndarray', catalog: List[Dict],
+                            featured_rate: float) -> 'np.ndarray':
+        """
+        为指定品阶批量选牌（与 pick_card 逐抽结果一致）。
+
+        选中卡牌的字典追加到 catalog 中（每个卡池每张卡只生成一次，各批次共用，只读），
+        返回每一抽对应的 catalog 下标数组。
+        """
+        offset = len(catalog)
+        cards = pool.get_cards_by_rarity(rarity) if pool else ()
+        if not cards:
+            catalog.extend(
+                PullEngine._mock_card(rarity, pick).to_dict() for pick in picks.tolist()
+            )
+            return np.arange(offset, offset + len(picks))
+
+        dicts = pool.index.card_dicts.get(rarity)
+        if dicts is None:
+            dicts = pool.index.card_dicts[rarity] = tuple(card.to_dict() for card in cards)
+        catalog.extend(dicts)
+        idx = AliasIndex.for_pool(pool, rarity).sample_array(picks)
+
+        # SSR按UP概率出UP卡
+        if rarity == 'SSR' and pool.featured_ssr:
+            featured_idx = np.array(pool.index.featured_positions[rarity], dtype=np.int64)
+            if featured_idx.size:
+                use_featured = coins < featured_rate
+                idx[use_featured] = featured_idx[
+                    AliasIndex.for_pool(pool, rarity, True).sample_array(picks[use_featured])
+                ]
+
+        return idx + offset
+
+    @staticmethod
+    def _draw_batch(pool: Pool, rules: RarityTable, rng: RandomSource, start_pity: int,
+                    n: int):
+        """
+        从随机数源当前位置取 n 抽的随机数，解析品阶与选牌（不涉及会话状态）
+
+        Returns:
+            (catalog, card_idx, rarities, pity_before, end_pity)
+        """
+        draws = rng.random_array(n * DRAWS_PER_PULL).reshape(n, DRAWS_PER_PULL)
+        rolls, coins, picks = draws[:, 0], draws[:, 1], draws[:, 2]
+        rarities, pity_before, end_pity = PullEngine._resolve_rarities(
+            rolls, start_pity, rules
+        )
+
+        catalog: List[Dict] = []
+        card_idx = np.empty(n, dtype=np.int32)
+        for code, rarity in enumerate(_RARITY_NAMES):
+            mask = rarities == code
+            if mask.any():
+                card_idx[mask] = PullEngine._select_cards_batch(
+                    pool, rarity, coins[mask], picks[mask], catalog, rules.featured_rate
+                )
+        return catalog, card_idx, rarities, pity_before, end_pity
+
+    @staticmethod
+    def _pity_after(rarities: 'np.ndarray', pity_before: 'np.ndarray') -> 'np.ndarray':
+        """抽后保底计数：SSR 归零，其余为抽前计数 + 1"""
+        pity_after = (pity_before + 1).astype(np.int32)
+        pity_after[rarities == _RARITY_SSR] = 0
+        return pity_after
+
+    @staticmethod
+    def replay(pool: Pool, rules: RarityTable, rng_spec: tuple, position: int,
+               start_pity: int, start: int, n: int) -> CompactSegment:
+        """
+        重放一段抽卡：从随机数源 rng_spec 的 position 处、以 start_pity 为保底计数
+        重新计算 n 抽，得到与当初单抽 / 批量抽卡完全相同的记录段（不修改任何会话）
+
+        Args:
+            pool: 当初抽卡时的卡池对象
+            rules: 当初抽卡时的阈值表
+            rng_spec: RandomSource.spec()
+            position: 段首抽卡前随机数源的位置
+            start_pity: 段首抽卡前的保底计数
+            start: 段首抽卡前的总抽数（决定 pull_number）
+            n: 抽数
+        """
+        if n <= 0:
+            return CompactSegment(start, [], [], [])
+        rng = from_spec(rng_spec)
+        rng.seek(position)
+        catalog, card_idx, rarities, pity_before, _ = PullEngine._draw_batch(
+            pool, rules, rng, start_pity, n
+        )
+        return CompactSegment(start, catalog, card_idx,
+                              PullEngine._pity_after(rarities, pity_before))
+
+    @staticmethod
+    def pull_batch_compact(session: UserSession, pool: Pool, n: int) -> CompactSegment:
+        """
+        批量执行 n 次抽卡，结果分布与逐次调用 pull_once 一致。
+
+        一次性生成全部随机数，通过向量化扫描解析保底，
+        然后批量更新会话统计。结果以紧凑记录段返回，
+        不逐条生成记录字典，也不涉及历史记录存储（由调用方决定）。
+        """
+        start = session.total_pulls
+        if n <= 0:
+            return CompactSegment(start, [], [], [])
+        if not NUMPY_AVAILABLE:
+            records = [PullEngine.pull_once(session, pool) for _ in range(n)]
+            return CompactSegment(
+                start, [r['card'] for r in records], range(n),
+                [r['pity_count'] for r in records]
+            )
+
+        rules = RuleCompiler.for_pool(pool)
+        catalog, card_idx, rarities, pity_before, end_pity = PullEngine._draw_batch(
+            pool, rules, session.rng, session.pity_counter, n
+        )
+        ssr_mask = rarities == _RARITY_SSR
+        pity_after = PullEngine._pity_after(rarities, pity_before)
+
+        # 批量更新统计
+        counts = np.bincount(rarities, minlength=3)
+        session.total_pulls += n
+        session.ssr_count += int(counts[_RARITY_SSR])
+        session.sr_count += int(counts[_RARITY_SR])
+        session.r_count += int(counts[_RARITY_R])
+        session.pity_counter = end_pity
+
+        ssr_idx = card_idx[ssr_mask]
+        if ssr_idx.size:
+            # 卡牌目录下标 -> UP卡计数下标（非UP卡为 -1）
+            featured = session.featured
+            slots = np.array([featured.slots.get(c['card_id'], -1) for c in catalog],
+                             dtype=np.int64)[ssr_idx]
+            is_featured = slots >= 0
+            session.sketches.observe(pity_before[ssr_mask] + 1, is_featured)
+            if featured.ids:
+                hits = np.bincount(slots[is_featured], minlength=len(featured.ids))
+                featured_counts = session.featured_counts
+                for slot in np.flatnonzero(hits).tolist():
+                    featured_counts[slot] += int(hits[slot])
+
+        return CompactSegment(start, catalog, card_idx, pity_after)
+
+    @staticmethod
+    def pull_batch(session: UserSession, pool: Pool, n: int) -> List[Dict]:
+        """批量执行 n 次抽卡，返回全部抽卡记录（见 pull_batch_compact）"""
+        return PullEngine.pull_batch_compact(session, pool, n).records()
+
+    # ---- 仅统计模式（跳跃采样） ----
+
+    @staticmethod
+    def _sample_gaps(rules: RarityTable, count: int,
+                     gen: 'np.random.Generator') -> 'np.ndarray':
+        """从零保底开始，按逆 CDF 批量采样到下一个 SSR 的抽数"""
+        rolls = gen.random(count)
+        return np.searchsorted(rules.gap_cdf, rolls, side='left') + 1
+
+    @staticmethod
+    def pull_counts(session: UserSession, pool: Pool, n: int):
+        """
+        仅统计模式：执行 n 次抽卡，只更新会话计数，不生成抽卡记录。
+
+        直接按保底风险函数的逆 CDF 采样相邻 SSR 的间隔，
+        非 SSR 抽按保底计数汇总后用二项分布拆分 SR/R，
+        UP 卡计数用多项分布一次抽取。耗时与 SSR 数量成正比，与抽数无关。
+
+        采样使用由会话随机数源当前位置派生的生成器，结束后随机数源
+        前进 n 抽对应的位置，因此结果仍由种子与累计抽数确定。
+        """
+        if n <= 0:
+            return
+        if not NUMPY_AVAILABLE:
+            for _ in range(n):
+                PullEngine.pull_once(session, pool)
+            return
+
+        rules = RuleCompiler.for_pool(pool)
+        size = rules.size
+        gen = session.rng.generator_at(session.rng.position)
+        session.rng.seek(session.rng.position + n * DRAWS_PER_PULL)
+        # miss_hist[j]: 保底计数为 j 时未出 SSR 的抽数
+        miss_hist = np.zeros(size + 1, dtype=np.int64)
+        ssr_total = 0
+        # 按顺序记录每个 SSR 的间隔，供会话草图使用
+        gap_parts = []
+
+        # 第一段从当前保底计数开始：P(间隔 <= k) = 1 - survival[p+k] / survival[p]
+        pity = rules.clamp(session.pity_counter)
+        roll = gen.random()
+        target = (1.0 - roll) * rules.survival[pity]
+        tail = rules.survival[pity + 1:]
+        gap = int(np.searchsorted(-tail, -target, side='left')) + 1
+        if gap > n:
+            miss_hist[pity:pity + n] += 1
+            remaining = 0
+            pity += n
+        else:
+            miss_hist[pity:pity + gap - 1] += 1
+            ssr_total += 1
+            gap_parts.append(np.array([pity + gap], dtype=np.int64))
+            remaining = n - gap
+            pity = 0
+
+        # 之后每段都从零保底开始，间隔独立同分布，可整批采样
+        mean_gap = float(rules.survival[:size].sum())
+        miss_lengths = np.zeros(size + 1, dtype=np.int64)
+        while remaining > 0:
+            expected = remaining / mean_gap
+            batch = int(expected + 4 * expected ** 0.5) + 16
+            gaps = PullEngine._sample_gaps(rules, batch, gen)
+            ends = np.cumsum(gaps)
+            fit = int(np.searchsorted(ends, remaining, side='right'))
+            if fit:
+                miss_lengths += np.bincount(gaps[:fit] - 1, minlength=size + 1)
+                ssr_total += fit
+                gap_parts.append(gaps[:fit])
+                remaining -= int(ends[fit - 1])
+            if fit < batch:
+                # 剩余抽数不足以再出一个 SSR
+                miss_hist[:remaining] += 1
+                pity = remaining
+                remaining = 0
+
+        # 长度为 L 的未出段覆盖保底计数 0..L-1
+        miss_hist += np.cumsum(miss_lengths[::-1])[::-1] - miss_lengths
+        miss_counts = miss_hist[:size]
+        sr_total = int(gen.binomial(miss_counts, rules.sr_given_miss).sum())
+        miss_total = int(miss_counts.sum())
+
+        session.total_pulls += n
+        session.ssr_count += ssr_total
+        session.sr_count += sr_total
+        session.r_count += miss_total - sr_total
+        session.pity_counter = pity
+
+        slots = session.featured.slots
+        probs = PullEngine.card_probabilities(pool, 'SSR', rules)
+        featured_total = 0
+        if slots and probs and ssr_total:
+            hits = gen.multinomial(ssr_total, probs)
+            featured_counts = session.featured_counts
+            for card, count in zip(pool.get_cards_by_rarity('SSR'), hits.tolist()):
+                slot = slots.get(card.card_id)
+                if slot is not None:
+                    featured_counts[slot] += count
+                    featured_total += count
+
+        if ssr_total:
+            # 多项分布只给出总数；UP 卡在 SSR 序列中的位置可交换，均匀随机分配
+            featured = np.zeros(ssr_total, dtype=bool)
+            if featured_total:
+                featured[gen.choice(ssr_total, featured_total, replace=False)] = True
+            session.sketches.observe(np.concatenate(gap_parts), featured)
@@ -0,0 +1,515 @@
+"""
+抽卡历史容器 - 以紧凑形式保存历史记录，需要时再还原为记录字典
+
+单抽逐条追加记录字典；批量抽卡以紧凑分段追加（卡牌下标数组 + 保底计数数组），
+只有在读取历史或导出时才逐条还原为与单抽相同格式的记录字典。
+
+重放模式 (HISTORY_CONFIG['mode'] == 'replay') 下不保存任何逐抽数据，只记录重放段
+(随机数源, 起始位置, 起始保底, 起始抽数, 抽数, 卡池, 阈值表)：每抽固定消耗
+DRAWS_PER_PULL 个均匀随机数，读取时由 PullEngine.replay 重新计算出相同的记录。
+每段抽数有上限，读取最近的记录最多重放一段，每个会话的历史只占几百字节。
+
+设置 journal（列表）后每次写入都追加一条写入日志，共享会话存储据此只持久化新增部分；
+apply() 在另一个进程中按日志重建出相同的历史，snapshot() 生成重建当前内容的最短日志。
+"""
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from config import HISTORY_CONFIG, PULL_LIMITS
+from services.rng import DRAWS_PER_PULL
+
+# 内存占用估算（字节）：空历史 / 每条记录字典 / 每个紧凑段或重放段的对象开销
+_HISTORY_BYTES = 900
+_RECORD_BYTES = 200
+_SEGMENT_BYTES = 150
+
+
+class CompactSegment:
+    """
+    批量抽卡的紧凑记录段
+
+    第 i 条记录为:
+        {'pull_number': start + i + 1, 'card': catalog[card_idx[i]], 'pity_count': pity[i]}
+    """
+
+    __slots__ = ('start', 'catalog', 'card_idx', 'pity')
+
+    def __init__(self, start: int, catalog: List[Dict], card_idx: Sequence[int],
+                 pity: Sequence[int]):
+        """
+        Args:
+            start: 段首记录之前的总抽数
+            catalog: 卡牌字典表
+            card_idx: 每一抽对应的 catalog 下标
+            pity: 每一抽之后的保底计数
+        """
+        self.start = start
+        self.catalog = catalog
+        self.card_idx = card_idx
+        self.pity = pity
+
+    def __len__(self) -> int:
+        return len(self.card_idx)
+
+    def record(self, i: int) -> Dict:
+        """还原第 i 条记录"""
+        return {
+            'pull_number': self.start + i + 1,
+            'card': self.catalog[int(self.card_idx[i])],
+            'pity_count': int(self.pity[i])
+        }
+
+    def records(self, begin: int = 0, end: int = None) -> List[Dict]:
+        """还原 [begin, end) 范围内的记录"""
+        end = len(self) if end is None else end
+        catalog = self.catalog
+        idx = self.card_idx[begin:end]
+        pity = self.pity[begin:end]
+        if hasattr(idx, 'tolist'):
+            idx, pity = idx.tolist(), pity.tolist()
+        number = self.start + begin + 1
+        return [
+            {'pull_number': number + i, 'card': catalog[c], 'pity_count': p}
+            for i, (c, p) in enumerate(zip(idx, pity))
+        ]
+
+    def drop_front(self, count: int) -> 'CompactSegment':
+        """丢弃前 count 条记录（复制剩余部分，释放原数组）"""
+        idx = self.card_idx[count:]
+        pity = self.pity[count:]
+        if hasattr(idx, 'copy'):
+            idx, pity = idx.copy(), pity.copy()
+        return CompactSegment(self.start + count, self.catalog, idx, pity)
+
+    def iter_records(self, begin: int = 0) -> Iterator[Dict]:
+        for i in range(begin, len(self)):
+            yield self.record(i)
+
+
+class ReplaySegment:
+    """
+    重放记录段：只保存重新计算该段所需的状态
+
+    段内第 i 抽（含已丢弃的 skip 抽）使用随机数源第 position + i * DRAWS_PER_PULL 位置起的
+    随机数；卡池与阈值表保存当初使用的对象（卡池重新加载后旧对象仍可重放）。
+    """
+
+    __slots__ = ('start', 'rng_spec', 'position', 'pity', 'count', 'skip', 'pool', 'rules')
+
+    def __init__(self, start: int, rng_spec: tuple, position: int, pity: int, count: int,
+                 pool, rules, skip: int = 0):
+        """
+        Args:
+            start: 段首抽卡前的总抽数
+            rng_spec: 随机数源的 RandomSource.spec()
+            position: 段首抽卡前随机数源的位置
+            pity: 段首抽卡前的保底计数
+            count: 段内抽数（含已丢弃部分）
+            pool: 抽卡时的卡池对象
+            rules: 抽卡时的阈值表
+            skip: 段首已丢弃（超出历史上限）的抽数
+        """
+        self.start = start
+        self.rng_spec = rng_spec
+        self.position = position
+        self.pity = pity
+        self.count = count
+        self.pool = pool
+        self.rules = rules
+        self.skip = skip
+
+    def __len__(self) -> int:
+        return self.count - self.skip
+
+    def follows(self, start: int, rng_spec: tuple, position: int, pool, rules) -> bool:
+        """新的抽卡是否紧接在本段之后（可直接并入本段）"""
+        return (start == self.start + self.count
+                and position == self.position + self.count * DRAWS_PER_PULL
+                and rng_spec == self.rng_spec
+                and pool is self.pool and rules is self.rules)
+
+    def records(self, begin: int = 0, end: int = None) -> List[Dict]:
+        """重放并还原 [begin, end) 范围内的记录（从段首重放到 end）"""
+        from services.pull_engine import PullEngine
+
+        end = len(self) if end is None else end
+        segment = PullEngine.replay(self.pool, self.rules, self.rng_spec, self.position,
+                                    self.pity, self.start, self.skip + end)
+        return segment.records(self.skip + begin, self.skip + end)
+
+    def record(self, i: int) -> Dict:
+        return self.records(i, i + 1)[0]
+
+    def iter_records(self, begin: int = 0) -> Iterator[Dict]:
+        # 整段只重放一次
+        yield from self.records(begin)
+
+    def drop_front(self, count: int) -> 'ReplaySegment':
+        """丢弃前 count 条记录（只增加 skip，重放时仍从段首开始）"""
+        return ReplaySegment(self.start, self.rng_spec, self.position, self.pity, self.count,
+                             self.pool, self.rules, self.skip + count)
+
+
+def _segment_bytes(segment) -> int:
+    """一个段的估算字节数"""
+    if isinstance(segment, list):
+        return _RECORD_BYTES * len(segment)
+    if isinstance(segment, CompactSegment):
+        return _SEGMENT_BYTES + sum(getattr(a, 'nbytes', 8 * len(a))
+                                    for a in (segment.card_idx, segment.pity))
+    return _SEGMENT_BYTES
+
+
+class FrozenSegments:
+    """
+    分叉时冻结的只读段序列，由原历史与各分叉共享
+
+    只在末尾追加：每个持有者只使用前 count 项，其他持有者之后追加的段对它不可见。
+    ends / sizes 为累计记录数与累计估算字节数，按记录位置定位段只需二分查找，
+    分叉链再长也不会形成嵌套。
+    """
+
+    __slots__ = ('entries', 'ends', 'sizes')
+
+    def __init__(self):
+        # (段, 段内起始下标)
+        self.entries: List[tuple] = []
+        self.ends: List[int] = []
+        self.sizes: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, segment, offset: int):
+        """追加一个冻结段（之后不再修改）"""
+        self.entries.append((segment, offset))
+        self.ends.append((self.ends[-1] if self.ends else 0) + len(segment) - offset)
+        self.sizes.append((self.sizes[-1] if self.sizes else 0) + _segment_bytes(segment))
+
+    def locate(self, position: int, count: int) -> int:
+        """前 count 项中包含第 position 条记录的段下标"""
+        return bisect_right(self.ends, position, 0, count)
+
+    def start_of(self, index: int) -> int:
+        """第 index 段首条记录的位置"""
+        return self.ends[index - 1] if index else 0
+
+
+class PullHistory:
+    """
+    有上限的抽卡历史序列
+
+    支持 len()、迭代和下标/切片访问，切片返回记录字典列表，
+    超过上限时从最早的记录开始丢弃。
+
+    fork() 以写时复制方式分叉：当前内容冻结进共享的 FrozenSegments (_base)，
+    之后双方的写入只进入各自的新段，丢弃最早记录时只推进 _base_skip。
+    反复分叉只在同一个 FrozenSegments 末尾追加，不形成嵌套。
+    """
+
+    def __init__(self, records: List[Dict] = None, maxlen: int = None):
+        self.maxlen = maxlen or PULL_LIMITS['max_history_size']
+        # 每段为记录字典列表、CompactSegment 或 ReplaySegment
+        self._segments: deque = deque()
+        self._length = 0
+        # 首段中已丢弃的记录数（仅用于列表段）
+        self._head_offset = 0
+        # 分叉时冻结的共享底层、其中可见的段数与已丢弃的记录数（底层记录排在 _segments 之前）
+        self._base: Optional[FrozenSegments] = None
+        self._base_count = 0
+        self._base_skip = 0
+        # 写入日志（为 None 时不记录，见 apply）
+        self.journal: Optional[List[tuple]] = None
+        if records:
+            self.extend(records)
+
+    # ---- 写入 ----
+
+    def append(self, record: Dict):
+        """追加一条记录字典"""
+        if self.journal is not None:
+            self.journal.append(('append', record))
+        if not self._segments or not isinstance(self._segments[-1], list):
+            self._segments.append([])
+        self._segments[-1].append(record)
+        self._length += 1
+        self._trim()
+
+    def extend(self, records: List[Dict]):
+        """追加多条记录字典"""
+        if not records:
+            return
+        self._segments.append(list(records[-self.maxlen:]))
+        if self.journal is not None:
+            self.journal.append(('extend', list(self._segments[-1])))
+        self._length += len(self._segments[-1])
+        self._trim()
+
+    def extend_compact(self, segment: CompactSegment):
+        """追加一个紧凑记录段"""
+        if not len(segment):
+            return
+        if len(segment) > self.maxlen:
+            segment = segment.drop_front(len(segment) - self.maxlen)
+        if self.journal is not None:
+            self.journal.append(('compact', segment))
+        self._segments.append(segment)
+        self._length += len(segment)
+        self._trim()
+
+    def extend_replay(self, start: int, rng_spec: tuple, position: int, pity: int,
+                      count: int, pool, rules):
+        """
+        以重放段追加 count 抽（调用方保证 count 不超过 replay_segment_pulls）
+
+        紧接在上一重放段之后且合并后不超过段长上限时直接并入该段，
+        否则以 (position, pity) 为起点新开一段。
+        """
+        if count <= 0:
+            return
+        if self.journal is not None:
+            self._journal_replay(start, rng_spec, position, pity, count, pool, rules)
+        tail = self._segments[-1] if self._segments else None
+        if (isinstance(tail, ReplaySegment)
+                and tail.count + count <= HISTORY_CONFIG['replay_segment_pulls']
+                and tail.follows(start, rng_spec, position, pool, rules)):
+            tail.count += count
+        else:
+            if tail is not None and getattr(tail, 'rng_spec', None) == rng_spec:
+                rng_spec = tail.rng_spec
+            self._segments.append(
+                ReplaySegment(start, rng_spec, position, pity, count, pool, rules)
+            )
+        self._length += count
+        self._trim()
+
+    def _journal_replay(self, start: int, rng_spec: tuple, position: int, pity: int,
+                        count: int, pool, rules):
+        """记录重放段写入日志，紧接在上一条重放日志之后时合并为一条（逐抽写入时日志不随抽数增长）"""
+        last = self.journal[-1] if self.journal else None
+        if (last is not None and last[0] == 'replay'
+                and last[5] + count <= HISTORY_CONFIG['replay_segment_pulls']
+                and start == last[1] + last[5]
+                and position == last[3] + last[5] * DRAWS_PER_PULL
+                and rng_spec == last[2] and pool is last[6] and rules is last[7]):
+            self.journal[-1] = last[:5] + (last[5] + count,) + last[6:]
+        else:
+            self.journal.append(('replay', start, rng_spec, position, pity, count, pool, rules))
+
+    def fork(self) -> 'PullHistory':
+        """
+        分叉：返回与当前内容相同的新历史（均摊 O(1)，不复制任何记录）
+
+        本历史已写入的段冻结为两者共享的底层，此后任何一方追加或丢弃记录都不影响另一方。
+        底层末尾没有被其他持有者追加过时直接在末尾追加，否则（或已丢弃的段过多时）
+        只用仍可见的段新建一个底层。
+        """
+        if self._segments:
+            base = self._base
+            first = base.locate(self._base_skip, self._base_count) if base is not None else 0
+            if base is None or self._base_count != len(base) or first > self._base_count // 2:
+                base = FrozenSegments()
+                for segment, offset in self._base_segments(0):
+                    base.add(segment, offset)
+                self._base, self._base_skip = base, 0
+            for segment, offset in self._iter_segments():
+                base.add(segment, offset)
+            self._base_count = len(base)
+            self._segments = deque()
+            self._head_offset = 0
+        child = PullHistory(maxlen=self.maxlen)
+        child._base, child._base_count = self._base, self._base_count
+        child._base_skip = self._base_skip
+        child._length = self._length
+        return child
+
+    def clear(self):
+        if self.journal is not None:
+            self.journal.append(('clear',))
+        self._segments.clear()
+        self._length = 0
+        self._head_offset = 0
+        self._base = None
+        self._base_count = 0
+        self._base_skip = 0
+
+    def apply(self, op: tuple):
+        """
+        应用一条写入日志：('append', 记录) / ('extend', 记录列表) / ('compact', 紧凑段) /
+        ('replay', start, rng_spec, position, pity, count, pool, rules) / ('segment', 段) / ('clear',)
+        """
+        kind = op[0]
+        if kind == 'append':
+            self.append(op[1])
+        elif kind == 'extend':
+            self.extend(op[1])
+        elif kind == 'compact':
+            self.extend_compact(op[1])
+        elif kind == 'replay':
+            self.extend_replay(*op[1:])
+        elif kind == 'segment':
+            segment = op[1]
+            if isinstance(segment, list):
+                self.extend(segment)
+            elif len(segment):
+                self._segments.append(segment)
+                self._length += len(segment)
+                self._trim()
+        elif kind == 'clear':
+            self.clear()
+        else:
+            raise ValueError(f"Unknown history op: {kind}")
+
+    def snapshot(self) -> List[tuple]:
+        """
+        重建当前内容的写入日志（每个可见段一条）
+
+        列表段与重放段（之后的写入会原地扩展）复制一份，紧凑段只读共享，
+        因此日志不受本历史之后的写入影响，可以在会话锁外序列化。
+        """
+        ops = []
+        for segment, offset in self._visible_segments(0):
+            if isinstance(segment, list):
+                ops.append(('extend', segment[offset:]))
+            elif offset or isinstance(segment, ReplaySegment):
+                ops.append(('segment', segment.drop_front(offset)))
+            else:
+                ops.append(('segment', segment))
+        return ops
+
+    def _visible_segments(self, skip: int):
+        """按顺序产出 (段, 段内起始下标)，包括共享底层，跳过最早的 skip 条记录"""
+        base_length = self._base_length()
+        if skip < base_length:
+            yield from self._base_segments(skip)
+            skip = 0
+        else:
+            skip -= base_length
+        for segment, offset in self._iter_segments():
+            seg_len = len(segment) - offset
+            if skip >= seg_len:
+                skip -= seg_len
+                continue
+            yield segment, offset + skip
+            skip = 0
+
+    def _base_segments(self, skip: int):
+        """按顺序产出共享底层中可见的 (段, 段内起始下标)，跳过最早的 skip 条可见记录"""
+        base = self._base
+        if base is None:
+            return
+        position = self._base_skip + skip
+        index = base.locate(position, self._base_count)
+        if index >= self._base_count:
+            return
+        segment, offset = base.entries[index]
+        yield segment, offset + position - base.start_of(index)
+        for i in range(index + 1, self._base_count):
+            yield base.entries[i]
+
+    def _base_length(self) -> int:
+        """共享底层中仍可见的记录数"""
+        if self._base is None or not self._base_count:
+            return 0
+        return self._base.ends[self._base_count - 1] - self._base_skip
+
+    def _trim(self):
+        """丢弃超出上限的最早记录"""
+        excess = self._length - self.maxlen
+        if excess > 0 and self._base is not None:
+            available = self._base_length()
+            if available <= excess:
+                # 底层已全部丢弃，释放引用（其他分叉仍可继续使用）
+                self._base = None
+                self._base_count = 0
+                self._base_skip = 0
+                self._length -= available
+                excess -= available
+            else:
+                self._base_skip += excess
+                self._length -= excess
+                excess = 0
+        while excess > 0:
+            head = self._segments[0]
+            available = len(head) - self._head_offset
+            if available <= excess:
+                self._segments.popleft()
+                self._head_offset = 0
+                self._length -= available
+                excess -= available
+            elif not isinstance(head, list):
+                self._segments[0] = head.drop_front(excess)
+                self._length -= excess
+                excess = 0
+            else:
+                self._head_offset += excess
+                self._length -= excess
+                excess = 0
+                # 已丢弃部分过多时压缩列表，避免长期占用内存
+                if self._head_offset > len(head) // 2:
+                    self._segments[0] = head[self._head_offset:]
+                    self._head_offset = 0
+
+    # ---- 读取 ----
+
+    def _iter_segments(self):
+        """按顺序产出 (段, 段内起始下标)"""
+        for i, segment in enumerate(self._segments):
+            yield segment, (self._head_offset if i == 0 else 0)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def estimated_bytes(self) -> int:
+        """估算的内存占用（字节，与分叉共享的底层也计入）"""
+        total = _HISTORY_BYTES
+        base = self._base
+        if base is not None and self._base_count:
+            first = base.locate(self._base_skip, self._base_count)
+            total += base.sizes[self._base_count - 1] - (base.sizes[first - 1] if first else 0)
+        for segment, _ in self._iter_segments():
+            total += _segment_bytes(segment)
+        return total
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self._iter_from(0)
+
+    def _iter_from(self, begin: int) -> Iterator[Dict]:
+        """从第 begin 条记录开始按顺序产出"""
+        for segment, offset in self._visible_segments(begin):
+            if isinstance(segment, list):
+                yield from segment[offset:] if offset else segment
+            else:
+                yield from segment.iter_records(offset)
+
+    def slice(self, begin: int, end: int) -> List[Dict]:
+        """还原 [begin, end) 范围内的记录"""
+        result = []
+        remaining = end - begin
+        for segment, offset in self._visible_segments(begin):
+            if remaining <= 0:
+                break
+            stop = min(offset + remaining, len(segment))
+            if isinstance(segment, list):
+                result.extend(segment[offset:stop])
+            else:
+                result.extend(segment.records(offset, stop))
+            remaining -= stop - offset
+        return result
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            begin, end, step = key.indices(self._length)
+            if step != 1:
+                return self.to_list()[key]
+            return self.slice(begin, end) if begin < end else []
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError('pull history index out of range')
+        return self.slice(key, key + 1)[0]
+
+    def to_list(self) -> List[Dict]:
+        """还原全部记录"""
+        return self.slice(0, self._length)
@@ -0,0 +1,285 @@
+"""
+结果缓存 - 进程内 LRU + 本地 SQLite 的两级缓存，供概率计算与模拟接口复用相同请求的结果
+
+缓存键为以下内容的规范化 JSON 的哈希：
+  - 命名空间（结果类型）
+  - 涉及卡池的完整定义（Pool.to_dict，卡池对象只读，指纹按对象缓存）
+  - 全局 PITY_CONFIG 与 CARD_RARITY
+  - 请求参数（含随机种子与随机数后端）
+
+内存层按条数与序列化字节数淘汰最久未使用的条目；磁盘层为 WAL 模式的 SQLite 文件，
+进程重启后仍然有效，并由同一台机器上的多个 gunicorn worker 共享，超出容量时按写入时间淘汰。
+磁盘读写失败只计入 disk_errors，不影响请求。
+
+PoolManager 重新加载卡池时调用 invalidate_pool，删除该卡池在两级缓存中的全部条目。
+"""
+import json
+import os
+import pickle
+import sqlite3
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from models.pool import Pool
+from config import CACHE_CONFIG, CARD_RARITY, PITY_CONFIG
+
+
+COUNTERS = ('memory_hits', 'disk_hits', 'misses', 'puts',
+            'memory_evictions', 'disk_evictions', 'invalidations', 'disk_errors')
+
+_caches: List['ResultCache'] = []
+_registry_lock = threading.Lock()
+
+
+def pool_fingerprint(pool: Pool) -> str:
+    """卡池完整定义的哈希（Pool 构造后只读，结果缓存在其索引上）"""
+    fingerprint = pool.index.fingerprint
+    if fingerprint is None:
+        raw = json.dumps(pool.to_dict(), sort_keys=True, ensure_ascii=False)
+        fingerprint = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        pool.index.fingerprint = fingerprint
+    return fingerprint
+
+
+def cache_key(namespace: str, pools: Iterable[Pool], params: Any) -> str:
+    """命名空间、卡池定义、全局保底 / 品阶配置与参数的规范化哈希"""
+    payload = {
+        'namespace': namespace,
+        'pools': [[pool.pool_id, pool_fingerprint(pool)] for pool in pools],
+        'pity_config': PITY_CONFIG,
+        'card_rarity': CARD_RARITY,
+        'params': params,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class _DiskStore:
+    """SQLite 磁盘层（每个线程一个连接，fork 后重新连接）"""
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS results ("
+        " namespace TEXT NOT NULL, key TEXT NOT NULL, pool_ids TEXT NOT NULL,"
+        " value BLOB NOT NULL, size INTEGER NOT NULL, stored REAL NOT NULL,"
+        " PRIMARY KEY (namespace, key))",
+        "CREATE INDEX IF NOT EXISTS results_stored ON results (stored)",
+    )
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=CACHE_CONFIG['disk_timeout'],
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self._SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[tuple]:
+        """返回 (序列化结果, 卡池ID列表)，不存在时为 None"""
+        row = self._conn().execute(
+            "SELECT value, pool_ids FROM results WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], [pid for pid in row[1].split(',') if pid]
+
+    def put(self, namespace: str, key: str, pool_ids: List[str], blob: bytes) -> int:
+        """写入一条结果，返回因超出容量而淘汰的条数"""
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, key, ',' + ','.join(pool_ids) + ',', blob, len(blob), time.time())
+        )
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        evicted = 0
+        while total > self.max_bytes:
+            row = conn.execute(
+                "SELECT namespace, key, size FROM results ORDER BY stored LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM results WHERE namespace = ? AND key = ?", row[:2])
+            total -= row[2]
+            evicted += 1
+        return evicted
+
+    def delete_pool(self, namespace: str, pool_id: str) -> int:
+        cursor = self._conn().execute(
+            "DELETE FROM results WHERE namespace = ? AND instr(pool_ids, ?) > 0",
+            (namespace, ',' + pool_id + ',')
+        )
+        return cursor.rowcount
+
+    def clear(self, namespace: str):
+        self._conn().execute("DELETE FROM results WHERE namespace = ?", (namespace,))
+
+
+class ResultCache:
+    """两级结果缓存（一个命名空间一个实例，共用同一个磁盘文件）"""
+
+    def __init__(self, namespace: str, max_entries: int = None, memory_bytes: int = None,
+                 disk_path: str = None, disk_bytes: int = None):
+        """
+        Args:
+            namespace: 命名空间（结果类型），同时用于区分磁盘层中的条目
+            max_entries: 内存层最大条数（默认使用配置值）
+            memory_bytes: 内存层最大序列化字节数（默认使用配置值）
+            disk_path: SQLite 文件路径（默认使用配置值，空字符串表示不使用磁盘层）
+            disk_bytes: 磁盘层最大字节数（默认使用配置值）
+        """
+        self.namespace = namespace
+        self.max_entries = max_entries or CACHE_CONFIG['memory_entries']
+        self.memory_bytes = memory_bytes or CACHE_CONFIG['memory_bytes']
+        disk_path = CACHE_CONFIG['disk_path'] if disk_path is None else disk_path
+        self._disk = (
+            _DiskStore(disk_path, disk_bytes or CACHE_CONFIG['disk_bytes'])
+            if disk_path else None
+        )
+        self._lock = threading.Lock()
+        # key -> (结果, 序列化字节数, 涉及的卡池ID)
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._bytes = 0
+        self.counters = {name: 0 for name in COUNTERS}
+        with _registry_lock:
+            _caches.append(self)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _store_memory(self, key: str, value: Any, size: int, pool_ids: List[str]):
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._memory[key] = (value, size, pool_ids)
+            self._bytes += size
+            while self._memory and (len(self._memory) > self.max_entries
+                                    or self._bytes > self.memory_bytes):
+                _, (_, evicted_size, _) = self._memory.popitem(last=False)
+                self._bytes -= evicted_size
+                self.counters['memory_evictions'] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        查询结果：先查内存层，未命中再查磁盘层并回填内存层
+
+        Returns:
+            缓存的结果，两级都未命中时为 None
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return entry[0]
+
+        if self._disk is not None:
+            try:
+                found = self._disk.get(self.namespace, key)
+            except (sqlite3.Error, OSError):
+                found = None
+                self._count('disk_errors')
+            if found is not None:
+                blob, pool_ids = found
+                value = pickle.loads(blob)
+                self._store_memory(key, value, len(blob), pool_ids)
+                self._count('disk_hits')
+                return value
+
+        self._count('misses')
+        return None
+
+    def put(self, key: str, value: Any, pool_ids: Iterable[str] = (), persist: bool = True):
+        """
+        写入结果
+
+        Args:
+            key: cache_key 生成的键
+            value: 可 pickle 的结果（写入后视为只读）
+            pool_ids: 结果涉及的卡池，卡池重新加载时据此失效
+            persist: 是否同时写入磁盘层（中间结果可只放内存）
+        """
+        pool_ids = [pid for pid in pool_ids if pid]
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store_memory(key, value, len(blob), pool_ids)
+        self._count('puts')
+        if persist and self._disk is not None:
+            try:
+                evicted = self._disk.put(self.namespace, key, pool_ids, blob)
+            except (sqlite3.Error, OSError):
+                self._count('disk_errors')
+            else:
+                if evicted:
+                    self._count('disk_evictions', evicted)
+
+    def invalidate_pool(self, pool_id: str):
+        """删除涉及指定卡池的全部条目"""
+        with self._lock:
+            stale = [key for key, (_, _, pool_ids) in self._memory.items()
+                     if pool_id in pool_ids]
+            for key in stale:
+                self._bytes -= self._memory.pop(key)[1]
+            self.counters['invalidations'] += len(stale)
+        if self._disk is not None:
+            try:
+                self._count('invalidations', self._disk.delete_pool(self.namespace, pool_id))
+            except (sqlite3.Error, OSError):
+                self._count('disk_errors')
+
+    def clear(self, disk: bool = True):
+        """清空内存层（以及磁盘层中本命名空间的条目）"""
+        with self._lock:
+            self._memory.clear()
+            self._bytes = 0
+        if disk and self._disk is not None:
+            try:
+                self._disk.clear(self.namespace)
+            except (sqlite3.Error, OSError):
+                self._count('disk_errors')
+
+    def stats(self) -> Dict:
+        """计数器与内存层占用"""
+        with self._lock:
+            result = dict(self.counters)
+            result.update({
+                'entries': len(self._memory),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.memory_bytes,
+            })
+        lookups = result['memory_hits'] + result['disk_hits'] + result['misses']
+        result['hit_rate'] = (
+            (result['memory_hits'] + result['disk_hits']) / lookups if lookups else None
+        )
+        return result
+
+
+def invalidate_pool(pool_id: str):
+    """卡池重新加载后使所有结果缓存中涉及该卡池的条目失效"""
+    with _registry_lock:
+        caches = list(_caches)
+    for cache in caches:
+        cache.invalidate_pool(pool_id)
+
+
+def cache_stats() -> Dict[str, Dict]:
+    """各命名空间的缓存计数器"""
+    with _registry_lock:
+        caches = list(_caches)
+    return {cache.namespace: cache.stats() for cache in caches}
@@ -0,0 +1,283 @@
+"""
+随机数源 - 可插拔的随机数后端，支持种子、定位 (seek) 与独立子流 (jump-ahead)
+
+后端:
+  - stdlib: random.Random (Mersenne Twister)，按块播种，定位重新播种目标块后快进块内偏移，
+            复杂度 O(块大小)
+  - pcg64:  NumPy PCG64，advance() 常数时间定位，jumped() 派生独立子流
+  - philox: NumPy Philox (计数器型)，advance() 常数时间定位，jumped() 派生独立子流
+
+每个随机数源记录已消耗的均匀随机数个数 (position)。抽卡引擎每抽固定消耗
+DRAWS_PER_PULL 个均匀随机数，因此会话的种子与累计抽数唯一确定其后续结果，
+单抽与批量抽卡在相同位置得到相同结果。
+"""
+import random
+import secrets
+from typing import List
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from config import RNG_CONFIG
+
+
+# 每抽消耗的均匀随机数：品阶、UP判定、选牌
+DRAWS_PER_PULL = 3
+
+_BUFFER_SIZE = 1024
+# stdlib 后端每块的均匀随机数个数 / 快进时每次 getrandbits 跳过的个数
+_STDLIB_BLOCK = 1 << 18
+_STDLIB_SKIP = 1 << 16
+# 内存占用估算（字节）：随机数源对象本身 / 预取缓冲中的每个 float
+_SOURCE_BYTES = 1024
+_BUFFERED_BYTES = 32
+
+
+class RandomSource:
+    """随机数源基类"""
+
+    name = ''
+    # seek() 是否为常数时间（抽卡历史重放依赖快速定位）
+    constant_seek = False
+
+    def __init__(self, seed: int = None, jumps: int = 0):
+        """
+        Args:
+            seed: 随机种子（为空时随机生成）
+            jumps: 子流编号，不同编号的子流互相独立
+        """
+        self.seed = seed if seed is not None else secrets.randbits(64)
+        self.jumps = jumps
+        self.position = 0
+
+    def random(self) -> float:
+        """返回一个 [0, 1) 均匀随机数"""
+        raise NotImplementedError
+
+    def random_array(self, n: int) -> 'np.ndarray':
+        """返回 n 个 [0, 1) 均匀随机数（与连续调用 n 次 random() 结果相同）"""
+        raise NotImplementedError
+
+    def seek(self, position: int):
+        """定位到第 position 个均匀随机数"""
+        raise NotImplementedError
+
+    def clone(self) -> 'RandomSource':
+        """复制一个位于相同位置的独立随机数源（之后两者各自前进，互不影响）"""
+        source = type(self)(self.seed, self.jumps)
+        source.seek(self.position)
+        return source
+
+    def jumped(self, jumps: int) -> 'RandomSource':
+        """派生编号为 jumps 的独立子流"""
+        return type(self)(self.seed, self.jumps + jumps)
+
+    def generator_at(self, position: int) -> 'np.random.Generator':
+        """
+        派生一个由 (种子, 子流, 位置) 唯一确定的 NumPy 生成器，
+        用于二项/多项等非均匀分布采样，不影响本随机数源的位置。
+        """
+        seq = np.random.SeedSequence(self.seed, spawn_key=(self.jumps, position))
+        return np.random.Generator(np.random.PCG64(seq))
+
+    def generator(self) -> 'np.random.Generator':
+        """用于向量化模拟的 NumPy 生成器（不跟踪位置）"""
+        return self.generator_at(self.position)
+
+    def spec(self) -> tuple:
+        """可序列化的描述，用于在工作进程中重建"""
+        return (self.name, self.seed, self.jumps)
+
+    def estimated_bytes(self) -> int:
+        """估算的内存占用（字节）"""
+        return _SOURCE_BYTES
+
+    def __repr__(self):
+        return f"{type(self).__name__}(seed={self.seed}, jumps={self.jumps}, position={self.position})"
+
+
+class StdlibSource(RandomSource):
+    """
+    基于 random.Random 的随机数源
+
+    随机数流按 _STDLIB_BLOCK 个分块，每块由 (种子, 子流, 块号) 单独播种（第 0 块即原有的
+    单一流），定位只需重新播种目标块并快进块内偏移，耗时与位置无关。
+    """
+
+    name = 'stdlib'
+
+    def __init__(self, seed: int = None, jumps: int = 0):
+        super().__init__(seed, jumps)
+        self._start_block(0)
+
+    def _block_seed(self, block: int):
+        if block:
+            return f"{self.seed}:{self.jumps}:{block}"
+        return self.seed if not self.jumps else f"{self.seed}:{self.jumps}"
+
+    def _start_block(self, block: int):
+        self._random = random.Random(self._block_seed(block))
+        self.position = block * _STDLIB_BLOCK
+        self._block_end = self.position + _STDLIB_BLOCK
+
+    def random(self) -> float:
+        if self.position == self._block_end:
+            self._start_block(self._block_end // _STDLIB_BLOCK)
+        self.position += 1
+        return self._random.random()
+
+    def random_array(self, n: int) -> 'np.ndarray':
+        values = []
+        while n > 0:
+            if self.position == self._block_end:
+                self._start_block(self._block_end // _STDLIB_BLOCK)
+            take = min(n, self._block_end - self.position)
+            draw = self._random.random
+            values.extend([draw() for _ in range(take)])
+            self.position += take
+            n -= take
+        return np.array(values, dtype=np.float64)
+
+    def clone(self) -> 'RandomSource':
+        # 直接复制 Mersenne Twister 状态，避免重放
+        source = type(self)(self.seed, self.jumps)
+        source._random.setstate(self._random.getstate())
+        source.position = self.position
+        source._block_end = self._block_end
+        return source
+
+    def estimated_bytes(self) -> int:
+        # Mersenne Twister 状态为 624 个 32 位整数
+        return _SOURCE_BYTES + 2048
+
+    def seek(self, position: int):
+        block = position // _STDLIB_BLOCK
+        if position < self.position or block != self._block_end // _STDLIB_BLOCK - 1:
+            self._start_block(block)
+        # random() 每次消耗两个 32 位输出，getrandbits(64 * k) 恰好跳过 k 个
+        while self.position < position:
+            step = min(position - self.position, _STDLIB_SKIP)
+            self._random.getrandbits(64 * step)
+            self.position += step
+
+
+class _NumpySource(RandomSource):
+    """NumPy 位生成器随机数源（带缓冲，单次取数开销接近 stdlib）"""
+
+    bit_generator = None
+    # 每次 advance(1) 跳过的 64 位输出数
+    advance_unit = 1
+    constant_seek = True
+
+    def __init__(self, seed: int = None, jumps: int = 0):
+        super().__init__(seed, jumps)
+        self._reset(0)
+
+    def _make_bitgen(self):
+        bitgen = self.bit_generator(self.seed)
+        return bitgen.jumped(self.jumps) if self.jumps else bitgen
+
+    def _reset(self, position: int):
+        bitgen = self._make_bitgen()
+        steps, rest = divmod(position, self.advance_unit)
+        if steps:
+            bitgen.advance(steps)
+        self._gen = np.random.Generator(bitgen)
+        if rest:
+            self._gen.random(rest)
+        self._buffer: List[float] = []
+        self._buffer_pos = 0
+        self.position = position
+
+    def random(self) -> float:
+        if self._buffer_pos >= len(self._buffer):
+            self._buffer = self._gen.random(_BUFFER_SIZE).tolist()
+            self._buffer_pos = 0
+        value = self._buffer[self._buffer_pos]
+        self._buffer_pos += 1
+        self.position += 1
+        return value
+
+    def random_array(self, n: int) -> 'np.ndarray':
+        buffered = self._buffer[self._buffer_pos:self._buffer_pos + n]
+        self._buffer_pos += len(buffered)
+        self.position += n
+        rest = n - len(buffered)
+        if not buffered:
+            return self._gen.random(rest)
+        if not rest:
+            return np.array(buffered, dtype=np.float64)
+        return np.concatenate((buffered, self._gen.random(rest)))
+
+    def seek(self, position: int):
+        if position != self.position:
+            self._reset(position)
+
+    def estimated_bytes(self) -> int:
+        return _SOURCE_BYTES + _BUFFERED_BYTES * len(self._buffer)
+
+    def generator(self) -> 'np.random.Generator':
+        return self._gen
+
+
+class PCG64Source(_NumpySource):
+    """NumPy PCG64 随机数源"""
+
+    name = 'pcg64'
+    bit_generator = np.random.PCG64 if NUMPY_AVAILABLE else None
+    advance_unit = 1
+
+
+class PhiloxSource(_NumpySource):
+    """NumPy Philox 计数器型随机数源"""
+
+    name = 'philox'
+    bit_generator = np.random.Philox if NUMPY_AVAILABLE else None
+    # Philox 每个计数器产生 4 个 64 位输出
+    advance_unit = 4
+
+
+BACKENDS = {
+    StdlibSource.name: StdlibSource,
+    PCG64Source.name: PCG64Source,
+    PhiloxSource.name: PhiloxSource,
+}
+
+
+def default_backend() -> str:
+    """默认后端（NumPy 不可用时退回 stdlib）"""
+    backend = RNG_CONFIG['backend']
+    if backend != StdlibSource.name and not NUMPY_AVAILABLE:
+        return StdlibSource.name
+    return backend
+
+
+def create_source(backend: str = None, seed: int = None, jumps: int = 0) -> RandomSource:
+    """
+    创建随机数源
+
+    Args:
+        backend: 后端名称 (stdlib/pcg64/philox)，为空时使用配置默认值
+        seed: 随机种子，为空时随机生成
+        jumps: 子流编号
+
+    Raises:
+        ValueError: 后端名称未知或依赖不可用
+    """
+    backend = backend or default_backend()
+    cls = BACKENDS.get(backend)
+    if cls is None:
+        raise ValueError(f"Unknown RNG backend: {backend}")
+    if cls is not StdlibSource and not NUMPY_AVAILABLE:
+        raise ValueError(f"RNG backend {backend} requires NumPy")
+    return cls(seed, jumps)
+
+
+def from_spec(spec: tuple) -> RandomSource:
+    """由 RandomSource.spec() 重建随机数源"""
+    backend, seed, jumps = spec
+    return create_source(backend, seed, jumps)
@@ -0,0 +1,308 @@
+"""
+卡池日程模拟 - 模拟玩家按顺序参与一系列卡池（一个赛季 / 一年的日程），保底按策略在卡池间继承
+
+日程为有序的窗口列表，每个窗口指定卡池与本期抽数预算（固定抽数或预算分布），
+可选 stop_on_featured：获得UP卡后本期不再抽。切换卡池时的保底继承策略：
+  - carry:     保底计数始终继承（超过新卡池保底表长度时截断）
+  - reset:     每次切换到不同卡池都清零（与 GachaService.set_current_pool 的 auto_reset 一致）
+  - pool_type: 仅在相同 pool_type 的卡池之间继承
+
+每个窗口内不逐抽推进：按当前保底计数条件化的逆 CDF 一次采样到下一个 SSR 的抽数
+    P(间隔 > k | 保底 p) = survival[p + k] / survival[p]
+全部玩家同时推进，循环次数等于单期内最多的 SSR 数，与抽数无关。
+
+玩家按固定大小分块，第 i 块使用根随机数源的第 i 个子流，在共享进程池中计算，
+各块返回按窗口汇总的计数，由主进程相加。
+"""
+import time
+from typing import Dict, List
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from models.pool import Pool
+from config import SCHEDULE_CONFIG
+from services.odds import OddsCalculator
+from services.pity_rules import RuleCompiler
+from services.population import BUDGET_DISTRIBUTIONS, draw_budgets
+from services.rng import create_source, from_spec
+from services.simulation import SimulationService, _pad_add
+
+
+CARRYOVER_POLICIES = ('carry', 'reset', 'pool_type')
+
+# 每个窗口的标量计数列
+_SCALARS = ('players', 'pulls', 'ssr', 'featured', 'acquired', 'entering_pity')
+
+
+def validate_windows(windows: List[Dict], pool_ids) -> List[Dict]:
+    """
+    校验日程窗口
+
+    每个窗口形如 {'pool_id': 'event', 'pulls': 80} 或
+    {'pool_id': 'event', 'budget': {'distribution': 'poisson', 'mean': 60}, 'stop_on_featured': true}
+
+    Raises:
+        ValueError: 日程为空、过长、卡池不存在或预算无效
+    """
+    if not windows:
+        raise ValueError("Schedule is empty")
+    if len(windows) > SCHEDULE_CONFIG['max_windows']:
+        raise ValueError(f"Schedule exceeds {SCHEDULE_CONFIG['max_windows']} windows")
+
+    result = []
+    for i, window in enumerate(windows):
+        pool_id = window.get('pool_id')
+        if pool_id not in pool_ids:
+            raise ValueError(f"Unknown pool in window {i}: {pool_id}")
+        budget = window.get('budget')
+        if budget is None:
+            pulls = int(window.get('pulls', 0))
+            if pulls < 0:
+                raise ValueError(f"Window {i} pulls must be non-negative")
+            budget = {'distribution': 'fixed', 'value': float(pulls)}
+        else:
+            budget = dict(budget)
+            required = BUDGET_DISTRIBUTIONS.get(budget.get('distribution'))
+            if required is None or any(key not in budget for key in required):
+                raise ValueError(f"Invalid budget in window {i}: {budget}")
+            for key in required:
+                budget[key] = float(budget[key])
+        result.append({
+            'pool_id': pool_id,
+            'budget': budget,
+            'stop_on_featured': bool(window.get('stop_on_featured', False)),
+        })
+    return result
+
+
+def simulate_schedule_chunk(pools: Dict[str, Pool], windows: List[Dict], players: int,
+                            carryover: str, rng: 'np.random.Generator') -> Dict:
+    """
+    模拟一块玩家走完整个日程
+
+    Returns:
+        'scalars': 形状为 (窗口数, len(_SCALARS)) 的计数数组
+        'copies': 每个窗口的 UP 卡数量直方图列表
+        'exit_pity': 每个窗口结束时的保底计数直方图列表
+        'banners_won': 获得 UP 卡的窗口数直方图
+    """
+    max_copies = SCHEDULE_CONFIG['max_copies']
+    tables = {pid: RuleCompiler.for_pool(pool) for pid, pool in pools.items()}
+    shares = {pid: OddsCalculator.featured_share(pool) for pid, pool in pools.items()}
+
+    pity = np.zeros(players, dtype=np.int64)
+    won = np.zeros(players, dtype=np.int64)
+    scalars = np.zeros((len(windows), len(_SCALARS)), dtype=np.int64)
+    copies_hists, exit_hists = [], []
+    prev = None
+
+    for w, window in enumerate(windows):
+        pool = pools[window['pool_id']]
+        rules = tables[window['pool_id']]
+        share = shares[window['pool_id']]
+        if prev is not None and pool.pool_id != prev.pool_id and (
+            carryover == 'reset'
+            or (carryover == 'pool_type' and pool.pool_type != prev.pool_type)
+        ):
+            pity[:] = 0
+        prev = pool
+        np.minimum(pity, rules.size - 1, out=pity)
+        entering = int(pity.sum())
+
+        remaining = draw_budgets(window['budget'], players, rng)
+        budget_total = int(remaining.sum())
+        participants = int(np.count_nonzero(remaining))
+        copies = np.zeros(players, dtype=np.int64)
+        survival = rules.survival
+        neg_survival = -survival
+        ssr_total = 0
+
+        active = np.flatnonzero(remaining > 0)
+        while active.size:
+            p = pity[active]
+            rem = remaining[active]
+            # 以当前保底为条件的逆 CDF：第一个 survival[j] <= u * survival[p] 的 j
+            target = rng.random(active.size) * survival[p]
+            gap = np.searchsorted(neg_survival, -target, side='left') - p
+            hit = gap <= rem
+
+            lost = active[~hit]
+            pity[lost] += rem[~hit]
+            remaining[lost] = 0
+
+            winners = active[hit]
+            remaining[winners] -= gap[hit]
+            pity[winners] = 0
+            ssr_total += winners.size
+            if share > 0 and winners.size:
+                featured = winners[rng.random(winners.size) < share]
+                copies[featured] += 1
+                if window['stop_on_featured']:
+                    remaining[featured] = 0
+            active = winners[remaining[winners] > 0]
+
+        acquired = copies > 0
+        won += acquired
+        scalars[w] = (
+            participants,
+            budget_total - int(remaining.sum()),
+            ssr_total,
+            int(copies.sum()),
+            int(np.count_nonzero(acquired)),
+            entering,
+        )
+        copies_hists.append(np.bincount(np.minimum(copies, max_copies), minlength=max_copies + 1))
+        exit_hists.append(np.bincount(pity, minlength=rules.size))
+
+    return {
+        'scalars': scalars,
+        'copies': copies_hists,
+        'exit_pity': exit_hists,
+        'banners_won': np.bincount(won, minlength=len(windows) + 1),
+    }
+
+
+def _schedule_chunk(pools_data: Dict[str, Dict], windows: List[Dict], players: int,
+                    carryover: str, rng_spec: tuple) -> Dict:
+    """进程池任务：在工作进程中重建卡池与随机数子流并模拟一块玩家"""
+    pools = {pid: Pool.from_dict(data) for pid, data in pools_data.items()}
+    return simulate_schedule_chunk(pools, windows, players, carryover,
+                                   from_spec(rng_spec).generator())
+
+
+def merge_schedule_results(parts: List[Dict]) -> Dict:
+    """合并各块的计数（直接相加，结果与分块方式无关）"""
+    merged = dict(parts[0])
+    for part in parts[1:]:
+        merged['scalars'] = merged['scalars'] + part['scalars']
+        merged['copies'] = [_pad_add(a, b) for a, b in zip(merged['copies'], part['copies'])]
+        merged['exit_pity'] = [_pad_add(a, b) for a, b in zip(merged['exit_pity'], part['exit_pity'])]
+        merged['banners_won'] = _pad_add(merged['banners_won'], part['banners_won'])
+    return merged
+
+
+class ScheduleService:
+    """卡池日程模拟服务"""
+
+    @staticmethod
+    def run(pools: Dict[str, Pool], windows: List[Dict], players: int,
+            carryover: str = None, seed: int = None, workers: int = None,
+            backend: str = None) -> Dict:
+        """
+        运行日程模拟
+
+        Args:
+            pools: 日程中出现的卡池 {pool_id: Pool}
+            windows: 有序的日程窗口列表（见 validate_windows）
+            players: 虚拟玩家数量
+            carryover: 保底继承策略 (carry/reset/pool_type)，默认使用配置值
+            seed: 随机种子（为空时随机生成，并在结果中返回）
+            workers: 工作进程数（默认使用配置值）
+            backend: 随机数后端 (stdlib/pcg64/philox)，默认使用配置值
+
+        Returns:
+            每个窗口的 UP 获取率、UP 数量分布与进入/结束时保底计数，
+            以及整个日程中获得 UP 的窗口数分布
+
+        Raises:
+            RuntimeError: NumPy 不可用
+            ValueError: 日程、继承策略或随机数后端无效
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy not available")
+
+        carryover = carryover or SCHEDULE_CONFIG['carryover']
+        if carryover not in CARRYOVER_POLICIES:
+            raise ValueError(f"Unknown carryover policy: {carryover}")
+        windows = validate_windows(windows, pools)
+        pools = {w['pool_id']: pools[w['pool_id']] for w in windows}
+
+        started = time.perf_counter()
+        root = create_source(backend, seed)
+        chunk = SCHEDULE_CONFIG['chunk_players']
+        sizes = [min(chunk, players - i) for i in range(0, players, chunk)]
+        specs = [root.jumped(i).spec() for i in range(len(sizes))]
+        workers = max(1, min(workers or SCHEDULE_CONFIG['max_workers'], len(sizes)))
+
+        if workers == 1 or players < SCHEDULE_CONFIG['inline_threshold']:
+            parts = [
+                simulate_schedule_chunk(pools, windows, size, carryover,
+                                        from_spec(spec).generator())
+                for size, spec in zip(sizes, specs)
+            ]
+        else:
+            executor = SimulationService._get_executor(workers)
+            pools_data = {pid: pool.to_dict() for pid, pool in pools.items()}
+            futures = [
+                executor.submit(_schedule_chunk, pools_data, windows, size, carryover, spec)
+                for size, spec in zip(sizes, specs)
+            ]
+            parts = [f.result() for f in futures]
+
+        elapsed = time.perf_counter() - started
+        result = ScheduleService.summarize(pools, windows, players,
+                                           merge_schedule_results(parts))
+        result.update({
+            'carryover': carryover,
+            'seed': root.seed,
+            'rng_backend': root.name,
+            'workers': workers,
+            'elapsed_ms': elapsed * 1000,
+            'players_per_second': players / elapsed if elapsed > 0 else None,
+        })
+        return result
+
+    @staticmethod
+    def summarize(pools: Dict[str, Pool], windows: List[Dict], players: int,
+                  merged: Dict) -> Dict:
+        """将各窗口的计数整理为对外结果"""
+        col = {name: i for i, name in enumerate(_SCALARS)}
+        rows = []
+        for i, (window, counts) in enumerate(zip(windows, merged['scalars'])):
+            pulls = int(counts[col['pulls']])
+            exit_hist = merged['exit_pity'][i]
+            participants = int(counts[col['players']])
+            acquired = int(counts[col['acquired']])
+            rows.append({
+                'window': i,
+                'pool_id': window['pool_id'],
+                'pool_type': pools[window['pool_id']].pool_type,
+                'budget': window['budget'],
+                'stop_on_featured': window['stop_on_featured'],
+                'participants': participants,
+                'mean_pulls': pulls / players if players else 0.0,
+                'ssr_rate': int(counts[col['ssr']]) / pulls if pulls else 0.0,
+                'featured_acquisition_rate': acquired / players if players else 0.0,
+                'participant_acquisition_rate': (
+                    acquired / participants if participants else 0.0
+                ),
+                'mean_featured_copies': (
+                    int(counts[col['featured']]) / players if players else 0.0
+                ),
+                'featured_copies': merged['copies'][i].tolist(),
+                'mean_entering_pity': (
+                    int(counts[col['entering_pity']]) / players if players else 0.0
+                ),
+                'mean_exit_pity': (
+                    float(np.dot(np.arange(len(exit_hist)), exit_hist)) / players
+                    if players else 0.0
+                ),
+                'exit_pity': exit_hist.tolist(),
+            })
+
+        won = merged['banners_won']
+        return {
+            'players': players,
+            'total_pulls': int(merged['scalars'][:, col['pulls']].sum()),
+            'max_copies': SCHEDULE_CONFIG['max_copies'],
+            'windows': rows,
+            'banners_won': won.tolist(),
+            'mean_banners_won': (
+                float(np.dot(np.arange(len(won)), won)) / players if players else 0.0
+            ),
+        }
@@ -0,0 +1,170 @@
+"""
+会话检查点 - 进程内会话的增量持久化（部署 / 重启后恢复会话）
+
+会话修改提交后登记为脏会话，后台线程每 checkpoint_interval 秒把脏会话写入本地 SQLite 文件
+（与 SQLiteSessionStore 相同的格式，每个事务最多 checkpoint_batch 个会话），关闭时再写一次。
+未修改的会话不写入。快照在会话锁内复制（UserSession.snapshot，耗时与历史记录数无关），
+序列化与文件 I/O 在锁外进行，不阻塞同一会话的请求。
+
+启动时不读取检查点文件：会话在会话存储中找不到时才从检查点恢复（见 SessionManager），
+启动耗时与会话数无关。删除的会话（丢弃 / 回收的分叉）同样在下一次写入时从文件中删除。
+"""
+import threading
+import traceback
+from typing import TYPE_CHECKING, Dict, Optional
+
+from config import SESSION_CONFIG
+from services.session_store import SQLiteSessionStore
+
+if TYPE_CHECKING:
+    from services.session_manager import UserSession
+
+
+COUNTERS = ('written', 'deleted', 'restored', 'expired', 'flushes')
+
+# restore 中表示"没有待写入的状态，需要读取文件"
+_MISSING = object()
+
+
+class SessionCheckpointer:
+    """
+    脏会话检查点
+
+    mark / discard 只登记会话ID（请求线程中调用，不做 I/O）；flush 在后台线程中写入。
+    写入完成之前被恢复的会话直接使用内存中的对象，不读取文件中较旧的状态。
+    """
+
+    def __init__(self, path: str = None, interval: float = None):
+        """
+        Args:
+            path: 检查点文件路径（默认使用配置值）
+            interval: 写入间隔（秒，默认使用配置值，0 表示不启动后台线程，只在 flush / close 时写入）
+        """
+        self.path = path or SESSION_CONFIG['checkpoint_path']
+        self._file = SQLiteSessionStore(self.path, memory_budget=0)
+        self._interval = (SESSION_CONFIG['checkpoint_interval'] if interval is None
+                          else interval)
+        self._lock = threading.Lock()
+        # 同一时间只有一次 flush（后台线程与 close）
+        self._flush_lock = threading.Lock()
+        # 会话ID -> 待写入的会话（None 表示待删除）
+        self._dirty: Dict[str, Optional['UserSession']] = {}
+        # 正在写入的一批会话
+        self._writing: Dict[str, Optional['UserSession']] = {}
+        self.counters = {name: 0 for name in COUNTERS}
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        if self._interval > 0:
+            self._writer = threading.Thread(target=self._run, name='session-checkpoint',
+                                            daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._interval)
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+
+    def close(self):
+        """停止后台线程并写入剩余的脏会话"""
+        self._closed = True
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+
+    def mark(self, session: 'UserSession'):
+        """登记已修改的会话（下一次 flush 时写入）"""
+        with self._lock:
+            self._dirty[session.session_id] = session
+
+    def discard(self, session_id: str):
+        """登记已删除的会话（下一次 flush 时从文件中删除）"""
+        with self._lock:
+            self._dirty[session_id] = None
+
+    def restore(self, session_id: str) -> Optional['UserSession']:
+        """
+        恢复会话：尚未写入的会话直接返回内存中的对象，否则从检查点文件读取
+
+        Returns:
+            会话，不存在或已删除时为 None
+        """
+        with self._lock:
+            pending = self._dirty.get(session_id, _MISSING)
+            if pending is _MISSING:
+                pending = self._writing.get(session_id, _MISSING)
+        if pending is not _MISSING:
+            return pending
+        session = self._file.load(session_id)
+        if session is not None:
+            with self._lock:
+                self.counters['restored'] += 1
+        return session
+
+    def flush(self) -> int:
+        """
+        写入全部脏会话，返回写入的会话数
+
+        写入失败时未写入的会话重新登记（期间再次修改的会话以新的登记为准）。
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, {}
+                self._writing = pending
+            if not pending:
+                return 0
+            written = 0
+            items = list(pending.items())
+            batch = SESSION_CONFIG['checkpoint_batch']
+            try:
+                for begin in range(0, len(items), batch):
+                    snapshots, deleted = [], []
+                    for session_id, session in items[begin:begin + batch]:
+                        if session is None:
+                            deleted.append(session_id)
+                            continue
+                        # 只在复制快照时持有会话锁
+                        with session.lock:
+                            snapshots.append(session.snapshot())
+                    self._file.put_many(snapshots, deleted)
+                    written += len(snapshots)
+                    with self._lock:
+                        self.counters['written'] += len(snapshots)
+                        self.counters['deleted'] += len(deleted)
+            except BaseException:
+                with self._lock:
+                    for session_id, session in items:
+                        self._dirty.setdefault(session_id, session)
+                raise
+            finally:
+                with self._lock:
+                    self._writing = {}
+            with self._lock:
+                self.counters['flushes'] += 1
+            return written
+
+    def expire(self, max_idle: float) -> int:
+        """
+        从检查点文件中删除最近一次写入早于 max_idle 秒之前的会话
+
+        Returns:
+            删除的会话数
+        """
+        expired = self._file.expire(max_idle)
+        with self._lock:
+            self.counters['expired'] += expired
+        return expired
+
+    def stats(self) -> Dict:
+        """写入 / 删除 / 恢复 / 过期次数、待写入会话数与检查点文件中的会话数"""
+        with self._lock:
+            result = dict(self.counters)
+            result['pending'] = len(self._dirty)
+        result['stored_sessions'] = len(self._file)
+        return result
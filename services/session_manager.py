@@ -1,90 +1,524 @@
 """
 会话管理器 - 管理用户抽卡会话状态
 """
+import atexit
+import time
+import traceback
 import uuid
 import threading
-from typing import List, Dict, Optional
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Callable, List, Dict, Iterator, Optional, Tuple
+
+from config import SESSION_CONFIG
+from services.pull_history import PullHistory
+from services.rng import DRAWS_PER_PULL, RandomSource, create_source
+from services.session_checkpoint import SessionCheckpointer
+from services.session_store import SessionStore, create_store
+from services.sketch import PullSketches
+
+
+# 会话对象本身（不含随机数源、草图与历史）的估算字节数
+_SESSION_BYTES = 400
+
+# 会话可读写的计数器字段（即原 stats 字典中的计数键）
+COUNTER_FIELDS = ('total_pulls', 'ssr_count', 'sr_count', 'r_count')
+
+
+class FeaturedSlots:
+    """
+    UP卡ID -> 计数数组下标（只读）
+
+    按UP卡ID列表驻留，使用同一列表的会话共用一个实例，
+    每个会话只保存与 ids 对齐的计数数组。
+    """
+
+    __slots__ = ('ids', 'slots')
+
+    _interned: Dict[Tuple[str, ...], 'FeaturedSlots'] = {}
+
+    def __init__(self, ids: Tuple[str, ...]):
+        self.ids = ids
+        self.slots: Dict[str, int] = {}
+        for card_id in ids:
+            self.slots.setdefault(card_id, len(self.slots))
+        if len(self.slots) != len(ids):
+            self.ids = tuple(self.slots)
+
+    @classmethod
+    def for_ids(cls, ids=None) -> 'FeaturedSlots':
+        """获取UP卡ID列表对应的共享实例"""
+        key = tuple(ids or ())
+        slots = cls._interned.get(key)
+        if slots is None:
+            slots = cls._interned.setdefault(key, cls(key))
+        return slots
+
+
+class FeaturedCounts(MutableMapping):
+    """UP卡计数数组的字典视图（UP卡ID -> 抽中次数），写入新的卡牌ID时扩展计数数组"""
+
+    __slots__ = ('_session',)
+
+    def __init__(self, session: 'UserSession'):
+        self._session = session
+
+    def __getitem__(self, card_id: str) -> int:
+        return self._session.featured_counts[self._session.featured.slots[card_id]]
+
+    def __setitem__(self, card_id: str, count: int):
+        slot = self._session.featured.slots.get(card_id)
+        if slot is None:
+            counts = dict(self)
+            counts[card_id] = count
+            self._session.set_featured_counts(counts)
+        else:
+            self._session.featured_counts[slot] = count
+
+    def __delitem__(self, card_id: str):
+        counts = dict(self)
+        del counts[card_id]
+        self._session.set_featured_counts(counts)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._session.featured.ids)
+
+    def __len__(self) -> int:
+        return len(self._session.featured.ids)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class SessionStats(MutableMapping):
+    """
+    UserSession.stats 的兼容视图 - 按原嵌套字典的键读写会话字段
+
+    featured_ssr_counts 为 FeaturedCounts 视图，需要普通字典（如 JSON 序列化）时
+    使用 UserSession.featured_counts_dict()。
+    """
+
+    __slots__ = ('_session',)
+
+    KEYS = COUNTER_FIELDS + ('featured_ssr_counts', 'pull_history')
+
+    def __init__(self, session: 'UserSession'):
+        self._session = session
+
+    def __getitem__(self, key: str):
+        if key == 'featured_ssr_counts':
+            return FeaturedCounts(self._session)
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self._session, key)
+
+    def __setitem__(self, key: str, value):
+        if key == 'featured_ssr_counts':
+            self._session.set_featured_counts(value)
+        elif key in self.KEYS:
+            setattr(self._session, key, value)
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key: str):
+        raise TypeError("Session stats keys cannot be deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
 
 
 class UserSession:
-    """用户会话状态 - 每个用户独立的抽卡状态"""
+    """
+    用户会话状态 - 每个用户独立的抽卡状态
+
+    计数器为独立字段；UP卡计数保存在与 featured.ids 对齐的整数数组中，
+    stats 属性提供原嵌套字典形式的兼容视图。
+    """
+
+    __slots__ = ('session_id', 'parent_id', 'current_pool_id', 'pity_counter', 'rng',
+                 'seed_fixed', 'total_pulls', 'ssr_count', 'sr_count', 'r_count',
+                 'featured', 'featured_counts', 'pull_history', 'sketches', 'store_state',
+                 'last_access', 'lock')
 
     def __init__(self, session_id: str, default_pool_id: str = None, featured_ssr: List[str] = None):
         self.session_id = session_id
+        # 分叉会话的父会话ID（普通会话为 None）
+        self.parent_id: Optional[str] = None
         self.current_pool_id = default_pool_id
         self.pity_counter = 0
-        self.stats = {
-            'total_pulls': 0,
-            'ssr_count': 0,
-            'sr_count': 0,
-            'r_count': 0,
-            'featured_ssr_counts': {},
-            'pull_history': []
-        }
-        if featured_ssr:
-            for ssr_id in featured_ssr:
-                self.stats['featured_ssr_counts'][ssr_id] = 0
+        # 随机数源：未指定种子时随机生成；seed_fixed 为 True 时重置后从头重放
+        self.rng: RandomSource = create_source()
+        self.seed_fixed = False
+        self._reset_counters(featured_ssr)
+        # 会话存储的同步状态（由 SessionStore 维护）
+        self.store_state = None
+        # 最近一次从存储中取出的时间 (time.monotonic)，用于过期回收与内存预算淘汰
+        self.last_access = time.monotonic()
+        # 会话锁：修改与读取会话状态时持有（不同会话互不阻塞）
+        self.lock = threading.RLock()
+
+    def _reset_counters(self, featured_ssr: List[str] = None):
+        """计数器、UP卡计数、历史与草图归零"""
+        self.total_pulls = 0
+        self.ssr_count = 0
+        self.sr_count = 0
+        self.r_count = 0
+        self.featured = FeaturedSlots.for_ids(featured_ssr)
+        self.featured_counts = array('q', bytes(8 * len(self.featured.ids)))
+        self.pull_history = PullHistory()
+        # SSR 间隔 / UP 间隔 / 连败分布草图（不依赖抽卡历史，内存有界）
+        self.sketches = PullSketches()
+
+    @property
+    def stats(self) -> SessionStats:
+        """原 stats 字典的兼容视图（见 SessionStats）"""
+        return SessionStats(self)
+
+    @stats.setter
+    def stats(self, value: Dict):
+        view = SessionStats(self)
+        for key in SessionStats.KEYS:
+            if key in value:
+                view[key] = value[key]
+
+    def set_featured_counts(self, counts: Dict[str, int]):
+        """按 UP卡ID -> 次数 的字典替换UP卡计数"""
+        self.featured = FeaturedSlots.for_ids(counts)
+        self.featured_counts = array('q', (int(counts[card_id]) for card_id in self.featured.ids))
+
+    def featured_counts_dict(self) -> Dict[str, int]:
+        """UP卡计数的普通字典副本"""
+        return dict(zip(self.featured.ids, self.featured_counts))
+
+    def set_seed(self, seed: int = None, backend: str = None):
+        """
+        设置随机种子（不重置统计）
+
+        随机数源定位到当前累计抽数对应的位置，此后的结果由种子与累计抽数确定。
+        seed 为空时改用随机种子。
+
+        Raises:
+            ValueError: 后端名称未知
+        """
+        rng = create_source(backend or self.rng.name, seed)
+        rng.seek(self.total_pulls * DRAWS_PER_PULL)
+        self.rng = rng
+        self.seed_fixed = seed is not None
+
+    def fork(self, session_id: str, seed: int = None, backend: str = None) -> 'UserSession':
+        """
+        分叉出一个子会话：复制计数器，历史以写时复制方式共享（O(1)，与历史长度无关）
+
+        未指定 seed / backend 时子会话的随机数源位于父会话的当前位置，
+        子会话的抽卡结果与父会话接下来的抽卡结果相同；子会话的任何操作都不影响父会话。
+        """
+        child = UserSession(session_id, self.current_pool_id)
+        child.parent_id = self.session_id
+        self._copy_counters(child)
+        child.pull_history = self.pull_history.fork()
+        if seed is None and backend is None:
+            child.rng = self.rng.clone()
+            child.seed_fixed = self.seed_fixed
+        else:
+            child.set_seed(seed, backend or self.rng.name)
+        return child
+
+    def _copy_counters(self, other: 'UserSession'):
+        """把保底、计数器、UP卡计数与草图复制到 other（不含历史与随机数源）"""
+        other.pity_counter = self.pity_counter
+        for field in COUNTER_FIELDS:
+            setattr(other, field, getattr(self, field))
+        other.featured = self.featured
+        other.featured_counts = array('q', self.featured_counts)
+        other.sketches = self.sketches.copy()
+
+    def snapshot(self) -> 'UserSession':
+        """
+        复制当前状态（调用方持有会话锁），副本与本会话不共享可变状态，可在锁外序列化
+
+        历史按段复制（紧凑段只读共享），不修改本会话的历史（与 fork 不同，不冻结底层）。
+        """
+        copy = UserSession(self.session_id, self.current_pool_id)
+        copy.parent_id = self.parent_id
+        self._copy_counters(copy)
+        copy.pull_history = PullHistory(maxlen=self.pull_history.maxlen)
+        for op in self.pull_history.snapshot():
+            copy.pull_history.apply(op)
+        copy.rng = self.rng.clone()
+        copy.seed_fixed = self.seed_fixed
+        return copy
 
     def reset(self, featured_ssr: List[str] = None):
         """重置会话状态"""
         self.pity_counter = 0
-        self.stats = {
-            'total_pulls': 0,
-            'ssr_count': 0,
-            'sr_count': 0,
-            'r_count': 0,
-            'featured_ssr_counts': {},
-            'pull_history': []
-        }
-        if featured_ssr:
-            for ssr_id in featured_ssr:
-                self.stats['featured_ssr_counts'][ssr_id] = 0
+        if self.seed_fixed:
+            self.rng.seek(0)
+        else:
+            self.rng = create_source(self.rng.name)
+        self._reset_counters(featured_ssr)
+
+    def estimated_bytes(self) -> int:
+        """估算的内存占用（字节）"""
+        return (_SESSION_BYTES + 8 * len(self.featured_counts)
+                + self.rng.estimated_bytes() + self.sketches.estimated_bytes()
+                + self.pull_history.estimated_bytes())
 
     def to_dict(self) -> Dict:
         """序列化为字典"""
+        stats = {field: getattr(self, field) for field in COUNTER_FIELDS}
+        stats['featured_ssr_counts'] = self.featured_counts_dict()
+        stats['pull_history'] = self.pull_history.to_list()
         return {
             'session_id': self.session_id,
+            'parent_id': self.parent_id,
             'current_pool_id': self.current_pool_id,
             'pity_counter': self.pity_counter,
-            'stats': self.stats
+            'rng': {
+                'backend': self.rng.name,
+                'seed': self.rng.seed,
+                'seed_fixed': self.seed_fixed,
+                'position': self.rng.position
+            },
+            'stats': stats,
+            'sketches': self.sketches.to_dict()
         }
 
     @classmethod
     def from_dict(cls, data: Dict) -> 'UserSession':
         """从字典恢复会话状态"""
         session = cls(data['session_id'], data.get('current_pool_id'))
+        session.parent_id = data.get('parent_id')
         session.pity_counter = data.get('pity_counter', 0)
-        session.stats = data.get('stats', {
-            'total_pulls': 0,
-            'ssr_count': 0,
-            'sr_count': 0,
-            'r_count': 0,
-            'featured_ssr_counts': {},
-            'pull_history': []
-        })
+        stats = data.get('stats')
+        if stats:
+            for field in COUNTER_FIELDS:
+                setattr(session, field, stats.get(field, 0))
+            session.set_featured_counts(stats.get('featured_ssr_counts') or {})
+            session.pull_history = PullHistory(stats.get('pull_history'))
+        if data.get('sketches'):
+            session.sketches = PullSketches.from_dict(data['sketches'])
+        rng = data.get('rng')
+        if rng:
+            session.rng = create_source(rng.get('backend'), rng.get('seed'))
+            session.rng.seek(rng.get('position', 0))
+            session.seed_fixed = rng.get('seed_fixed', False)
         return session
 
 
 class SessionManager:
-    """会话管理器 - 创建、获取、重置用户会话"""
+    """
+    会话管理器 - 创建、获取、重置用户会话（会话保存在可替换的 SessionStore 中）
+
+    后台回收线程每 reap_interval 秒删除空闲超过 session_ttl 的会话；
+    会话占用超出内存预算时立即唤醒回收线程淘汰最久未访问的会话（不在请求线程中进行）。
 
-    def __init__(self):
+    进程内存储的会话修改后由 SessionCheckpointer 定期写入检查点文件，进程退出时再写一次；
+    存储中找不到的会话从检查点恢复，重启后会话在首次访问时恢复。
+    """
+
+    def __init__(self, store: SessionStore = None, reap_interval: float = None,
+                 checkpoint_path: str = None):
+        """
+        Args:
+            store: 会话存储（默认按 SESSION_CONFIG['store'] 创建）
+            reap_interval: 回收线程检查间隔（秒，默认使用配置值，0 表示不启动回收线程）
+            checkpoint_path: 检查点文件路径（默认使用配置值，空字符串表示不写检查点；
+                共享存储本身即持久化，不写检查点）
+        """
         self._lock = threading.RLock()
-        self._sessions: Dict[str, UserSession] = {}
+        self._store = store if store is not None else create_store()
+        checkpoint_path = (SESSION_CONFIG['checkpoint_path'] if checkpoint_path is None
+                           else checkpoint_path)
+        self._checkpoint: Optional[SessionCheckpointer] = None
+        if checkpoint_path and not self._store.shared:
+            self._checkpoint = SessionCheckpointer(checkpoint_path)
+            atexit.register(self.close)
+        # 分叉会话ID -> 最近访问时间（用于自动回收，查找路径上不加锁，只做单次字典赋值）
+        self._forks: Dict[str, float] = {}
+        self._reap_interval = (SESSION_CONFIG['reap_interval'] if reap_interval is None
+                               else reap_interval)
+        self._wake = threading.Event()
+        self._closed = False
+        self._reaper: Optional[threading.Thread] = None
+        if self._reap_interval > 0:
+            self._reaper = threading.Thread(target=self._reap_loop, name='session-reaper',
+                                            daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            self._wake.wait(self._reap_interval)
+            self._wake.clear()
+            if self._closed:
+                return
+            try:
+                self.cleanup_expired_sessions()
+                self._store.evict()
+            except Exception:
+                traceback.print_exc()
+
+    def _check_budget(self):
+        if self._store.over_budget:
+            if self._reaper is not None:
+                self._wake.set()
+            else:
+                self._store.evict()
+
+    def close(self):
+        """停止回收线程，写入检查点"""
+        self._closed = True
+        self._wake.set()
+        if self._reaper is not None:
+            self._reaper.join()
+        if self._checkpoint is not None:
+            self._checkpoint.close()
+
+    @property
+    def store(self) -> SessionStore:
+        return self._store
+
+    def _collect_forks(self, now: float):
+        """
+        回收空闲超时或超出数量上限（从最久未访问的开始）的分叉会话
+
+        只在 fork() 与回收线程中调用；锁内只挑选要回收的分叉，存储删除在锁外进行。
+        """
+        ttl = SESSION_CONFIG['fork_ttl']
+        victims = []
+        with self._lock:
+            forks = sorted(self._forks.items(), key=lambda item: item[1])
+            excess = len(forks) - SESSION_CONFIG['max_forks']
+            for index, (fork_id, last_access) in enumerate(forks):
+                expired = now - last_access >= ttl
+                if not expired and index >= excess:
+                    break
+                if self._forks.get(fork_id) != last_access:
+                    # 挑选期间刚被访问
+                    continue
+                del self._forks[fork_id]
+                victims.append((fork_id, expired))
+        for fork_id, expired in victims:
+            # 共享存储中以最近一次提交时间为准，其他进程仍在使用的分叉不删除
+            self._store.delete(fork_id, idle=ttl if expired else None)
+            if self._checkpoint is not None:
+                self._checkpoint.discard(fork_id)
+
+    def _lookup(self, session_id: str) -> Optional[UserSession]:
+        """从存储中获取会话，不存在时从检查点恢复"""
+        session = self._store.get(session_id)
+        if session is None and self._checkpoint is not None:
+            session = self._checkpoint.restore(session_id)
+            if session is not None:
+                session = self._store.add(session)
+                self._check_budget()
+        return session
 
     def get_or_create(self, session_id: str = None,
                       default_pool_id: str = None,
                       featured_ssr: List[str] = None) -> UserSession:
-        """获取或创建用户会话"""
+        """获取或创建用户会话（不获取管理器锁，不阻塞其他会话）"""
         if not session_id:
             session_id = str(uuid.uuid4())
 
-        with self._lock:
-            if session_id not in self._sessions:
-                self._sessions[session_id] = UserSession(
-                    session_id, default_pool_id, featured_ssr
-                )
-            return self._sessions[session_id]
+        session = self._lookup(session_id)
+        if session is None:
+            session = self._store.add(UserSession(session_id, default_pool_id, featured_ssr))
+            self._check_budget()
+        if session.parent_id is not None:
+            # 记录分叉会话的访问时间（其他进程创建的分叉同样参与本进程的回收）
+            self._forks[session_id] = time.monotonic()
+        elif session_id in self._forks:
+            # 已回收的分叉ID被重新创建为普通会话
+            self._forks.pop(session_id, None)
+        return session
+
+    def commit(self, session: UserSession) -> bool:
+        """写回会话的修改（见 SessionStore.save），被其他进程抢先修改时返回 False"""
+        saved = self._store.save(session)
+        if saved and self._checkpoint is not None:
+            self._checkpoint.mark(session)
+        self._check_budget()
+        return saved
+
+    def modify(self, session_id: str, action: Callable[[UserSession], Any],
+               default_pool_id: str = None, featured_ssr: List[str] = None) -> Any:
+        """
+        获取（或创建）会话，持有会话锁执行 action 并写回存储，返回 action 的返回值
+
+        同一会话的修改按顺序执行，不同会话互不阻塞。会话在等待锁期间被存储替换
+        （淘汰后恢复、共享存储中被其他进程抢先修改）时重新获取最新状态后再次执行 action。
+
+        Raises:
+            RuntimeError: 重试 commit_retries 次后仍然冲突
+        """
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        for _ in range(SESSION_CONFIG['commit_retries']):
+            session = self.get_or_create(session_id, default_pool_id, featured_ssr)
+            with session.lock:
+                if not self._store.is_current(session):
+                    continue
+                result = action(session)
+                if self.commit(session):
+                    return result
+        raise RuntimeError(f"Session {session_id} is being modified concurrently")
+
+    def read(self, session_id: str, action: Callable[[UserSession], Any],
+             default_pool_id: str = None, featured_ssr: List[str] = None) -> Any:
+        """获取（或创建）会话，持有会话锁执行只读的 action（不会与同一会话的修改交错）"""
+        session = self.get_or_create(session_id, default_pool_id, featured_ssr)
+        with session.lock:
+            return action(session)
+
+    def fork(self, session_id: str, seed: int = None, backend: str = None) -> Optional[UserSession]:
+        """
+        分叉指定会话（见 UserSession.fork）
+
+        分叉会话与普通会话一样通过 get_or_create 访问，空闲超过 fork_ttl 或
+        分叉数量超过 max_forks 时在下次 fork() 或回收线程检查时自动回收。
+
+        Returns:
+            子会话，父会话不存在时为 None
+
+        Raises:
+            ValueError: 随机数后端未知
+        """
+        parent = self._lookup(session_id)
+        if parent is None:
+            return None
+        with parent.lock:
+            child = parent.fork(str(uuid.uuid4()), seed, backend)
+        child = self._store.add(child)
+        if self._checkpoint is not None:
+            self._checkpoint.mark(child)
+        now = time.monotonic()
+        self._forks[child.session_id] = now
+        if session_id in self._forks:
+            self._forks[session_id] = now
+        self._collect_forks(now)
+        return child
+
+    def discard_fork(self, session_id: str) -> Optional[str]:
+        """
+        丢弃分叉会话
+
+        Returns:
+            父会话ID，session_id 不是分叉会话时为 None
+        """
+        self._forks.pop(session_id, None)
+        child = self._lookup(session_id)
+        if child is None or child.parent_id is None:
+            return None
+        self._store.delete(session_id)
+        if self._checkpoint is not None:
+            self._checkpoint.discard(session_id)
+        return child.parent_id
 
     def get_session_id(self, session_id: str = None,
                        default_pool_id: str = None,
@@ -95,10 +529,30 @@ class SessionManager:
 
     def reset_session(self, session_id: str, featured_ssr: List[str] = None):
         """重置指定会话"""
-        with self._lock:
-            if session_id in self._sessions:
-                self._sessions[session_id].reset(featured_ssr)
+        if self._lookup(session_id) is not None:
+            self.modify(session_id, lambda session: session.reset(featured_ssr))
+
+    def cleanup_expired_sessions(self, max_age_seconds: float = None) -> int:
+        """
+        删除空闲超过 max_age_seconds（默认 session_ttl）的会话，并回收超时的分叉会话
+
+        检查点文件中最近一次写入早于 max_age_seconds 之前的会话同时删除（不计入返回值）。
+
+        Returns:
+            删除的会话数
+        """
+        max_age_seconds = max_age_seconds or SESSION_CONFIG['session_ttl']
+        self._collect_forks(time.monotonic())
+        if self._checkpoint is not None:
+            self._checkpoint.expire(max_age_seconds)
+        return self._store.expire(max_age_seconds)
 
-    def cleanup_expired_sessions(self, max_age_seconds: int = 3600):
-        """清理过期的会话（预留接口）"""
-        pass
+    def stats(self) -> Dict:
+        """
+        会话存储计数器（在线会话数、淘汰 / 过期 / 溢出 / 恢复次数、估算字节数）、分叉数
+        与检查点计数器（未启用检查点时为 None）
+        """
+        result = self._store.stats()
+        result['forks'] = len(self._forks)
+        result['checkpoint'] = self._checkpoint.stats() if self._checkpoint is not None else None
+        return result
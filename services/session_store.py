@@ -0,0 +1,767 @@
+"""
+会话存储 - SessionManager 的可替换存储后端
+
+  - MemorySessionStore: 进程内字典（默认），单进程部署使用
+  - SQLiteSessionStore: WAL 模式的本地 SQLite 文件，同一台机器上的多个 gunicorn worker 共享
+
+SQLite 存储中每个会话一行，保底、计数器、随机数源位置等热字段为独立列，每次提交只
+UPDATE 这些列；抽卡历史按 PullHistory 的写入日志追加到 history 表（每次提交只写入
+新增的记录 / 紧凑段 / 重放段），不重新序列化整个历史；草图与UP计数只在出 SSR 后写回。
+历史日志行数超过 history_compact_rows 时以 PullHistory.snapshot() 重写一次。
+
+各 worker 在本进程缓存已加载的会话，访问时比较版本号：未变化直接使用缓存，
+变化时刷新计数列并只读取新增的历史日志。提交时按版本号做乐观并发控制，
+其他 worker 已先行提交时返回 False，由调用方重新加载后重试。
+
+两种存储都记录本进程内存中每个会话的估算字节数与最近访问时间：超出内存预算时
+按最近访问时间淘汰（进程内存储把淘汰的会话写入溢出文件，再次访问时恢复；
+共享存储只是丢弃本地缓存），expire() 回收空闲超过 TTL 的会话。
+"""
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from models.pool import Pool
+from config import SESSION_CONFIG
+from services.pity_rules import RuleCompiler
+from services.pull_history import PullHistory, ReplaySegment
+from services.result_cache import pool_fingerprint
+from services.rng import create_source
+from services.sketch import PullSketches
+
+if TYPE_CHECKING:
+    from services.session_manager import UserSession
+
+
+COUNTERS = ('evictions', 'expired', 'spilled', 'restored')
+
+
+class SessionStore:
+    """
+    会话存储基类
+
+    子类把本进程内存中的会话登记在 _sessions（进程内存储即全部会话，共享存储为缓存），
+    基类据此统计估算字节数并按内存预算淘汰。
+    """
+
+    name = ''
+    # 是否在多个进程间共享（共享存储中的会话需要在修改后 save）
+    shared = False
+
+    def __init__(self, memory_budget: int = None):
+        """
+        Args:
+            memory_budget: 本进程内存中会话的估算字节数上限（默认使用配置值，0 表示不限制）
+        """
+        self.memory_budget = (SESSION_CONFIG['memory_budget'] if memory_budget is None
+                              else memory_budget)
+        self._lock = threading.RLock()
+        # 查找不加锁（dict 读取在 GIL 下是原子的），登记 / 移除在锁内进行
+        self._sessions: Dict[str, 'UserSession'] = {}
+        # 会话ID -> 最近一次登记时的估算字节数
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self.counters = {name: 0 for name in COUNTERS}
+
+    def _track(self, session: 'UserSession', size: int):
+        """登记会话及其估算字节数（调用方持有锁；size 在锁外计算）"""
+        session_id = session.session_id
+        self._sessions[session_id] = session
+        self._bytes += size - self._sizes.get(session_id, 0)
+        self._sizes[session_id] = size
+
+    def _untrack(self, session_id: str) -> Optional['UserSession']:
+        """移除登记（调用方持有锁）"""
+        self._bytes -= self._sizes.pop(session_id, 0)
+        return self._sessions.pop(session_id, None)
+
+    def is_current(self, session: 'UserSession') -> bool:
+        """会话对象是否仍是存储中该会话的当前状态（未被淘汰或因冲突而作废）"""
+        return self._sessions.get(session.session_id) is session
+
+    @property
+    def over_budget(self) -> bool:
+        return 0 < self.memory_budget < self._bytes
+
+    def evict(self) -> int:
+        """
+        超出内存预算时按最近访问时间淘汰会话，直到估算字节数降到预算的 evict_target 比例
+
+        Returns:
+            淘汰的会话数
+        """
+        if not self.over_budget:
+            return 0
+        target = self.memory_budget * SESSION_CONFIG['evict_target']
+        with self._lock:
+            candidates = [(session.last_access, session) for session in self._sessions.values()]
+        # 排序在锁外进行；淘汰前确认候选会话期间未被访问
+        candidates.sort(key=lambda item: item[0])
+        victims = []
+        with self._lock:
+            for last_access, session in candidates:
+                if self._bytes <= target:
+                    break
+                if (session.last_access == last_access
+                        and self._sessions.get(session.session_id) is session):
+                    victims.append(self._evict_one(session.session_id))
+            self.counters['evictions'] += len(victims)
+        if victims:
+            self._evicted(victims)
+        return len(victims)
+
+    def _evict_one(self, session_id: str) -> 'UserSession':
+        """从内存中淘汰一个会话（调用方持有锁）"""
+        return self._untrack(session_id)
+
+    def _evicted(self, victims: List['UserSession']):
+        """淘汰后的处理（在锁外调用）"""
+
+    def expire(self, max_idle: float) -> int:
+        """
+        回收空闲超过 max_idle 秒的会话
+
+        Returns:
+            删除的会话数
+        """
+        raise NotImplementedError
+
+    def _drop_idle(self, max_idle: float) -> List['UserSession']:
+        """从内存中移除空闲超过 max_idle 秒的会话"""
+        cutoff = time.monotonic() - max_idle
+        with self._lock:
+            idle = [session_id for session_id, session in self._sessions.items()
+                    if session.last_access < cutoff]
+            return [self._untrack(session_id) for session_id in idle]
+
+    def stats(self) -> Dict:
+        """计数器与内存占用"""
+        with self._lock:
+            result = dict(self.counters)
+            result.update({
+                'store': self.name,
+                'live_sessions': len(self._sessions),
+                'estimated_bytes': self._bytes,
+                'memory_budget': self.memory_budget,
+            })
+        return result
+
+    def get(self, session_id: str) -> Optional['UserSession']:
+        """返回会话的最新状态，不存在时为 None"""
+        raise NotImplementedError
+
+    def add(self, session: 'UserSession') -> 'UserSession':
+        """保存新会话；同ID的会话已存在时不覆盖，返回已存在的会话"""
+        raise NotImplementedError
+
+    def save(self, session: 'UserSession') -> bool:
+        """
+        写回会话在 get / add 之后的修改
+
+        Returns:
+            是否成功；为 False 时会话已被其他进程修改，本地修改作废，调用方应重新 get 后重试
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str, idle: float = None):
+        """
+        删除会话
+
+        Args:
+            idle: 仅在会话最近一次提交早于 idle 秒之前时删除（共享存储中其他进程可能仍在使用该会话；
+                  进程内存储由调用方判断空闲，忽略该参数）
+        """
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    进程内字典存储（会话对象即存储本身，save 只更新估算字节数）
+
+    超出内存预算淘汰的会话写入溢出文件（与 SQLiteSessionStore 相同的格式，重放段等紧凑历史
+    保持原样），再次访问时恢复到内存。
+    """
+
+    name = 'memory'
+
+    def __init__(self, memory_budget: int = None, spill_path: str = None):
+        """
+        Args:
+            memory_budget: 见 SessionStore
+            spill_path: 溢出文件路径（默认使用配置值，空字符串表示淘汰的会话直接丢弃）
+        """
+        super().__init__(memory_budget)
+        spill_path = SESSION_CONFIG['spill_path'] if spill_path is None else spill_path
+        self._spill = SQLiteSessionStore(spill_path, memory_budget=0) if spill_path else None
+        # 已淘汰、尚未写完溢出文件的会话（期间被访问时直接收回，不读溢出文件）
+        self._evicting: Dict[str, 'UserSession'] = {}
+
+    def get(self, session_id: str) -> Optional['UserSession']:
+        session = self._sessions.get(session_id)
+        if session is None:
+            if self._spill is None:
+                return None
+            session = self._restore(session_id)
+            if session is None:
+                return None
+        session.last_access = time.monotonic()
+        return session
+
+    def _restore(self, session_id: str) -> Optional['UserSession']:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                return session
+            session = self._evicting.pop(session_id, None)
+            if session is None:
+                session = self._spill.load(session_id, remove=True)
+            if session is not None:
+                self._track(session, session.estimated_bytes())
+                self.counters['restored'] += 1
+            return session
+
+    def add(self, session: 'UserSession') -> 'UserSession':
+        size = session.estimated_bytes()
+        with self._lock:
+            existing = self._sessions.get(session.session_id)
+            if existing is not None:
+                return existing
+            session.last_access = time.monotonic()
+            self._track(session, size)
+            return session
+
+    def save(self, session: 'UserSession') -> bool:
+        size = session.estimated_bytes()
+        with self._lock:
+            # 修改期间被淘汰的会话重新登记（内存中的状态为准）
+            if self._evicting.get(session.session_id) is session:
+                del self._evicting[session.session_id]
+            self._track(session, size)
+        return True
+
+    def _evict_one(self, session_id: str) -> 'UserSession':
+        session = self._untrack(session_id)
+        if self._spill is not None:
+            self._evicting[session_id] = session
+        return session
+
+    def _evicted(self, victims: List['UserSession']):
+        if self._spill is None:
+            return
+        spilled = 0
+        for session in victims:
+            session_id = session.session_id
+            # 持有会话锁写入，得到一致的快照（修改中的会话等修改完成后再判断）
+            with session.lock:
+                with self._lock:
+                    if self._evicting.get(session_id) is not session:
+                        continue
+                self._spill.put(session)
+                with self._lock:
+                    if self._evicting.get(session_id) is session:
+                        del self._evicting[session_id]
+                        spilled += 1
+                        continue
+                # 写入期间被收回，内存中的状态为准
+                self._spill.delete(session_id)
+        with self._lock:
+            self.counters['spilled'] += spilled
+
+    def expire(self, max_idle: float) -> int:
+        expired = len(self._drop_idle(max_idle))
+        if self._spill is not None:
+            expired += self._spill.expire(max_idle)
+        with self._lock:
+            self.counters['expired'] += expired
+        return expired
+
+    def delete(self, session_id: str, idle: float = None):
+        with self._lock:
+            self._untrack(session_id)
+            self._evicting.pop(session_id, None)
+            if self._spill is not None:
+                self._spill.delete(session_id)
+
+    def stats(self) -> Dict:
+        result = super().stats()
+        result['spilled_sessions'] = len(self._spill) if self._spill is not None else 0
+        return result
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class _SyncState:
+    """会话在本进程中的同步状态（最近一次读取 / 提交时的版本等）"""
+
+    __slots__ = ('version', 'history', 'epoch', 'seq', 'rows', 'ssr_count')
+
+    def __init__(self, version: int, history: Optional[PullHistory], epoch: int, seq: int,
+                 rows: int, ssr_count: int):
+        self.version = version
+        # 已同步的历史对象（会话换用新历史对象时整体重写，如重置）
+        self.history = history
+        self.epoch = epoch
+        # 已读取的最大历史日志序号
+        self.seq = seq
+        # 当前 epoch 的历史日志行数
+        self.rows = rows
+        # 草图 / UP计数只在 SSR 数变化时写回
+        self.ssr_count = ssr_count
+
+
+# 每次提交都写回的热字段（与 _hot_values 顺序一致）
+_HOT_COLUMNS = ('parent_id', 'current_pool_id', 'pity_counter', 'total_pulls', 'ssr_count',
+                'sr_count', 'r_count', 'rng_backend', 'rng_seed', 'seed_fixed', 'rng_position')
+_COLUMNS = ('session_id', 'version') + _HOT_COLUMNS + (
+    'featured', 'sketches', 'history_epoch', 'updated')
+
+
+class SQLiteSessionStore(SessionStore):
+    """多进程共享的 SQLite 会话存储（每个线程一个连接，fork 后重新连接）"""
+
+    name = 'sqlite'
+    shared = True
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS sessions ("
+        " session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, parent_id TEXT,"
+        " current_pool_id TEXT, pity_counter INTEGER NOT NULL, total_pulls INTEGER NOT NULL,"
+        " ssr_count INTEGER NOT NULL, sr_count INTEGER NOT NULL, r_count INTEGER NOT NULL,"
+        " rng_backend TEXT NOT NULL, rng_seed TEXT NOT NULL, seed_fixed INTEGER NOT NULL,"
+        " rng_position INTEGER NOT NULL, featured TEXT NOT NULL, sketches TEXT NOT NULL,"
+        " history_epoch INTEGER NOT NULL, updated REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS history ("
+        " seq INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,"
+        " epoch INTEGER NOT NULL, op BLOB NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS history_session ON history (session_id, seq)",
+        "CREATE TABLE IF NOT EXISTS pools (fingerprint TEXT PRIMARY KEY, data TEXT NOT NULL)",
+    )
+
+    def __init__(self, path: str = None, memory_budget: int = None):
+        """
+        Args:
+            path: SQLite 文件路径（默认使用配置值）
+            memory_budget: 本进程缓存的会话估算字节数上限（见 SessionStore）
+        """
+        super().__init__(memory_budget)
+        self.path = path or SESSION_CONFIG['store_path']
+        self._local = threading.local()
+        # 卡池指纹 -> 卡池对象（重放段引用的卡池，已写入 pools 表）
+        self._pools: Dict[str, Pool] = {}
+        # 当前事务中新写入 pools 表的卡池（提交后并入 _pools，回滚时丢弃）
+        self._pending_pools: Dict[str, Pool] = {}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=SESSION_CONFIG['store_timeout'],
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self._SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---- 历史日志编解码 ----
+
+    def _pool_key(self, conn: sqlite3.Connection, pool: Optional[Pool]) -> Optional[str]:
+        if pool is None:
+            return None
+        key = pool_fingerprint(pool)
+        if key not in self._pools and key not in self._pending_pools:
+            conn.execute("INSERT OR IGNORE INTO pools VALUES (?, ?)",
+                         (key, json.dumps(pool.to_dict(), ensure_ascii=False)))
+            self._pending_pools[key] = pool
+        return key
+
+    def _pool(self, conn: sqlite3.Connection, key: Optional[str]) -> Optional[Pool]:
+        if key is None:
+            return None
+        pool = self._pools.get(key)
+        if pool is None:
+            row = conn.execute("SELECT data FROM pools WHERE fingerprint = ?", (key,)).fetchone()
+            pool = Pool.from_dict(json.loads(row[0]))
+            self._pools[key] = pool
+        return pool
+
+    def _encode(self, conn: sqlite3.Connection, op: tuple) -> bytes:
+        """重放段中的卡池与阈值表替换为卡池指纹（卡池定义单独保存一次）"""
+        if op[0] == 'replay':
+            _, start, rng_spec, position, pity, count, pool, _ = op
+            op = ('replay', start, rng_spec, position, pity, count, self._pool_key(conn, pool))
+        elif op[0] == 'segment' and isinstance(op[1], ReplaySegment):
+            seg = op[1]
+            op = ('replay_segment', seg.start, seg.rng_spec, seg.position, seg.pity, seg.count,
+                  seg.skip, self._pool_key(conn, seg.pool))
+        return pickle.dumps(op, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _apply(self, conn: sqlite3.Connection, history: PullHistory, blob: bytes):
+        op = pickle.loads(blob)
+        if op[0] == 'replay':
+            pool = self._pool(conn, op[6])
+            op = op[:6] + (pool, RuleCompiler.for_pool(pool))
+        elif op[0] == 'replay_segment':
+            _, start, rng_spec, position, pity, count, skip, key = op
+            pool = self._pool(conn, key)
+            op = ('segment', ReplaySegment(start, rng_spec, position, pity, count, pool,
+                                           RuleCompiler.for_pool(pool), skip))
+        history.apply(op)
+
+    def _write_history(self, conn: sqlite3.Connection, session_id: str, epoch: int,
+                       ops: List[tuple]) -> int:
+        """追加历史日志，返回该会话最大的日志序号"""
+        if ops:
+            conn.executemany(
+                "INSERT INTO history (session_id, epoch, op) VALUES (?, ?, ?)",
+                [(session_id, epoch, self._encode(conn, op)) for op in ops]
+            )
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM history WHERE session_id = ?",
+                            (session_id,)).fetchone()[0]
+
+    def _commit(self, conn: sqlite3.Connection):
+        conn.execute("COMMIT")
+        self._pools.update(self._pending_pools)
+        self._pending_pools.clear()
+
+    def _rollback(self, conn: sqlite3.Connection):
+        conn.execute("ROLLBACK")
+        self._pending_pools.clear()
+
+    # ---- 读取 ----
+
+    def _select(self, conn: sqlite3.Connection, session_id: str) -> Optional[tuple]:
+        return conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+
+    def _load_history(self, conn: sqlite3.Connection, session: 'UserSession',
+                      state: _SyncState, epoch: int):
+        """读取新增的历史日志（epoch 变化时从头重建）"""
+        history = session.pull_history
+        if epoch != state.epoch or history is not state.history:
+            history = PullHistory()
+            session.pull_history = history
+            state.seq, state.rows = 0, 0
+        rows = conn.execute(
+            "SELECT seq, op FROM history WHERE session_id = ? AND epoch = ? AND seq > ?"
+            " ORDER BY seq", (session.session_id, epoch, state.seq)
+        ).fetchall()
+        history.journal = None
+        for seq, blob in rows:
+            self._apply(conn, history, blob)
+            state.seq = seq
+        history.journal = []
+        state.history, state.epoch = history, epoch
+        state.rows += len(rows)
+
+    def _refresh(self, conn: sqlite3.Connection, session: 'UserSession', row: tuple):
+        """用数据库行更新会话（计数列直接赋值，草图与历史只在变化时重新读取）"""
+        data = dict(zip(_COLUMNS, row))
+        state = session.store_state
+        if state is None:
+            state = session.store_state = _SyncState(-1, None, -1, 0, 0, -1)
+        session.parent_id = data['parent_id']
+        session.current_pool_id = data['current_pool_id']
+        session.pity_counter = data['pity_counter']
+        for field in ('total_pulls', 'ssr_count', 'sr_count', 'r_count'):
+            setattr(session, field, data[field])
+        session.set_featured_counts(json.loads(data['featured']))
+        seed = int(data['rng_seed'])
+        if session.rng.name != data['rng_backend'] or session.rng.seed != seed:
+            session.rng = create_source(data['rng_backend'], seed)
+        session.rng.seek(data['rng_position'])
+        session.seed_fixed = bool(data['seed_fixed'])
+        if data['ssr_count'] != state.ssr_count or data['history_epoch'] != state.epoch:
+            session.sketches = PullSketches.from_dict(json.loads(data['sketches']))
+            state.ssr_count = data['ssr_count']
+        self._load_history(conn, session, state, data['history_epoch'])
+        state.version = data['version']
+
+    def _read(self, conn: sqlite3.Connection, session_id: str,
+              session: 'UserSession' = None) -> Optional['UserSession']:
+        """在同一个读事务中读取计数与历史日志（保证两者对应同一版本），会话不存在时为 None"""
+        from services.session_manager import UserSession
+
+        conn.execute("BEGIN")
+        try:
+            row = self._select(conn, session_id)
+            if row is None:
+                return None
+            if session is None:
+                session = UserSession(session_id)
+            self._refresh(conn, session, row)
+            return session
+        finally:
+            conn.execute("COMMIT")
+
+    def get(self, session_id: str) -> Optional['UserSession']:
+        conn = self._conn()
+        row = self._select(conn, session_id)
+        session = self._sessions.get(session_id)
+        if row is None:
+            if session is not None:
+                with self._lock:
+                    self._untrack(session_id)
+            return None
+        state = session.store_state if session is not None else None
+        if state is None or state.version != row[1]:
+            session = self._load(conn, session_id, session)
+            if session is None:
+                return None
+        session.last_access = time.monotonic()
+        return session
+
+    def _load(self, conn: sqlite3.Connection, session_id: str,
+              session: Optional['UserSession']) -> Optional['UserSession']:
+        """读取新会话，或持有会话锁刷新已缓存的会话（不会与本进程中对该会话的修改交错）"""
+        if session is None:
+            session = self._read(conn, session_id)
+            if session is None:
+                return None
+            size = session.estimated_bytes()
+            with self._lock:
+                existing = self._sessions.get(session_id)
+                if existing is not None:
+                    # 其他线程已同时加载
+                    return existing
+                self._track(session, size)
+            return session
+        with session.lock:
+            state = session.store_state
+            row = self._select(conn, session_id)
+            if row is None:
+                return None
+            if state is None or state.version != row[1]:
+                if self._read(conn, session_id, session) is None:
+                    return None
+            size = session.estimated_bytes()
+        with self._lock:
+            self._track(session, size)
+        return session
+
+    def load(self, session_id: str, remove: bool = False) -> Optional['UserSession']:
+        """读取会话但不加入本进程缓存（remove 为 True 时同时删除），用于溢出文件"""
+        conn = self._conn()
+        with self._lock:
+            session = self._read(conn, session_id)
+            if session is None:
+                return None
+            if remove:
+                self.delete(session_id)
+        session.store_state = None
+        session.pull_history.journal = None
+        return session
+
+    # ---- 写入 ----
+
+    @staticmethod
+    def _hot_values(session: 'UserSession') -> tuple:
+        return (session.parent_id, session.current_pool_id, session.pity_counter,
+                session.total_pulls, session.ssr_count, session.sr_count, session.r_count,
+                session.rng.name, str(session.rng.seed), int(session.seed_fixed),
+                session.rng.position)
+
+    def _insert(self, conn: sqlite3.Connection, session: 'UserSession') -> Optional[tuple]:
+        """
+        插入会话行与历史快照（调用方已开启写事务）
+
+        Returns:
+            (最大日志序号, 日志行数)，同ID的会话已存在时为 None
+        """
+        cursor = conn.execute(
+            f"INSERT OR IGNORE INTO sessions ({', '.join(_COLUMNS)})"
+            f" VALUES (?, 0, {', '.join('?' * len(_HOT_COLUMNS))}, ?, ?, 0, ?)",
+            (session.session_id,) + self._hot_values(session) + (
+                json.dumps(session.featured_counts_dict()),
+                json.dumps(session.sketches.to_dict()), time.time())
+        )
+        if not cursor.rowcount:
+            return None
+        ops = session.pull_history.snapshot()
+        return self._write_history(conn, session.session_id, 0, ops), len(ops)
+
+    @staticmethod
+    def _delete_rows(conn: sqlite3.Connection, session_ids: List[str]):
+        params = [(session_id,) for session_id in session_ids]
+        conn.executemany("DELETE FROM sessions WHERE session_id = ?", params)
+        conn.executemany("DELETE FROM history WHERE session_id = ?", params)
+
+    def add(self, session: 'UserSession') -> 'UserSession':
+        conn = self._conn()
+        size = session.estimated_bytes()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                inserted = self._insert(conn, session)
+                self._commit(conn)
+            except BaseException:
+                self._rollback(conn)
+                raise
+            if inserted is None:
+                # 其他进程已创建同ID的会话
+                return self.get(session.session_id) or self.add(session)
+            seq, rows = inserted
+            history = session.pull_history
+            history.journal = []
+            session.store_state = _SyncState(0, history, 0, seq, rows,
+                                             session.ssr_count)
+            session.last_access = time.monotonic()
+            self._track(session, size)
+            return session
+
+    def put(self, session: 'UserSession'):
+        """写入会话的完整快照（覆盖同ID的会话，不加入本进程缓存），用于溢出文件"""
+        self.put_many([session])
+
+    def put_many(self, sessions: List['UserSession'], deleted: List[str] = ()):
+        """在一个事务中写入多个会话的完整快照（见 put）并删除 deleted 中的会话，用于检查点文件"""
+        conn = self._conn()
+        ids = [session.session_id for session in sessions]
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_rows(conn, ids + list(deleted))
+                for session in sessions:
+                    self._insert(conn, session)
+                self._commit(conn)
+            except BaseException:
+                self._rollback(conn)
+                raise
+
+    def save(self, session: 'UserSession') -> bool:
+        state = session.store_state
+        if state is None:
+            raise ValueError(f"Session {session.session_id} is not tracked by this store")
+        conn = self._conn()
+        history = session.pull_history
+        size = session.estimated_bytes()
+        with self._lock:
+            journal = history.journal if history is state.history else None
+            rewrite = (journal is None
+                       or state.rows + len(journal) > SESSION_CONFIG['history_compact_rows'])
+            epoch = state.epoch + 1 if rewrite else state.epoch
+            assignments = [f"{column} = ?" for column in _HOT_COLUMNS]
+            assignments += ['history_epoch = ?', 'updated = ?']
+            values = self._hot_values(session) + (epoch, time.time())
+            if rewrite or session.ssr_count != state.ssr_count:
+                assignments += ['featured = ?', 'sketches = ?']
+                values += (json.dumps(session.featured_counts_dict()),
+                           json.dumps(session.sketches.to_dict()))
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    f"UPDATE sessions SET {', '.join(assignments)}, version = version + 1"
+                    " WHERE session_id = ? AND version = ?",
+                    values + (session.session_id, state.version)
+                )
+                if not cursor.rowcount:
+                    self._rollback(conn)
+                    # 其他进程已修改（或已删除），丢弃本地修改
+                    self._untrack(session.session_id)
+                    session.store_state = None
+                    return False
+                if rewrite:
+                    ops = history.snapshot()
+                    conn.execute("DELETE FROM history WHERE session_id = ?",
+                                 (session.session_id,))
+                else:
+                    ops = journal
+                seq = self._write_history(conn, session.session_id, epoch, ops)
+                self._commit(conn)
+            except BaseException:
+                self._rollback(conn)
+                raise
+
+            history.journal = []
+            state.history, state.epoch, state.seq = history, epoch, seq
+            state.rows = len(ops) if rewrite else state.rows + len(ops)
+            state.ssr_count = session.ssr_count
+            state.version += 1
+            self._track(session, size)
+            return True
+
+    def delete(self, session_id: str, idle: float = None):
+        conn = self._conn()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if idle is None:
+                    cursor = conn.execute("DELETE FROM sessions WHERE session_id = ?",
+                                          (session_id,))
+                else:
+                    cursor = conn.execute(
+                        "DELETE FROM sessions WHERE session_id = ? AND updated < ?",
+                        (session_id, time.time() - idle)
+                    )
+                if cursor.rowcount:
+                    conn.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+                self._commit(conn)
+            except BaseException:
+                self._rollback(conn)
+                raise
+            self._untrack(session_id)
+
+    def expire(self, max_idle: float) -> int:
+        """
+        删除最近一次提交早于 max_idle 秒之前的会话（只读访问不刷新提交时间），
+        同时丢弃本进程缓存中空闲的会话
+        """
+        self._drop_idle(max_idle)
+        conn = self._conn()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = [row[0] for row in conn.execute(
+                    "SELECT session_id FROM sessions WHERE updated < ?",
+                    (time.time() - max_idle,)
+                )]
+                self._delete_rows(conn, expired)
+                self._commit(conn)
+            except BaseException:
+                self._rollback(conn)
+                raise
+            for session_id in expired:
+                self._untrack(session_id)
+            self.counters['expired'] += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict:
+        result = super().stats()
+        result['stored_sessions'] = len(self)
+        return result
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+STORES = {
+    MemorySessionStore.name: MemorySessionStore,
+    SQLiteSessionStore.name: SQLiteSessionStore,
+}
+
+
+def create_store(name: str = None) -> SessionStore:
+    """
+    按名称创建会话存储（为空时使用配置值）
+
+    Raises:
+        ValueError: 存储名称未知
+    """
+    name = name or SESSION_CONFIG['store']
+    cls = STORES.get(name)
+    if cls is None:
+        raise ValueError(f"Unknown session store: {name}")
+    return cls()
@@ -0,0 +1,224 @@
+"""
+命令行批量模拟 - 不启动 Flask，直接通过 PoolManager 加载卡池并运行蒙特卡洛模拟
+
+用法:
+    python -m services.simulate --pool limited --players 1000000 --pulls 300 --seed 1
+    python -m services.simulate --players 200000 --workers 4 --format ndjson -o result.ndjson
+    python -m services.simulate --list-pools
+
+规则与 SimulationService 一致（编译后的保底阈值表 + PullEngine.card_probabilities），
+分块方式与随机数子流划分也相同，因此相同种子与后端的 total 行与 /api/simulate 结果一致。
+每完成一块立即按块序号顺序输出一行 (scope=chunk)，最后输出合并后的 total 行；
+进度写到 stderr，不影响标准输出中的结果。
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from typing import Dict, IO, List
+
+from config import SIMULATION_CONFIG
+from services.pool_manager import PoolManager
+from services.rng import BACKENDS, create_source, default_backend, from_spec
+from services.simulation import (NUMPY_AVAILABLE, SimulationService, _simulate_chunk,
+                                 merge_results, simulate_players)
+
+
+QUANTILE_METRICS = ('pulls_to_ssr', 'pulls_to_featured', 'lost_streak')
+
+COLUMNS = (
+    'scope', 'chunk', 'pool_id', 'players', 'pulls_per_player', 'total_pulls',
+    'ssr', 'sr', 'r', 'ssr_rate', 'mean_pulls_to_ssr', 'featured_copies', 'never_featured',
+) + tuple(
+    f"{metric}_{p}" for metric in QUANTILE_METRICS for p in ('p50', 'p90', 'p99')
+) + ('seed', 'rng_backend', 'elapsed_ms')
+
+
+def result_row(part: Dict, scope: str, chunk, pool_id: str, seed: int, backend: str,
+               elapsed: float) -> Dict:
+    """把一块（或合并后）的直方图整理为一行输出"""
+    ssr, sr, r = (int(x) for x in part['rarity_counts'])
+    total = ssr + sr + r
+    copies = part['featured_copies']
+    row = {
+        'scope': scope,
+        'chunk': chunk,
+        'pool_id': pool_id,
+        'players': part['players'],
+        'pulls_per_player': part['pulls'],
+        'total_pulls': total,
+        'ssr': ssr,
+        'sr': sr,
+        'r': r,
+        'ssr_rate': ssr / total if total else 0.0,
+        'mean_pulls_to_ssr': part['sketches']['pulls_to_ssr'].summary()['mean'],
+        'featured_copies': int(sum(k * int(n) for k, n in enumerate(copies))),
+        'never_featured': part['never_featured'],
+        'seed': seed,
+        'rng_backend': backend,
+        'elapsed_ms': round(elapsed * 1000, 3),
+    }
+    for metric in QUANTILE_METRICS:
+        summary = part['sketches'][metric].summary()
+        for p in ('p50', 'p90', 'p99'):
+            row[f"{metric}_{p}"] = summary[p]
+    return row
+
+
+class RowWriter:
+    """按格式逐行写出并立即刷新，便于管道下游流式读取"""
+
+    def __init__(self, stream: IO, fmt: str):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=COLUMNS, lineterminator='\n')
+            self._csv.writeheader()
+
+    def write(self, row: Dict):
+        if self.fmt == 'csv':
+            self._csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+
+class Progress:
+    """stderr 进度报告（终端上原地刷新，否则每完成约 10% 输出一行）"""
+
+    def __init__(self, total_chunks: int, total_players: int, enabled: bool):
+        self.total_chunks = total_chunks
+        self.total_players = total_players
+        self.enabled = enabled
+        self.tty = sys.stderr.isatty()
+        self.started = time.perf_counter()
+        self.players = 0
+        self._next_report = 0.1
+
+    def update(self, done: int, players: int):
+        self.players += players
+        if not self.enabled:
+            return
+        fraction = done / self.total_chunks
+        if not self.tty and fraction < self._next_report and done < self.total_chunks:
+            return
+        self._next_report = fraction + 0.1
+        elapsed = time.perf_counter() - self.started
+        rate = self.players / elapsed if elapsed > 0 else 0.0
+        eta = (self.total_players - self.players) / rate if rate > 0 else 0.0
+        line = (f"[{done}/{self.total_chunks}] {self.players:,}/{self.total_players:,} players "
+                f"{rate:,.0f}/s eta {eta:.1f}s")
+        sys.stderr.write(('\r' + line) if self.tty else (line + '\n'))
+        if self.tty and done == self.total_chunks:
+            sys.stderr.write('\n')
+        sys.stderr.flush()
+
+
+def run(pool, players: int, pulls: int, seed: int, workers: int, backend: str,
+        writer: RowWriter, progress: Progress, emit_chunks: bool = True) -> Dict:
+    """运行模拟，逐块输出结果行，返回 total 行"""
+    started = time.perf_counter()
+    root = create_source(backend, seed)
+    chunk = SIMULATION_CONFIG['chunk_players']
+    sizes = [min(chunk, players - i) for i in range(0, players, chunk)]
+    specs = [root.jumped(i).spec() for i in range(len(sizes))]
+
+    if workers == 1:
+        results = (
+            simulate_players(pool, size, pulls, from_spec(spec).generator())
+            for size, spec in zip(sizes, specs)
+        )
+    else:
+        executor = SimulationService._get_executor(workers)
+        pool_data = pool.to_dict()
+        futures = [
+            executor.submit(_simulate_chunk, pool_data, size, pulls, spec)
+            for size, spec in zip(sizes, specs)
+        ]
+        results = (f.result() for f in futures)
+
+    parts: List[Dict] = []
+    for i, part in enumerate(results):
+        parts.append(part)
+        if emit_chunks:
+            writer.write(result_row(part, 'chunk', i, pool.pool_id, root.seed, root.name,
+                                    time.perf_counter() - started))
+        progress.update(i + 1, part['players'])
+
+    total = result_row(merge_results(parts), 'total', None, pool.pool_id, root.seed,
+                       root.name, time.perf_counter() - started)
+    writer.write(total)
+    return total
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m services.simulate',
+        description='不启动 Flask 的批量蒙特卡洛抽卡模拟，结果以 CSV / NDJSON 流式输出'
+    )
+    parser.add_argument('--pool', help='卡池ID（默认使用第一个卡池）')
+    parser.add_argument('--players', type=int, default=100000, help='虚拟玩家数量')
+    parser.add_argument('--pulls', type=int, default=100, help='每名玩家抽卡次数')
+    parser.add_argument('--seed', type=int, help='随机种子（不填时随机生成并在结果中输出）')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), help='随机数后端')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='工作进程数（1 表示在当前进程计算，0 表示使用配置值）')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv', help='输出格式')
+    parser.add_argument('-o', '--output', default='-', help='输出文件（默认标准输出）')
+    parser.add_argument('--cards', help='卡池数据文件（默认 data/cards.json）')
+    parser.add_argument('--total-only', action='store_true', help='只输出合并后的 total 行')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不输出进度')
+    parser.add_argument('--list-pools', action='store_true', help='列出卡池后退出')
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    pool_mgr = PoolManager(load_local=not args.cards)
+    if args.cards:
+        with open(args.cards, 'r', encoding='utf-8') as f:
+            pool_mgr.load_from_dict(json.load(f))
+
+    if args.list_pools:
+        for pool in pool_mgr.get_all():
+            print(f"{pool.pool_id}\t{pool.pool_type}\t{pool.name}\t{len(pool.cards)} cards")
+        return 0
+
+    if not NUMPY_AVAILABLE:
+        parser.error("NumPy not available")
+    pool_id = args.pool or pool_mgr.default_pool_id
+    pool = pool_mgr.get(pool_id)
+    if pool is None:
+        parser.error(f"unknown pool: {pool_id}")
+    if not 1 <= args.players <= SIMULATION_CONFIG['max_players']:
+        parser.error(f"--players must be in [1, {SIMULATION_CONFIG['max_players']}]")
+    if not 1 <= args.pulls <= SIMULATION_CONFIG['max_pulls']:
+        parser.error(f"--pulls must be in [1, {SIMULATION_CONFIG['max_pulls']}]")
+
+    chunks = -(-args.players // SIMULATION_CONFIG['chunk_players'])
+    workers = max(1, min(args.workers or SIMULATION_CONFIG['max_workers'], chunks))
+    progress = Progress(chunks, args.players, enabled=not args.quiet)
+
+    stream = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8',
+                                                        newline='')
+    try:
+        writer = RowWriter(stream, args.format)
+        run(pool, args.players, args.pulls, args.seed, workers,
+            args.backend or default_backend(), writer, progress,
+            emit_chunks=not args.total_only)
+    except BrokenPipeError:
+        # 下游（如 head）提前关闭管道
+        return 0
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+        if workers > 1:
+            SimulationService.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,427 @@
+"""
+模拟服务 - 在进程池上并行运行多名虚拟玩家的蒙特卡洛抽卡模拟
+
+每名虚拟玩家从零保底开始在同一卡池连续抽卡，规则与 PullEngine 一致
+（编译后的保底阈值表 + card_probabilities）。玩家按固定大小分块，
+第 i 块使用根随机数源的第 i 个子流 (RandomSource.jumped)，因此相同
+种子与后端的结果与工作进程数量无关。各块返回直方图与分位数草图
+（SSR 间隔 / UP 间隔 / 连败），由主进程无损合并。
+
+自适应精度模式 (run_adaptive) 按轮追加批次，直到 SSR 概率、UP 占比与
+平均出 SSR 抽数的置信区间半宽均小于目标精度，或时间预算用尽。每名玩家
+只抽一个完整保底周期 (hard_pity 抽)：从零保底到首个 SSR 的抽数是独立同分布
+的周期样本，长期 SSR 概率按更新过程取 1 / 平均周期，避免固定抽数窗口
+截断末尾周期带来的偏差。
+
+模拟不读写任何用户会话。
+"""
+import math
+import time
+import threading
+from statistics import NormalDist
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from models.pool import Pool
+from config import SIMULATION_CONFIG
+from services.pity_rules import RuleCompiler
+from services.pull_engine import PullEngine
+from services.rng import create_source, from_spec
+from services.sketch import PullSketches, QuantileSketch, merge_sketches
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+
+_executor: Optional['ProcessPoolExecutor'] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def simulate_players(pool: Pool, players: int, pulls: int,
+                     rng: 'np.random.Generator') -> Dict:
+    """
+    在当前进程中模拟 players 名玩家各抽 pulls 次，按抽数逐步向量化推进全部玩家。
+
+    Returns:
+        直方图字典（numpy 数组），可由 merge_results 合并
+    """
+    rules = RuleCompiler.for_pool(pool)
+    size = rules.size
+    ssr_cards = pool.get_cards_by_rarity('SSR')
+    card_probs = np.array(PullEngine.card_probabilities(pool, 'SSR', rules))
+    featured_ids = set(pool.featured_ssr)
+    featured_mask = np.array([c.card_id in featured_ids for c in ssr_cards], dtype=bool)
+
+    pity = np.zeros(players, dtype=np.int64)
+    copies = np.zeros(players, dtype=np.int64)
+    first_featured = np.zeros(players, dtype=np.int64)
+    first_ssr = np.zeros(players, dtype=np.int64)
+    last_featured = np.zeros(players, dtype=np.int64)
+    lost = np.zeros(players, dtype=np.int64)
+    featured_gaps, lost_streaks = [], []
+    gap_hist = np.zeros(size + 1, dtype=np.int64)
+    card_hits = np.zeros(len(ssr_cards), dtype=np.int64)
+    ssr_total = sr_total = sr_first_cycle = 0
+
+    for t in range(1, pulls + 1):
+        rolls = rng.random(players)
+        ssr = rolls < rules.ssr_array[pity]
+        sr = ~ssr & (rolls < rules.sr_array[pity])
+        sr_total += int(np.count_nonzero(sr))
+        # 首个 SSR 之前（第一个完整保底周期内）的 SR
+        sr_first_cycle += int(np.count_nonzero(sr & (first_ssr == 0)))
+
+        winners = np.flatnonzero(ssr)
+        if winners.size:
+            ssr_total += winners.size
+            gap_hist += np.bincount(pity[winners] + 1, minlength=size + 1)
+            first_ssr[winners[first_ssr[winners] == 0]] = t
+            if ssr_cards:
+                picks = rng.choice(len(ssr_cards), size=winners.size, p=card_probs)
+                card_hits += np.bincount(picks, minlength=len(ssr_cards))
+                hit = winners[featured_mask[picks]]
+                copies[hit] += 1
+                first = hit[first_featured[hit] == 0]
+                first_featured[first] = t
+                lost[winners[~featured_mask[picks]]] += 1
+                if hit.size:
+                    featured_gaps.append(t - last_featured[hit])
+                    lost_streaks.append(lost[hit])
+                    last_featured[hit] = t
+                    lost[hit] = 0
+
+        pity += 1
+        pity[winners] = 0
+
+    got = first_featured > 0
+    got_ssr = first_ssr > 0
+    sketches = {metric: QuantileSketch() for metric in PullSketches.METRICS}
+    sketches['pulls_to_ssr'].add_histogram(gap_hist)
+    if featured_gaps:
+        sketches['pulls_to_featured'].add_many(np.concatenate(featured_gaps))
+        sketches['lost_streak'].add_many(np.concatenate(lost_streaks))
+    return {
+        'players': players,
+        'pulls': pulls,
+        'rarity_counts': np.array(
+            [ssr_total, sr_total, players * pulls - ssr_total - sr_total], dtype=np.int64
+        ),
+        'pulls_to_ssr': gap_hist,
+        'pulls_to_first_ssr': np.bincount(first_ssr[got_ssr], minlength=min(pulls, size) + 1),
+        'sr_first_cycle': sr_first_cycle,
+        'featured_copies': np.bincount(copies),
+        'pulls_to_featured': np.bincount(first_featured[got], minlength=pulls + 1),
+        'never_featured': int(players - np.count_nonzero(got)),
+        'end_pity': np.bincount(pity, minlength=size),
+        'card_hits': card_hits,
+        'card_ids': [c.card_id for c in ssr_cards],
+        'sketches': sketches,
+    }
+
+
+def _simulate_chunk(pool_data: Dict, players: int, pulls: int, rng_spec: tuple) -> Dict:
+    """进程池任务：在工作进程中重建卡池与随机数子流并模拟一块玩家"""
+    pool = Pool.from_dict(pool_data)
+    return simulate_players(pool, players, pulls, from_spec(rng_spec).generator())
+
+
+def _pad_add(total: 'np.ndarray', part: 'np.ndarray') -> 'np.ndarray':
+    """长度不同的计数数组相加"""
+    if len(part) > len(total):
+        total, part = part, total
+    total = total.copy()
+    total[:len(part)] += part
+    return total
+
+
+def merge_results(parts: List[Dict]) -> Dict:
+    """合并各块的直方图（计数直接相加，结果与分块方式无关）"""
+    merged = dict(parts[0])
+    for part in parts[1:]:
+        merged['players'] += part['players']
+        merged['never_featured'] += part['never_featured']
+        merged['sr_first_cycle'] += part['sr_first_cycle']
+        for key in ('rarity_counts', 'pulls_to_ssr', 'pulls_to_first_ssr', 'featured_copies',
+                    'pulls_to_featured', 'end_pity', 'card_hits'):
+            merged[key] = _pad_add(merged[key], part[key])
+    merged['sketches'] = merge_sketches([part['sketches'] for part in parts])
+    return merged
+
+
+# 自适应模式支持的目标指标
+ADAPTIVE_METRICS = ('ssr_rate', 'featured_share', 'mean_pulls_to_ssr')
+
+
+def ratio_terms(part: Dict, featured_ids: set) -> Dict[str, Tuple[float, float]]:
+    """一批结果中各指标的 (分子, 分母)，指标值为所有批次分子和 / 分母和"""
+    ssr = float(part['rarity_counts'][0])
+    first = part['pulls_to_first_ssr']
+    cycles = float(first.sum())
+    cycle_pulls = float(np.dot(np.arange(len(first)), first))
+    featured = sum(
+        int(count) for card_id, count in zip(part['card_ids'], part['card_hits'])
+        if card_id in featured_ids
+    )
+    return {
+        'ssr_rate': (cycles, cycle_pulls),
+        'sr_rate': (float(part['sr_first_cycle']), cycle_pulls),
+        'featured_share': (float(featured), ssr),
+        'mean_pulls_to_ssr': (cycle_pulls, cycles),
+    }
+
+
+def ratio_interval(num: 'np.ndarray', den: 'np.ndarray', z: float) -> Tuple[Optional[float], float]:
+    """
+    比值估计 sum(num) / sum(den) 及其置信区间半宽
+
+    各批次相互独立，方差按批次残差用 delta 方法估计；批次不足两批时半宽为无穷大。
+    """
+    total = den.sum()
+    if total <= 0:
+        return None, math.inf
+    estimate = float(num.sum() / total)
+    batches = len(num)
+    if batches < 2:
+        return estimate, math.inf
+    resid = num - estimate * den
+    var = float((resid ** 2).sum()) / (batches * (batches - 1)) / float(den.mean()) ** 2
+    return estimate, z * math.sqrt(var)
+
+
+class SimulationService:
+    """蒙特卡洛模拟服务"""
+
+    @staticmethod
+    def _get_executor(workers: int) -> 'ProcessPoolExecutor':
+        """获取共享进程池（工作进程数变化时重建；按需导入，单进程脚本不加载 multiprocessing）"""
+        global _executor, _executor_workers
+        from concurrent.futures import ProcessPoolExecutor
+        with _executor_lock:
+            if _executor is None or _executor_workers != workers:
+                if _executor is not None:
+                    _executor.shutdown(wait=False)
+                _executor = ProcessPoolExecutor(max_workers=workers)
+                _executor_workers = workers
+            return _executor
+
+    @staticmethod
+    def shutdown():
+        """关闭共享进程池"""
+        global _executor
+        with _executor_lock:
+            if _executor is not None:
+                _executor.shutdown(wait=True)
+                _executor = None
+
+    @staticmethod
+    def run(pool: Pool, players: int, pulls: int, seed: int = None,
+            workers: int = None, backend: str = None) -> Dict:
+        """
+        运行模拟
+
+        Args:
+            pool: 目标卡池
+            players: 虚拟玩家数量
+            pulls: 每名玩家抽卡次数
+            seed: 随机种子（为空时随机生成，并在结果中返回）
+            workers: 工作进程数（默认使用配置值）
+            backend: 随机数后端 (stdlib/pcg64/philox)，默认使用配置值
+
+        Returns:
+            合并后的直方图与汇总信息（可直接 JSON 序列化）
+
+        Raises:
+            RuntimeError: NumPy 不可用
+            ValueError: 随机数后端未知
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy not available")
+
+        started = time.perf_counter()
+        root = create_source(backend, seed)
+        chunk = SIMULATION_CONFIG['chunk_players']
+        sizes = [min(chunk, players - i) for i in range(0, players, chunk)]
+        specs = [root.jumped(i).spec() for i in range(len(sizes))]
+        workers = max(1, min(workers or SIMULATION_CONFIG['max_workers'], len(sizes)))
+
+        if workers == 1 or players * pulls < SIMULATION_CONFIG['inline_threshold']:
+            parts = [
+                simulate_players(pool, size, pulls, from_spec(spec).generator())
+                for size, spec in zip(sizes, specs)
+            ]
+        else:
+            executor = SimulationService._get_executor(workers)
+            pool_data = pool.to_dict()
+            futures = [
+                executor.submit(_simulate_chunk, pool_data, size, pulls, spec)
+                for size, spec in zip(sizes, specs)
+            ]
+            parts = [f.result() for f in futures]
+
+        merged = merge_results(parts)
+        result = SimulationService.summarize(
+            pool, merged, root.seed, workers, time.perf_counter() - started
+        )
+        result['rng_backend'] = root.name
+        return result
+
+    @staticmethod
+    def _run_chunks(pool: Pool, pulls: int, specs: List[tuple], workers: int) -> List[Dict]:
+        """模拟一组批次（工作进程数为 1 时在当前进程计算）"""
+        players = SIMULATION_CONFIG['adaptive_chunk_players']
+        if workers == 1:
+            return [
+                simulate_players(pool, players, pulls, from_spec(spec).generator())
+                for spec in specs
+            ]
+        executor = SimulationService._get_executor(workers)
+        pool_data = pool.to_dict()
+        futures = [
+            executor.submit(_simulate_chunk, pool_data, players, pulls, spec)
+            for spec in specs
+        ]
+        return [f.result() for f in futures]
+
+    @staticmethod
+    def run_adaptive(pool: Pool, tolerance: Dict[str, float] = None,
+                     confidence: float = None, time_budget: float = None,
+                     max_players: int = None, seed: int = None, workers: int = None,
+                     backend: str = None) -> Dict:
+        """
+        自适应精度模拟：按轮追加批次，直到全部目标指标的置信区间半宽
+        不超过目标精度，或时间预算用尽，或玩家数达到上限
+
+        Args:
+            pool: 目标卡池
+            tolerance: 指标 -> 目标半宽（绝对值），指标取自 ADAPTIVE_METRICS，默认使用配置值
+            confidence: 置信水平
+            time_budget: 时间预算（秒），预计下一轮会超出预算时停止
+            max_players: 玩家数上限
+            seed: 随机种子（为空时随机生成，并在结果中返回）
+            workers: 工作进程数（默认使用配置值）
+            backend: 随机数后端 (stdlib/pcg64/philox)，默认使用配置值
+
+        Returns:
+            与 run 相同的汇总信息，另含各指标的估计值、达到的精度、停止原因与样本量
+
+        Raises:
+            RuntimeError: NumPy 不可用
+            ValueError: 指标未知、参数越界或随机数后端未知
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy not available")
+
+        tolerance = dict(tolerance or SIMULATION_CONFIG['adaptive_tolerance'])
+        confidence = confidence or SIMULATION_CONFIG['adaptive_confidence']
+        time_budget = time_budget or SIMULATION_CONFIG['adaptive_time_budget']
+        max_players = max_players or SIMULATION_CONFIG['max_players']
+        unknown = set(tolerance) - set(ADAPTIVE_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+        if not tolerance or any(t <= 0 for t in tolerance.values()):
+            raise ValueError("Tolerance must be positive")
+        if not 0 < confidence < 1:
+            raise ValueError("Confidence must be between 0 and 1")
+
+        started = time.perf_counter()
+        deadline = started + time_budget
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        root = create_source(backend, seed)
+        chunk = SIMULATION_CONFIG['adaptive_chunk_players']
+        round_chunks = SIMULATION_CONFIG['adaptive_round_chunks']
+        max_chunks = max(2, max_players // chunk)
+        workers = max(1, min(workers or SIMULATION_CONFIG['max_workers'], round_chunks))
+        featured_ids = set(pool.featured_ssr)
+        # 一个完整保底周期，保证每名玩家都至少出一次 SSR
+        pulls = RuleCompiler.for_pool(pool).size
+
+        terms: Dict[str, List[Tuple[float, float]]] = {metric: [] for metric in tolerance}
+        merged = None
+        done = 0
+        metrics: Dict[str, Dict] = {}
+        stop_reason = None
+        while stop_reason is None:
+            round_started = time.perf_counter()
+            count = min(round_chunks, max_chunks - done)
+            specs = [root.jumped(done + i).spec() for i in range(count)]
+            parts = SimulationService._run_chunks(pool, pulls, specs, workers)
+            done += count
+            for part in parts:
+                part_terms = ratio_terms(part, featured_ids)
+                for metric in terms:
+                    terms[metric].append(part_terms[metric])
+            merged = merge_results(parts if merged is None else [merged] + parts)
+
+            for metric, target in tolerance.items():
+                values = np.array(terms[metric], dtype=np.float64)
+                estimate, half_width = ratio_interval(values[:, 0], values[:, 1], z)
+                metrics[metric] = {
+                    'estimate': estimate,
+                    'half_width': half_width if math.isfinite(half_width) else None,
+                    'tolerance': target,
+                    'converged': half_width <= target,
+                }
+
+            now = time.perf_counter()
+            if all(m['converged'] for m in metrics.values()):
+                stop_reason = 'tolerance'
+            elif done >= max_chunks:
+                stop_reason = 'max_players'
+            elif now + (now - round_started) > deadline:
+                stop_reason = 'time_budget'
+
+        result = SimulationService.summarize(
+            pool, merged, root.seed, workers, time.perf_counter() - started
+        )
+        result.update({
+            'rng_backend': root.name,
+            'confidence': confidence,
+            'converged': stop_reason == 'tolerance',
+            'stop_reason': stop_reason,
+            'batches': done,
+            'total_pulls': merged['players'] * pulls,
+            'metrics': metrics,
+        })
+        return result
+
+    @staticmethod
+    def summarize(pool: Pool, merged: Dict, seed: int, workers: int,
+                  elapsed: float) -> Dict:
+        """将合并后的直方图整理为对外结果"""
+        ssr, sr, r = (int(x) for x in merged['rarity_counts'])
+        total = ssr + sr + r
+        gaps = merged['pulls_to_ssr']
+        featured_ids = set(pool.featured_ssr)
+        return {
+            'pool_id': pool.pool_id,
+            'players': merged['players'],
+            'pulls_per_player': merged['pulls'],
+            'seed': seed,
+            'workers': workers,
+            'elapsed_ms': elapsed * 1000,
+            'rarity_counts': {'SSR': ssr, 'SR': sr, 'R': r},
+            'ssr_rate': ssr / total if total else 0.0,
+            'mean_pulls_to_ssr': (
+                float(np.dot(np.arange(len(gaps)), gaps) / gaps.sum()) if gaps.sum() else None
+            ),
+            'pulls_to_ssr': gaps.tolist(),
+            'featured_copies': merged['featured_copies'].tolist(),
+            'pulls_to_featured': merged['pulls_to_featured'].tolist(),
+            'never_featured': merged['never_featured'],
+            'quantiles': {
+                metric: sketch.summary() for metric, sketch in merged['sketches'].items()
+            },
+            'end_pity': merged['end_pity'].tolist(),
+            'featured_ssr_counts': {
+                card_id: int(count)
+                for card_id, count in zip(merged['card_ids'], merged['card_hits'])
+                if card_id in featured_ids
+            },
+        }
@@ -0,0 +1,321 @@
+"""
+流式分位数草图 - 以有界内存统计抽数类指标的分布，可跨进程无损合并
+
+QuantileSketch 对小于 exact_limit 的取值保留精确计数（小范围直方图），
+更大的取值按 DDSketch 的对数分桶计数：桶 k 覆盖 (gamma^(k-1), gamma^k]，
+gamma = (1 + a) / (1 - a)，分位数的相对误差不超过 a。两部分都是纯计数，
+参数相同的草图合并只需按键相加，结果与合并顺序和分块方式无关。
+
+PullSketches 为一名玩家（一个会话）的抽卡序列维护三个指标：
+  - pulls_to_ssr:      相邻 SSR 的间隔抽数
+  - pulls_to_featured: 相邻UP卡的间隔抽数
+  - lost_streak:       每次出UP卡前连续未命中UP的 SSR 数
+序列按 SSR 事件输入（间隔抽数 + 是否UP），跨批次的未完成区间由草图自身记录。
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from config import SKETCH_CONFIG
+
+
+# PullSketches.observe 中事件数少于该值时逐个输入
+_SCALAR_OBSERVE = 16
+
+
+class QuantileSketch:
+    """精确小范围直方图 + 对数分桶的可合并分位数草图（取值为非负整数）"""
+
+    __slots__ = ('exact_limit', 'relative_accuracy', '_log_gamma',
+                 'exact', 'buckets', 'count', 'total', 'min', 'max', '_summary')
+
+    def __init__(self, exact_limit: int = None, relative_accuracy: float = None):
+        self.exact_limit = int(exact_limit or SKETCH_CONFIG['exact_limit'])
+        self.relative_accuracy = float(relative_accuracy or SKETCH_CONFIG['relative_accuracy'])
+        if not 0 < self.relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._log_gamma = math.log(gamma)
+        self.exact: Dict[int, int] = {}
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        # 最近一次 summary 的结果 (count, 分位数, 结果)，取值只增不减，count 不变即未修改
+        self._summary = None
+
+    def _bucket(self, value: int) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _bucket_value(self, key: int) -> float:
+        """桶的代表值（相对误差最小的点）"""
+        gamma = math.exp(self._log_gamma)
+        return 2.0 * gamma ** key / (gamma + 1.0)
+
+    def _update_range(self, low: int, high: int, count: int, total: int):
+        self.count += count
+        self.total += total
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def add(self, value: int, count: int = 1):
+        """添加 count 个相同取值"""
+        if count <= 0:
+            return
+        value = int(value)
+        if value < 0:
+            raise ValueError("Sketch values must be non-negative")
+        if value < self.exact_limit:
+            self.exact[value] = self.exact.get(value, 0) + count
+        else:
+            key = self._bucket(value)
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self._update_range(value, value, count, value * count)
+
+    def add_many(self, values: Iterable[int]):
+        """批量添加取值（NumPy 可用时按取值聚合后一次写入）"""
+        if not NUMPY_AVAILABLE:
+            for value in values:
+                self.add(value)
+            return
+        values = np.asarray(values, dtype=np.int64).ravel()
+        if not values.size:
+            return
+        if values.min() < 0:
+            raise ValueError("Sketch values must be non-negative")
+        small = values[values < self.exact_limit]
+        if small.size:
+            hist = np.bincount(small)
+            for value in np.flatnonzero(hist).tolist():
+                self.exact[value] = self.exact.get(value, 0) + int(hist[value])
+        large = values[values >= self.exact_limit]
+        if large.size:
+            keys = np.ceil(np.log(large) / self._log_gamma).astype(np.int64)
+            uniq, counts = np.unique(keys, return_counts=True)
+            for key, count in zip(uniq.tolist(), counts.tolist()):
+                self.buckets[key] = self.buckets.get(key, 0) + count
+        self._update_range(int(values.min()), int(values.max()), int(values.size),
+                           int(values.sum()))
+
+    def add_histogram(self, hist: Sequence[int]):
+        """按直方图添加：hist[v] 为取值 v 的个数"""
+        for value, count in enumerate(hist):
+            if count:
+                self.add(value, int(count))
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """
+        合并另一个草图（原地修改并返回自身）
+
+        Raises:
+            ValueError: 两个草图的参数不同，无法无损合并
+        """
+        if (other.exact_limit != self.exact_limit
+                or other.relative_accuracy != self.relative_accuracy):
+            raise ValueError("Cannot merge sketches with different parameters")
+        if not other.count:
+            return self
+        for value, count in other.exact.items():
+            self.exact[value] = self.exact.get(value, 0) + count
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self._update_range(other.min, other.max, other.count, other.total)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        查询分位数（精确范围内为精确值，之外相对误差不超过 relative_accuracy）
+
+        Returns:
+            分位数，草图为空时为 None
+        """
+        return self.quantiles((q,))[0]
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """按顺序查询多个分位数（只遍历一次有序键）"""
+        if not self.count:
+            return [None] * len(qs)
+        order = sorted(range(len(qs)), key=lambda i: qs[i])
+        ranks = [min(max(qs[i], 0.0), 1.0) * (self.count - 1) for i in order]
+        result: List[Optional[float]] = [float(self.max)] * len(qs)
+        j = 0
+        seen = 0
+        for value in sorted(self.exact):
+            seen += self.exact[value]
+            while j < len(order) and seen > ranks[j]:
+                result[order[j]] = float(value)
+                j += 1
+            if j == len(order):
+                return result
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            while j < len(order) and seen > ranks[j]:
+                result[order[j]] = min(max(self._bucket_value(key), float(self.min)),
+                                       float(self.max))
+                j += 1
+            if j == len(order):
+                return result
+        return result
+
+    def summary(self, quantiles: Sequence[float] = None) -> Dict:
+        """计数、均值、极值与常用分位数（草图未变化时复用上次结果）"""
+        quantiles = tuple(quantiles or SKETCH_CONFIG['quantiles'])
+        cached = self._summary
+        if cached is not None and cached[0] == self.count and cached[1] == quantiles:
+            return dict(cached[2])
+        result = {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+        }
+        for q, value in zip(quantiles, self.quantiles(quantiles)):
+            result[f"p{q * 100:g}"] = value
+        self._summary = (self.count, quantiles, result)
+        return dict(result)
+
+    def estimated_bytes(self) -> int:
+        """估算的内存占用（字节，每个非空计数约 40 字节）"""
+        return 280 + 40 * (len(self.exact) + len(self.buckets))
+
+    def to_dict(self) -> Dict:
+        """序列化为字典（可 JSON 编码）"""
+        return {
+            'exact_limit': self.exact_limit,
+            'relative_accuracy': self.relative_accuracy,
+            'exact': sorted(self.exact.items()),
+            'buckets': sorted(self.buckets.items()),
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        """从字典恢复"""
+        sketch = cls(data.get('exact_limit'), data.get('relative_accuracy'))
+        sketch.exact = {int(k): int(v) for k, v in data.get('exact', [])}
+        sketch.buckets = {int(k): int(v) for k, v in data.get('buckets', [])}
+        sketch.count = data.get('count', 0)
+        sketch.total = data.get('total', 0)
+        sketch.min = data.get('min')
+        sketch.max = data.get('max')
+        return sketch
+
+
+class PullSketches:
+    """一名玩家抽卡序列的间隔与连败指标草图"""
+
+    METRICS = ('pulls_to_ssr', 'pulls_to_featured', 'lost_streak')
+
+    __slots__ = ('sketches', 'pulls_since_featured', 'lost_since_featured')
+
+    def __init__(self):
+        self.sketches: Dict[str, QuantileSketch] = {m: QuantileSketch() for m in self.METRICS}
+        # 上一张UP卡之后（到最近一个 SSR 为止）的抽数与未命中UP的 SSR 数
+        self.pulls_since_featured = 0
+        self.lost_since_featured = 0
+
+    def observe_one(self, gap: int, featured: bool):
+        """输入一个 SSR 事件：gap 为距上一个 SSR 的抽数"""
+        self.sketches['pulls_to_ssr'].add(gap)
+        self.pulls_since_featured += gap
+        if featured:
+            self.sketches['pulls_to_featured'].add(self.pulls_since_featured)
+            self.sketches['lost_streak'].add(self.lost_since_featured)
+            self.pulls_since_featured = 0
+            self.lost_since_featured = 0
+        else:
+            self.lost_since_featured += 1
+
+    def observe(self, gaps: Sequence[int], featured: Sequence[bool]):
+        """按顺序输入一批 SSR 事件（与逐个调用 observe_one 结果一致）"""
+        if not NUMPY_AVAILABLE or len(gaps) < _SCALAR_OBSERVE:
+            # 事件很少时逐个输入比向量化的固定开销更小
+            if hasattr(gaps, 'tolist'):
+                gaps, featured = gaps.tolist(), featured.tolist()
+            for gap, hit in zip(gaps, featured):
+                self.observe_one(gap, hit)
+            return
+        gaps = np.asarray(gaps, dtype=np.int64)
+        if not gaps.size:
+            return
+        featured = np.asarray(featured, dtype=bool)
+        self.sketches['pulls_to_ssr'].add_many(gaps)
+
+        pulls = np.cumsum(gaps)
+        lost = np.cumsum(~featured)
+        hits = np.flatnonzero(featured)
+        if hits.size:
+            hit_pulls = pulls[hits]
+            hit_lost = lost[hits]
+            self.sketches['pulls_to_featured'].add_many(
+                np.diff(hit_pulls, prepend=-self.pulls_since_featured)
+            )
+            self.sketches['lost_streak'].add_many(
+                np.diff(hit_lost, prepend=-self.lost_since_featured)
+            )
+            self.pulls_since_featured = int(pulls[-1] - hit_pulls[-1])
+            self.lost_since_featured = int(lost[-1] - hit_lost[-1])
+        else:
+            self.pulls_since_featured += int(pulls[-1])
+            self.lost_since_featured += int(lost[-1])
+
+    def merge(self, other: 'PullSketches') -> 'PullSketches':
+        """合并另一组草图的分布（未完成区间不合并）"""
+        for metric in self.METRICS:
+            self.sketches[metric].merge(other.sketches[metric])
+        return self
+
+    def copy(self) -> 'PullSketches':
+        """复制（草图大小有界，与抽数无关）"""
+        result = PullSketches()
+        for metric, sketch in self.sketches.items():
+            result.sketches[metric] = QuantileSketch(sketch.exact_limit,
+                                                     sketch.relative_accuracy).merge(sketch)
+        result.pulls_since_featured = self.pulls_since_featured
+        result.lost_since_featured = self.lost_since_featured
+        return result
+
+    def summary(self, quantiles: Sequence[float] = None) -> Dict[str, Dict]:
+        return {metric: sketch.summary(quantiles) for metric, sketch in self.sketches.items()}
+
+    def estimated_bytes(self) -> int:
+        """估算的内存占用（字节）"""
+        return 200 + sum(sketch.estimated_bytes() for sketch in self.sketches.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            'sketches': {metric: sketch.to_dict() for metric, sketch in self.sketches.items()},
+            'pulls_since_featured': self.pulls_since_featured,
+            'lost_since_featured': self.lost_since_featured,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PullSketches':
+        result = cls()
+        for metric, sketch in (data.get('sketches') or {}).items():
+            if metric in result.sketches:
+                result.sketches[metric] = QuantileSketch.from_dict(sketch)
+        result.pulls_since_featured = data.get('pulls_since_featured', 0)
+        result.lost_since_featured = data.get('lost_since_featured', 0)
+        return result
+
+
+def merge_sketches(parts: List[Dict[str, QuantileSketch]]) -> Dict[str, QuantileSketch]:
+    """按指标名合并多组草图（返回新对象，不修改输入）"""
+    merged: Dict[str, QuantileSketch] = {}
+    for part in parts:
+        for metric, sketch in part.items():
+            if metric not in merged:
+                merged[metric] = QuantileSketch(sketch.exact_limit, sketch.relative_accuracy)
+            merged[metric].merge(sketch)
+    return merged
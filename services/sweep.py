@@ -0,0 +1,336 @@
+"""
+参数扫描 - 在保底与品阶概率参数网格上批量评估卡池的实际概率与期望成本
+
+可扫描的参数（未扫描的参数沿用卡池覆盖项或全局 CARD_RARITY / PITY_CONFIG）：
+  - soft_pity / hard_pity / pity_increase   保底规则
+  - ssr_probability / sr_probability        品阶基础概率（R 取剩余概率）
+  - featured_rate                           出SSR时为UP卡的概率
+
+每个参数点生成一个覆盖了规则的卡池副本：
+  - exact:    在保底马尔可夫链上精确计算（OddsCalculator）
+  - simulate: 蒙特卡洛模拟（每名玩家一个完整保底周期，按更新过程估计）
+  - auto:     保底链长度不超过 SWEEP_CONFIG['exact_max_pity'] 时精确计算，否则模拟
+
+参数点结果按 (卡池定义, 参数, 方法) 的哈希存入两级结果缓存 (ResultCache('sweep'))，
+重复扫描只计算新增的点，多个 worker 共享磁盘层，重新加载卡池时失效；
+新增点较多时分批提交到模拟服务的共享进程池并行计算。
+"""
+import math
+import time
+import itertools
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from models.pool import Pool
+from config import SWEEP_CONFIG
+from services.odds import OddsCalculator
+from services.pity_rules import RuleCompiler
+from services.result_cache import ResultCache, cache_key
+from services.simulation import SimulationService, ratio_terms, simulate_players
+
+
+# 参数名 -> (取值下限, 取值上限, 是否为整数)
+SWEEP_PARAMS = {
+    'soft_pity': (0, None, True),
+    'hard_pity': (1, SWEEP_CONFIG['max_hard_pity'], True),
+    'pity_increase': (0.0, 1.0, False),
+    'ssr_probability': (0.0, 1.0, False),
+    'sr_probability': (0.0, 1.0, False),
+    'featured_rate': (0.0, 1.0, False),
+}
+
+SWEEP_METHODS = ('auto', 'exact', 'simulate')
+
+_PITY_KEYS = ('soft_pity', 'hard_pity', 'pity_increase')
+
+# copies_quantiles 的分位点
+_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def expand_axis(name: str, spec) -> List:
+    """
+    将单个参数的取值描述展开为取值列表
+
+    spec 可以是取值列表，或 {'start', 'stop', 'step'} 范围（包含 stop）。
+
+    Raises:
+        ValueError: 参数名未知、范围无效或取值越界
+    """
+    if name not in SWEEP_PARAMS:
+        raise ValueError(f"Unknown sweep parameter: {name}")
+    low, high, integer = SWEEP_PARAMS[name]
+
+    if isinstance(spec, dict):
+        if 'start' not in spec or 'stop' not in spec:
+            raise ValueError(f"Range for {name} needs start and stop")
+        start, stop = float(spec['start']), float(spec['stop'])
+        step = float(spec.get('step') or 0)
+        if step <= 0 or stop < start:
+            raise ValueError(f"Invalid range for {name}: {spec}")
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        values = [start + i * step for i in range(count)]
+    elif isinstance(spec, (list, tuple)):
+        values = [float(v) for v in spec]
+    else:
+        values = [float(spec)]
+
+    if not values:
+        raise ValueError(f"No values for {name}")
+    if integer:
+        values = [int(round(v)) for v in values]
+    else:
+        values = [round(v, 12) for v in values]
+    for v in values:
+        if v < low or (high is not None and v > high):
+            raise ValueError(f"{name}={v} out of range")
+    # 去重并保持顺序
+    return list(dict.fromkeys(values))
+
+
+def expand_grid(grid: Dict) -> List[Dict]:
+    """展开参数网格的笛卡尔积"""
+    names = sorted(grid)
+    axes = [expand_axis(name, grid[name]) for name in names]
+    return [dict(zip(names, combo)) for combo in itertools.product(*axes)]
+
+
+def variant_pool(pool: Pool, params: Dict) -> Pool:
+    """
+    生成覆盖了参数点规则的卡池副本（共享卡牌对象，独立索引）
+
+    Raises:
+        ValueError: SSR 与 SR 概率之和超过 1
+    """
+    rarity_probability, pity_config, featured_rate = RuleCompiler.effective_rules(pool)
+    if 'ssr_probability' in params:
+        rarity_probability['SSR'] = params['ssr_probability']
+    if 'sr_probability' in params:
+        rarity_probability['SR'] = params['sr_probability']
+    rarity_probability['R'] = round(1.0 - rarity_probability['SSR'] - rarity_probability['SR'], 12)
+    if rarity_probability['R'] < 0:
+        raise ValueError("ssr_probability + sr_probability exceeds 1")
+    for key in _PITY_KEYS:
+        if key in params:
+            pity_config[key] = params[key]
+    featured_rate = params.get('featured_rate', featured_rate)
+
+    variant = Pool(
+        pool.pool_id, pool.name, pool.pool_type, pool.description,
+        cards=pool.cards, featured_ssr=pool.featured_ssr, library_id=pool.library_id,
+        rarity_probability=rarity_probability, pity_config=pity_config,
+        featured_rate=featured_rate
+    )
+    # 扫描点的规则只用一次，不写入 RuleCompiler 的共享缓存
+    variant.index.rules = RuleCompiler.compile(variant, cache=False)
+    return variant
+
+
+def _sr_per_cycle(pool: Pool) -> float:
+    """从零保底到出 SSR 的一个周期内 SR 的期望数量"""
+    rules = RuleCompiler.for_pool(pool)
+    sr_hit = np.minimum(rules.sr_array, 1.0) - rules.ssr_array
+    return float(np.dot(rules.survival[:-1], sr_hit))
+
+
+def _evaluate_exact(pool: Pool, copies: int) -> Dict:
+    """在保底马尔可夫链上精确评估参数点（不读写概率缓存，避免挤出 /api/odds 的结果）"""
+    odds = OddsCalculator.evaluate(pool, copies, probs=_QUANTILES, cache=False)
+    cycle = odds['expected_pulls_to_ssr']
+    return {
+        'ssr_rate': odds['ssr_rate'],
+        'sr_rate': _sr_per_cycle(pool) / cycle,
+        'expected_pulls_to_ssr': cycle,
+        'featured_share': odds['featured_share'],
+        'featured_rate': odds['featured_rate'],
+        'expected_pulls_to_copies': odds['expected_pulls_to_copies'],
+        'copies_quantiles': odds['copies_quantiles'],
+    }
+
+
+def _simulated_copies_quantiles(first_cycles: 'np.ndarray', share: float, copies: int,
+                                rng: 'np.random.Generator') -> Dict[str, int]:
+    """
+    由模拟得到的周期长度分布重抽样求 copies 张目标卡的分位抽数
+
+    每个周期独立以 share 概率命中目标，所需周期数为 copies + 负二项分布的未命中数，
+    每名重抽样玩家的抽数为相应个数的周期长度之和。
+    """
+    players = int(first_cycles.sum())
+    misses = rng.negative_binomial(copies, share, size=players)
+    cycles = copies + misses
+    lengths = rng.choice(len(first_cycles), size=int(cycles.sum()),
+                         p=first_cycles / players)
+    ends = np.cumsum(cycles)
+    totals = np.add.reduceat(lengths, ends - cycles)
+    pmf = np.bincount(totals) / players
+    return OddsCalculator.quantiles(pmf, _QUANTILES)
+
+
+def _evaluate_simulated(pool: Pool, copies: int, seed: int) -> Dict:
+    """
+    蒙特卡洛评估参数点（每名玩家一个完整保底周期）
+
+    与精确计算口径一致，各比率均按完整周期计算（周期内次数 / 周期抽数），
+    copies_quantiles 由模拟的周期长度分布重抽样得到。
+    """
+    rules = RuleCompiler.for_pool(pool)
+    rng = np.random.default_rng(seed)
+    part = simulate_players(pool, SWEEP_CONFIG['sim_players'], rules.size, rng)
+    terms = ratio_terms(part, set(pool.featured_ssr))
+    cycles, cycle_pulls = terms['ssr_rate']
+    sr_first_cycle, _ = terms['sr_rate']
+    featured, ssr = terms['featured_share']
+    cycle = cycle_pulls / cycles if cycles else None
+    share = featured / ssr if ssr else 0.0
+    quantiles = {}
+    if cycle and share:
+        quantiles = _simulated_copies_quantiles(part['pulls_to_first_ssr'], share, copies, rng)
+    return {
+        'ssr_rate': cycles / cycle_pulls if cycle_pulls else 0.0,
+        'sr_rate': sr_first_cycle / cycle_pulls if cycle_pulls else 0.0,
+        'expected_pulls_to_ssr': cycle,
+        'featured_share': share,
+        'featured_rate': share / cycle if cycle else 0.0,
+        # 每个周期独立命中目标的概率为 share，所需周期数服从几何分布
+        'expected_pulls_to_copies': copies * cycle / share if cycle and share else None,
+        'copies_quantiles': quantiles,
+    }
+
+
+def evaluate_point(pool: Pool, params: Dict, copies: int, method: str,
+                   seed: int) -> Dict:
+    """评估单个参数点，返回参数、使用的方法与各项指标"""
+    row = {'params': params}
+    try:
+        variant = variant_pool(pool, params)
+    except ValueError as e:
+        row.update({'method': None, 'error': str(e)})
+        return row
+
+    size = RuleCompiler.for_pool(variant).size
+    if method == 'auto':
+        method = 'exact' if size <= SWEEP_CONFIG['exact_max_pity'] else 'simulate'
+    row['method'] = method
+    if method == 'exact':
+        row.update(_evaluate_exact(variant, copies))
+    else:
+        row.update(_evaluate_simulated(variant, copies, seed))
+    return row
+
+
+def _evaluate_batch(pool_data: Dict, tasks: List[tuple], copies: int) -> List[Dict]:
+    """进程池任务：在工作进程中重建卡池并评估一批参数点"""
+    pool = Pool.from_dict(pool_data)
+    return [evaluate_point(pool, params, copies, method, seed)
+            for params, method, seed in tasks]
+
+
+class SweepService:
+    """参数扫描服务 - 参数点结果按哈希缓存"""
+
+    # 两级结果缓存（与概率计算 / 模拟共用磁盘层，重新加载卡池时失效）
+    _cache = ResultCache('sweep', max_entries=SWEEP_CONFIG['cache_size'])
+
+    @staticmethod
+    def _point_key(pool: Pool, params: Dict, copies: int, method: str) -> str:
+        """卡池定义、全局规则、参数点与方法的哈希"""
+        return cache_key('sweep', [pool], {
+            'params': params,
+            'copies': copies,
+            'method': method,
+            'sim_players': SWEEP_CONFIG['sim_players'],
+        })
+
+    @staticmethod
+    def run(pool: Pool, grid: Dict, copies: int = 1, method: str = 'auto',
+            cost_per_pull: float = None, workers: int = None) -> Dict:
+        """
+        运行参数扫描
+
+        Args:
+            pool: 基准卡池
+            grid: 参数名 -> 取值列表或 {'start', 'stop', 'step'} 范围
+            copies: 目标UP卡数量
+            method: auto / exact / simulate
+            cost_per_pull: 单抽成本（可选，用于换算期望成本）
+            workers: 工作进程数（默认使用配置值）
+
+        Returns:
+            每个参数点一行的结果表，以及新计算与命中缓存的点数
+
+        Raises:
+            RuntimeError: NumPy 不可用
+            ValueError: 参数名未知、取值越界、方法未知或点数超过上限
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy not available")
+        if method not in SWEEP_METHODS:
+            raise ValueError(f"Unknown sweep method: {method}")
+
+        started = time.perf_counter()
+        points = expand_grid(grid)
+        if len(points) > SWEEP_CONFIG['max_points']:
+            raise ValueError(
+                f"Sweep has {len(points)} points, limit is {SWEEP_CONFIG['max_points']}"
+            )
+
+        keys = [SweepService._point_key(pool, p, copies, method) for p in points]
+        rows: List[Optional[Dict]] = [SweepService._cache.get(key) for key in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        # 模拟种子由参数点哈希确定，结果可复现且可缓存
+        tasks = [(points[i], method, int(keys[i][:16], 16)) for i in missing]
+
+        workers = max(1, min(workers or SWEEP_CONFIG['max_workers'], len(tasks) or 1))
+        if workers == 1 or len(tasks) < SWEEP_CONFIG['parallel_threshold']:
+            results = [evaluate_point(pool, params, copies, point_method, seed)
+                       for params, point_method, seed in tasks]
+        else:
+            executor = SimulationService._get_executor(workers)
+            pool_data = pool.to_dict()
+            size = math.ceil(len(tasks) / (workers * 4))
+            futures = [
+                executor.submit(_evaluate_batch, pool_data, tasks[i:i + size], copies)
+                for i in range(0, len(tasks), size)
+            ]
+            results = [row for f in futures for row in f.result()]
+
+        for i, row in zip(missing, results):
+            rows[i] = row
+            SweepService._cache.put(keys[i], row, [pool.pool_id])
+
+        table = [SweepService._with_cost(row, cost_per_pull) for row in rows]
+        return {
+            'pool_id': pool.pool_id,
+            'copies': copies,
+            'method': method,
+            'parameters': sorted(grid),
+            'points': len(points),
+            'computed': len(missing),
+            'cached': len(points) - len(missing),
+            'workers': workers,
+            'elapsed_ms': (time.perf_counter() - started) * 1000,
+            'results': table,
+        }
+
+    @staticmethod
+    def _with_cost(row: Dict, cost_per_pull: Optional[float]) -> Dict:
+        """附加期望成本列（不修改缓存中的行）"""
+        if not cost_per_pull or row.get('error'):
+            return row
+        row = dict(row)
+        to_ssr = row.get('expected_pulls_to_ssr')
+        to_copies = row.get('expected_pulls_to_copies')
+        row['expected_cost_to_ssr'] = to_ssr * cost_per_pull if to_ssr else None
+        row['expected_cost_to_copies'] = to_copies * cost_per_pull if to_copies else None
+        return row
+
+    @staticmethod
+    def clear_cache():
+        """清空参数点缓存（含磁盘层）"""
+        SweepService._cache.clear()